@@ -0,0 +1,420 @@
+"""
+Multi-agent runtime: thousands of trading agents on one event loop
+
+Instead of each agent running its own scan loop, session and pollers,
+AgentRuntime hosts them all:
+
+- MarketDataHub holds one subscription per symbol. A tick is stored once,
+  appended to the shared BarStore once and run past the shared
+  PositionMonitor once, then fans out to the agents subscribed to it.
+- HttpPool is one pooled aiohttp session for every agent.
+- A fixed set of worker tasks runs agents round-robin, one symbol per
+  turn, so an agent with a large universe cannot crowd out a small one.
+  Each agent has at most one step in flight, and a step past its timeout
+  is cancelled. An agent that burns more than its CPU slice on a step
+  waits out the overrun before its next turn, and one that keeps failing
+  is suspended.
+
+Per-agent CPU time is measured around every resumption of the agent's
+coroutine, so time spent waiting on I/O or other agents is not charged.
+Decision latency runs from the tick that made the work pending to the end
+of the step.
+"""
+import asyncio
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set
+
+from bar_store import BarStore
+from execution_gateway import ExecutionGateway
+from latency import LatencyHistogram
+from pnl_engine import PnLEngine
+from position_monitor import MonitoredPosition, PositionMonitor
+from profiler import ProfilerServer
+from risk_engine import RiskEngine
+
+
+class Timed:
+    """Awaitable wrapper charging the CPU time of each coroutine resumption to a counter"""
+
+    __slots__ = ("coro", "hosted")
+
+    def __init__(self, coro, hosted: "HostedAgent"):
+        self.coro = coro
+        self.hosted = hosted
+
+    def __await__(self):
+        coro, hosted = self.coro, self.hosted
+        clock = time.thread_time_ns
+        value, error = None, None
+        while True:
+            started = clock()
+            try:
+                yielded = coro.throw(error) if error is not None else coro.send(value)
+            except StopIteration as stop:
+                hosted.cpu_ns += clock() - started
+                return stop.value
+            except BaseException:
+                hosted.cpu_ns += clock() - started
+                raise
+            hosted.cpu_ns += clock() - started
+            try:
+                value, error = (yield yielded), None
+            except BaseException as e:
+                value, error = None, e
+
+
+class HostedAgent:
+    """An agent's scheduling state inside the runtime"""
+
+    __slots__ = ("agent", "agent_id", "symbols", "pending", "scheduled", "suspended",
+                 "cpu_ns", "steps", "timeouts", "errors", "failures", "throttled", "latency")
+
+    def __init__(self, agent, symbols: Iterable[str]):
+        self.agent = agent
+        self.agent_id = agent.agent_id
+        self.symbols: Set[str] = set(symbols)
+        # symbol -> monotonic ns of the oldest tick not yet analyzed (insertion order = FIFO)
+        self.pending: Dict[str, int] = {}
+        # Queued for, or currently holding, a worker
+        self.scheduled = False
+        self.suspended = False
+        self.cpu_ns = 0
+        self.steps = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.failures = 0
+        self.throttled = 0
+        self.latency = LatencyHistogram()
+
+    def stats(self) -> Dict:
+        return {
+            "symbols": len(self.symbols),
+            "steps": self.steps,
+            "cpu_ms": self.cpu_ns / 1e6,
+            "cpu_us_per_step": self.cpu_ns / self.steps / 1000 if self.steps else 0.0,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "suspended": self.suspended,
+            "pending": len(self.pending),
+            "decision_latency": self.latency.summary(),
+        }
+
+
+class HttpPool:
+    """One pooled aiohttp session shared by every hosted agent"""
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 20, timeout: float = 10.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self._session = None
+
+    async def session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class MarketDataHub:
+    """One subscription per symbol, fanned out to every agent that trades it"""
+
+    def __init__(self, bars: BarStore, monitor: PositionMonitor, risk: Optional[RiskEngine] = None,
+                 gateway: Optional[ExecutionGateway] = None, pnl: Optional[PnLEngine] = None):
+        self.bars = bars
+        self.monitor = monitor
+        self.risk = risk
+        # Paper backends fill resting orders against the feed
+        self.gateway = gateway
+        self.pnl = pnl
+        self.latest_ticks: Dict[str, Dict] = {}
+        self.subscribers: Dict[str, List[HostedAgent]] = {}
+        self.ticks = 0
+        self.on_pending = lambda hosted: None
+
+    def subscribe(self, hosted: HostedAgent, symbols: Iterable[str]):
+        for symbol in symbols:
+            self.subscribers.setdefault(symbol, []).append(hosted)
+
+    def unsubscribe(self, hosted: HostedAgent):
+        for symbol in hosted.symbols:
+            agents = self.subscribers.get(symbol)
+            if agents and hosted in agents:
+                agents.remove(hosted)
+
+    def latest(self, symbol: str) -> Optional[Dict]:
+        return self.latest_ticks.get(symbol)
+
+    def publish(self, symbol: str, price: float, volume: float = 0.0,
+                bid: Optional[float] = None, ask: Optional[float] = None):
+        """Store a tick once and mark it pending for its subscribers"""
+        now = time.monotonic_ns()
+        self.latest_ticks[symbol] = {
+            "symbol": symbol,
+            "price": price,
+            "volume": volume,
+            "bid": bid if bid is not None else price,
+            "ask": ask if ask is not None else price,
+            "timestamp": datetime.utcnow(),
+        }
+        self.ticks += 1
+        self.bars.append_tick(symbol, time.time_ns(), price, volume)
+        self.monitor.on_price(symbol, price)
+        if self.risk is not None:
+            self.risk.mark(symbol, price)
+        if self.gateway is not None:
+            self.gateway.print_trade(symbol, price, volume)
+        if self.pnl is not None:
+            self.pnl.update_price(symbol, price)
+        for hosted in self.subscribers.get(symbol, ()):
+            # Ticks arriving before the agent got to the symbol coalesce; latency counts from the first
+            if symbol not in hosted.pending:
+                hosted.pending[symbol] = now
+                if not hosted.scheduled:
+                    self.on_pending(hosted)
+
+    async def run_poller(self, fetch, symbols: List[str], interval: float = 1.0,
+                         http: Optional[HttpPool] = None):
+        """Fetch quotes for every subscribed symbol once per interval, for all agents at once
+
+        `fetch(session, symbols)` returns {symbol: {"price": .., "volume": ..}}.
+        """
+        while True:
+            try:
+                session = await http.session() if http is not None else None
+                quotes = await fetch(session, symbols)
+                for symbol, quote in quotes.items():
+                    self.publish(symbol, quote["price"], quote.get("volume", 0.0),
+                                 quote.get("bid"), quote.get("ask"))
+            except Exception as e:
+                print(f"⚠️  Market data poll failed: {e}")
+            await asyncio.sleep(interval)
+
+
+class AgentRuntime:
+    """Hosts many agents on one loop with shared data, sessions and fair scheduling"""
+
+    def __init__(self, workers: int = 64, step_timeout: float = 5.0, cpu_slice_ms: float = 10.0,
+                 max_failures: int = 5, bar_store: Optional[BarStore] = None,
+                 risk_engine: Optional[RiskEngine] = None, gateway: Optional[ExecutionGateway] = None,
+                 http: Optional[HttpPool] = None, profile_socket: Optional[str] = None,
+                 pnl: Optional[PnLEngine] = None):
+        self.workers = workers
+        self.step_timeout = step_timeout
+        self.cpu_slice_ns = int(cpu_slice_ms * 1e6)
+        self.max_failures = max_failures
+        # Shared by every hosted agent
+        self.bars = bar_store or BarStore()
+        self.risk = risk_engine or RiskEngine()
+        self.gateway = gateway or ExecutionGateway()
+        # Marked on every tick and fed every fill; written back while running
+        self.pnl = pnl
+        if pnl is not None:
+            self.gateway.fill_listeners.append(pnl.on_fill)
+        self.monitor = PositionMonitor(on_exit=self._route_exit)
+        self.market = MarketDataHub(self.bars, self.monitor, self.risk, self.gateway, pnl)
+        self.market.on_pending = self._schedule
+        self.http = http or HttpPool()
+        # Local control socket for on-demand flamegraph captures (see profiler.py)
+        self.profiler = ProfilerServer(profile_socket) if profile_socket else None
+        self.agents: Dict[str, HostedAgent] = {}
+        self._ready: Deque[HostedAgent] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def shared(self) -> Dict[str, Any]:
+        """Constructor keywords that wire a TradingAgentExample into the shared services"""
+        return {"bar_store": self.bars, "risk_engine": self.risk,
+                "gateway": self.gateway, "monitor": self.monitor}
+
+    def add_agent(self, agent, symbols: Iterable[str]) -> HostedAgent:
+        """Host an agent (built with shared()) and subscribe it to its symbols"""
+        if agent.agent_id in self.agents:
+            raise ValueError(f"agent {agent.agent_id!r} is already hosted")
+        hosted = HostedAgent(agent, symbols)
+        agent.market = self.market
+        agent.http = self.http
+        self.agents[hosted.agent_id] = hosted
+        self.market.subscribe(hosted, hosted.symbols)
+        return hosted
+
+    def adopt_agent(self, agent, symbols: Iterable[str], state: Optional[Dict] = None) -> HostedAgent:
+        """add_agent() for an agent moved here by evict_agent() in another runtime"""
+        if state:
+            agent.restore_state(state)
+            if self.pnl is not None and state.get("pnl"):
+                self.pnl.restore_agent(agent.agent_id, state["pnl"])
+        return self.add_agent(agent, symbols)
+
+    async def evict_agent(self, agent_id: str, poll: float = 0.001) -> Optional[Dict]:
+        """Remove an agent so another runtime can adopt it; returns its full state
+
+        Its step in flight finishes and its working orders are cancelled
+        (their fills so far are kept), so the exported risk book and
+        positions are final. The agent's positions, risk book and P&L rows
+        leave this runtime's shared services with it.
+        """
+        hosted = self.remove_agent(agent_id)
+        if hosted is None:
+            return None
+        while hosted.scheduled:
+            await asyncio.sleep(poll)
+        agent = hosted.agent
+        await asyncio.gather(*(self.gateway.cancel(order.client_order_id) for order in agent.open_orders()))
+        # Let the orders' done callbacks give back reservations and net fills
+        await asyncio.sleep(0)
+        state = agent.export_state()
+        agent.detach()
+        if self.pnl is not None:
+            state["pnl"] = self.pnl.detach_agent(agent_id)
+        return state
+
+    def remove_agent(self, agent_id: str) -> Optional[HostedAgent]:
+        hosted = self.agents.pop(agent_id, None)
+        if hosted is not None:
+            self.market.unsubscribe(hosted)
+            hosted.suspended = True
+            hosted.pending.clear()
+        return hosted
+
+    def resume(self, agent_id: str):
+        """Let a suspended agent run again"""
+        hosted = self.agents[agent_id]
+        hosted.suspended = False
+        hosted.failures = 0
+        if hosted.pending:
+            self._schedule(hosted)
+
+    def _route_exit(self, position: MonitoredPosition, reason: str, price: float):
+        hosted = self.agents.get(position.agent_id)
+        if hosted is not None:
+            hosted.agent.close_position(position, reason, price)
+
+    # -- scheduling ------------------------------------------------------------
+
+    def _schedule(self, hosted: HostedAgent):
+        if hosted.scheduled or hosted.suspended:
+            return
+        hosted.scheduled = True
+        self._ready.append(hosted)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _requeue(self, hosted: HostedAgent):
+        hosted.scheduled = False
+        if hosted.pending and hosted.agent_id in self.agents:
+            self._schedule(hosted)
+
+    async def _worker(self):
+        ready = self._ready
+        while True:
+            if not ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            hosted = ready.popleft()
+            if hosted.suspended or not hosted.pending:
+                hosted.scheduled = False
+                continue
+            symbol = next(iter(hosted.pending))
+            since = hosted.pending.pop(symbol)
+            cpu_before = hosted.cpu_ns
+            await self._step(hosted, symbol, since)
+            used = hosted.cpu_ns - cpu_before
+            if used > self.cpu_slice_ns:
+                # Held the loop past its slice: sit out the overrun so others catch up
+                hosted.throttled += 1
+                self._loop.call_later((used - self.cpu_slice_ns) / 1e9, self._requeue, hosted)
+            else:
+                self._requeue(hosted)
+
+    async def _step(self, hosted: HostedAgent, symbol: str, since: int):
+        try:
+            async with asyncio.timeout(self.step_timeout):
+                await Timed(hosted.agent.analyze_and_trade(symbol), hosted)
+            hosted.failures = 0
+        except TimeoutError:
+            hosted.timeouts += 1
+            hosted.failures += 1
+        except Exception as e:
+            hosted.errors += 1
+            hosted.failures += 1
+            if hosted.failures == 1:
+                print(f"⚠️  {hosted.agent_id} failed on {symbol}: {type(e).__name__}: {e}")
+        hosted.steps += 1
+        hosted.latency.record(time.monotonic_ns() - since)
+        if hosted.failures >= self.max_failures:
+            hosted.suspended = True
+            print(f"⏸️  Suspended {hosted.agent_id} after {hosted.failures} consecutive failures")
+
+    async def start(self):
+        """Start the worker tasks on the running loop"""
+        if self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [self._loop.create_task(self._worker()) for _ in range(self.workers)]
+        if self.pnl is not None:
+            self._tasks.append(self._loop.create_task(self.pnl.run_writeback()))
+        if self.profiler is not None:
+            self.profiler.start()
+        for hosted in self.agents.values():
+            if hosted.pending:
+                self._schedule(hosted)
+        self._wakeup.set()
+
+    async def drain(self, poll: float = 0.001):
+        """Wait until no agent has pending work (for tests and benchmarks)"""
+        while any(h.pending or h.scheduled for h in self.agents.values() if not h.suspended):
+            await asyncio.sleep(poll)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.pnl is not None:
+            try:
+                await asyncio.to_thread(self.pnl.flush, True)
+            except Exception as e:
+                print(f"⚠️  Final P&L writeback failed: {e}")
+        if self.profiler is not None:
+            self.profiler.stop()
+        await self.http.close()
+        await self.gateway.close()
+
+    def stats(self) -> Dict:
+        total = LatencyHistogram()
+        for hosted in self.agents.values():
+            total.merge(hosted.latency)
+        return {
+            "agents": len(self.agents),
+            "suspended": sum(1 for h in self.agents.values() if h.suspended),
+            "symbols": len(self.market.subscribers),
+            "ticks": self.market.ticks,
+            "steps": sum(h.steps for h in self.agents.values()),
+            "cpu_ms": sum(h.cpu_ns for h in self.agents.values()) / 1e6,
+            "decision_latency": total.summary(),
+            "gateway": self.gateway.stats(),
+        }
+
+    def agent_stats(self) -> Dict[str, Dict]:
+        stats = {}
+        for agent_id, hosted in self.agents.items():
+            stats[agent_id] = hosted.stats()
+            timings = getattr(hosted.agent, "timings", None)
+            if timings is not None:
+                stats[agent_id]["stages"] = timings.summary(agent_id)
+        return stats
@@ -2,46 +2,159 @@
 Example: How AI Agents Execute Trades
 """
 import asyncio
-from typing import Dict, List
+import time
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
+from bar_store import BarStore
+from execution_gateway import ExecutionGateway, Order
+from latency import PIPELINE_TIMINGS
+from position_monitor import LONG, SHORT, MonitoredPosition, PositionMonitor
+from risk_engine import AgentLimits, RiskEngine
+from scan_scheduler import ScanScheduler
+from streaming_indicators import StreamingIndicators
+
+# Tunable knobs of the example strategy (see optimizer.py)
+DEFAULT_STRATEGY = {
+    "rsi_overbought": 70,
+    "rsi_oversold": 30,
+    # Trend filter for the momentum buy; None disables that rule
+    "trend_ema": "ema_20",
+    "quantity": 100,
+}
+
+# Exit levels attached to every filled entry, as fractions of the fill price
+DEFAULT_EXITS = {
+    "stop_loss_pct": 0.02,
+    "take_profit_pct": 0.04,
+    "trail_pct": None,
+}
+
 # Example agent trading flow
 class TradingAgentExample:
+    def __init__(self, bar_store: BarStore = None, agent_id: str = "momentum-trader-001",
+                 strategy: Dict = None, risk_engine: RiskEngine = None,
+                 gateway: ExecutionGateway = None, monitor: PositionMonitor = None,
+                 exits: Dict = None):
+        self.agent_id = agent_id
+        self.strategy = {**DEFAULT_STRATEGY, **(strategy or {})}
+        # Shared across agents in production; standalone it runs on the schema defaults
+        if risk_engine is None:
+            risk_engine = RiskEngine()
+            risk_engine.set_limits(AgentLimits(agent_id))
+        self.risk = risk_engine
+        # Order routing; defaults to paper trading in a local order book
+        self.gateway = gateway or ExecutionGateway()
+        # One monitor can serve many agents; whoever owns it routes on_exit by agent_id
+        self.monitor = monitor or PositionMonitor(on_exit=self.close_position)
+        self.exits = {**DEFAULT_EXITS, **(exits or {})}
+        # Backtests replay millions of bars and turn per-trade printing off
+        self.verbose = True
+        # Incremental indicator state per symbol, updated once per new bar
+        self.indicators: Dict[str, StreamingIndicators] = {}
+        # Price history for backtests and batch indicators, shared across agents if passed in
+        self.bars = bar_store or BarStore()
+        # Per-stage latency of analyze_and_trade (latency.StageTimer); None turns it off
+        self.timings = PIPELINE_TIMINGS
+        # Set by AgentRuntime when hosted: shared market data hub and HTTP pool
+        self.market = None
+        self.http = None
+    
+    def export_state(self) -> Dict:
+        """JSON-ready agent_state.state: indicators, risk book and monitored positions"""
+        return {
+            "indicators": {symbol: ind.to_state() for symbol, ind in self.indicators.items()},
+            "risk": self.risk.export_book(self.agent_id),
+            "positions": [{
+                "symbol": position.symbol, "side": position.side, "quantity": position.quantity,
+                "entry_price": position.entry_price, "stop_loss": position.stop_loss,
+                "take_profit": position.take_profit, "trail_pct": position.trail_pct,
+            } for position in self.monitor.positions.values() if position.agent_id == self.agent_id],
+        }
+    
+    def restore_state(self, state: Dict):
+        """Resume from a saved agent_state.state without a warm-up replay
+
+        Trailing stops restart from the entry price; their high-water mark
+        is not saved.
+        """
+        self.indicators = {
+            symbol: StreamingIndicators.from_state(saved)
+            for symbol, saved in state.get("indicators", {}).items()
+        }
+        if "risk" in state:
+            self.risk.load_positions(self.agent_id, **state["risk"])
+        for saved in state.get("positions", ()):
+            key = (self.agent_id, saved["symbol"])
+            self.monitor.remove(key)
+            self.monitor.add(key, self.agent_id, **saved)
+
+    def open_orders(self) -> List[Order]:
+        """This agent's orders that are still working"""
+        return [order for order in self.gateway.orders.values()
+                if order.agent_id == self.agent_id and not order.is_final]
+
+    def detach(self):
+        """Drop this agent's positions and risk book from shared services it no longer runs on"""
+        for position in [p for p in self.monitor.positions.values() if p.agent_id == self.agent_id]:
+            self.monitor.remove(position.position_id)
+        self.risk.forget(self.agent_id)
+    
     async def analyze_and_trade(self, symbol: str):
         """Complete flow from analysis to execution"""
-        
-        # Step 1: Market Analysis
-        market_data = await self.get_market_data(symbol)
-        technical_indicators = await self.calculate_indicators(market_data)
-        
-        # Step 2: AI Decision Making
-        trade_decision = await self.make_trading_decision(
-            symbol=symbol,
-            market_data=market_data,
-            indicators=technical_indicators
-        )
-        
-        # Step 3: Risk Validation
-        if trade_decision.action in ['buy', 'sell']:
-            risk_approved = await self.validate_risk(trade_decision)
-            if not risk_approved:
-                print(f"Trade rejected by risk management: {trade_decision}")
-                return None
-        
-        # Step 4: Execute Trade
-        if trade_decision.action != 'hold':
-            trade_result = await self.execute_trade(trade_decision)
-            print(f"Trade executed: {trade_result}")
+        # Stage boundaries in monotonic ns for self.timings; None where a stage did not run
+        clock = time.monotonic_ns
+        started = clock()
+        fetched = computed = decided = checked = executed = None
+        try:
+            # Step 1: Market Analysis
+            market_data = await self.get_market_data(symbol)
+            fetched = clock()
+            technical_indicators = await self.calculate_indicators(market_data)
+            computed = clock()
             
-            # Step 5: Monitor Position
-            await self.start_position_monitoring(trade_result.order_id)
+            # Step 2: AI Decision Making
+            trade_decision = await self.make_trading_decision(
+                symbol=symbol,
+                market_data=market_data,
+                indicators=technical_indicators
+            )
+            decided = clock()
             
-        return trade_decision
+            # Step 3: Risk Validation
+            if trade_decision.action in ['buy', 'sell']:
+                risk_approved = await self.validate_risk(trade_decision)
+                checked = clock()
+                if not risk_approved:
+                    if self.verbose:
+                        print(f"Trade rejected by risk management: {trade_decision}")
+                    return None
+            
+            # Step 4: Execute Trade
+            if trade_decision.action != 'hold':
+                trade_result = await self.execute_trade(trade_decision, decided_ns=decided)
+                if self.verbose:
+                    # Only handed to the gateway so far; the fill arrives later
+                    print(f"Order {trade_result.status}: {trade_result}")
+                
+                # Step 5: Monitor Position
+                await self.start_position_monitoring(trade_result.order_id)
+                executed = clock()
+                
+            return trade_decision
+        finally:
+            if self.timings is not None:
+                self.timings.record(self.agent_id, (started, fetched, computed, decided, checked, executed))
     
     async def get_market_data(self, symbol: str) -> Dict:
         """Fetch real-time market data"""
+        if self.market is not None:
+            # Hosted: the runtime's hub has already stored the tick and checked exits once for all agents
+            return self.market.latest(symbol)
+        
         # This would connect to your market data service
-        return {
+        market_data = {
             "symbol": symbol,
             "price": 150.25,
             "volume": 1000000,
@@ -49,17 +162,19 @@ class TradingAgentExample:
             "ask": 150.30,
             "timestamp": datetime.utcnow()
         }
+        
+        self.bars.append_tick(symbol, time.time_ns(), market_data["price"], market_data["volume"])
+        self.monitor.on_price(symbol, market_data["price"])
+        self.risk.mark(symbol, market_data["price"])
+        self.gateway.print_trade(symbol, market_data["price"], market_data["volume"])
+        return market_data
     
     async def calculate_indicators(self, market_data: Dict) -> Dict:
-        """Calculate technical indicators"""
-        # This would use real calculations
-        return {
-            "rsi": 65.5,
-            "macd": {"value": 1.2, "signal": 0.8},
-            "ema_20": 148.50,
-            "ema_50": 145.00,
-            "volume_avg": 800000
-        }
+        """Update the symbol's technical indicators with the new bar"""
+        symbol = market_data["symbol"]
+        if symbol not in self.indicators:
+            self.indicators[symbol] = StreamingIndicators()
+        return self.indicators[symbol].update(market_data["price"], market_data.get("volume", 0.0))
     
     async def make_trading_decision(self, **kwargs) -> 'TradeDecision':
         """AI agent makes trading decision"""
@@ -68,17 +183,19 @@ class TradingAgentExample:
         
         indicators = kwargs['indicators']
         price = kwargs['market_data']['price']
+        strategy = self.strategy
+        trend_ema = strategy['trend_ema']
         
         # Example strategy logic
-        if indicators['rsi'] > 70:
+        if indicators['rsi'] > strategy['rsi_overbought']:
             action = 'sell'
             reasoning = "RSI indicates overbought conditions"
-        elif indicators['rsi'] < 30:
+        elif indicators['rsi'] < strategy['rsi_oversold']:
             action = 'buy'
             reasoning = "RSI indicates oversold conditions"
-        elif price > indicators['ema_20'] and indicators['macd']['value'] > indicators['macd']['signal']:
+        elif trend_ema and price > indicators[trend_ema] and indicators['macd']['value'] > indicators['macd']['signal']:
             action = 'buy'
-            reasoning = "Price above EMA20 and MACD crossover"
+            reasoning = f"Price above {trend_ema.upper().replace('_', '')} and MACD crossover"
         else:
             action = 'hold'
             reasoning = "No clear signal"
@@ -86,54 +203,140 @@ class TradingAgentExample:
         return TradeDecision(
             action=action,
             symbol=kwargs['symbol'],
-            quantity=100,
+            quantity=strategy['quantity'],
             price=price,
             reasoning=reasoning,
             confidence=0.75,
             strategy="momentum_rsi"
         )
     
-    async def execute_trade(self, decision: 'TradeDecision') -> 'TradeResult':
-        """Execute the trade through trading API"""
-        # This would call your actual trading API
-        order_data = {
-            "symbol": decision.symbol,
-            "side": decision.action,
-            "quantity": decision.quantity,
-            "order_type": "limit",
-            "price": decision.price,
-            "agent_id": "momentum-trader-001",
-            "strategy": decision.strategy,
-            "reasoning": decision.reasoning
-        }
-        
-        # Simulate API call
+    async def validate_risk(self, decision: 'TradeDecision') -> bool:
+        """Pre-trade limit check; approved trades are reserved against the limits"""
+        check = self.risk.check(self.agent_id, decision)
+        if not check and self.verbose:
+            print(f"🛡️  Risk check failed for {decision.symbol}: {check.reason}")
+        return check.approved
+    
+    async def execute_trade(self, decision: 'TradeDecision', decided_ns: Optional[int] = None) -> 'TradeResult':
+        """Route the order through the execution gateway without waiting on the broker
+
+        `decided_ns` (time.monotonic_ns() when the decision was made) starts
+        the gateway's decision-to-ack and decision-to-fill clocks.
+        """
+        order = self.gateway.submit_decision(self.agent_id, decision, order_type="limit",
+                                             decided_ns=decided_ns)
+        order.done.add_done_callback(lambda done: self._order_finished(decision, done.result()))
         return TradeResult(
-            order_id="ORD-12345",
-            status="filled",
-            filled_price=decision.price,
-            filled_quantity=decision.quantity,
+            order_id=order.client_order_id,
+            status=order.status,
+            filled_price=order.average_price,
+            filled_quantity=order.filled_quantity,
             timestamp=datetime.utcnow()
         )
+    
+    async def start_position_monitoring(self, order_id: str):
+        """Watch the position once the order fills; exits fire from price updates, not polling"""
+        order = self.gateway.orders.get(order_id)
+        if order is not None:
+            order.done.add_done_callback(lambda done: self._watch_fill(done.result()))
+    
+    def _watch_fill(self, order):
+        if order.filled_quantity > 0:
+            filled = order.filled_quantity if order.side == "buy" else -order.filled_quantity
+            self._net_position(order.symbol, filled, order.average_price)
+
+    def _net_position(self, symbol: str, quantity: float, price: float) -> Optional[MonitoredPosition]:
+        """Fold a signed fill into the agent's single monitored position in `symbol`
+
+        Adding averages the entry price, reducing keeps it (and the exit
+        levels), closing stops monitoring and going through zero starts a
+        new position at `price`.
+        """
+        key = (self.agent_id, symbol)
+        current = self.monitor.remove(key)
+        held = 0.0
+        entry = price
+        if current is not None:
+            held = current.quantity if current.side == LONG else -current.quantity
+            entry = current.entry_price
+        net = held + quantity
+        if net == 0:
+            return None
+        if held == 0 or (net > 0) != (held > 0):
+            entry = price
+        elif abs(net) > abs(held):
+            entry = (entry * abs(held) + price * abs(quantity)) / abs(net)
+        long = net > 0
+        stop_pct, target_pct = self.exits["stop_loss_pct"], self.exits["take_profit_pct"]
+        return self.monitor.add(
+            key, self.agent_id, symbol, LONG if long else SHORT, abs(net), entry,
+            stop_loss=entry * (1 - stop_pct if long else 1 + stop_pct) if stop_pct else None,
+            take_profit=entry * (1 + target_pct if long else 1 - target_pct) if target_pct else None,
+            trail_pct=self.exits["trail_pct"]
+        )
+
+    def close_position(self, position: MonitoredPosition, reason: str, price: float):
+        """Exit order for a position whose stop or target was hit"""
+        side = "sell" if position.side == LONG else "buy"
+        order = self.gateway.submit(self.agent_id, position.symbol, side, position.quantity, "market",
+                                    price, strategy="momentum_rsi", reasoning=reason)
+        order.done.add_done_callback(lambda done: self._exit_finished(position, done.result()))
+        if self.verbose:
+            print(f"🚪 {reason} on {position.symbol}: {side} {position.quantity:g} @ {price}")
+
+    def _exit_finished(self, position: MonitoredPosition, order):
+        """Book what the exit sold or covered; watch whatever it did not"""
+        # Exits bypass the entry checks (they only reduce risk) but still update exposure
+        if order.filled_quantity > 0:
+            self.risk.record_fill(self.agent_id, order.symbol, order.side, order.filled_quantity)
+        unfilled = position.quantity - order.filled_quantity
+        if unfilled > 0:
+            self._net_position(position.symbol, unfilled if position.side == LONG else -unfilled,
+                               position.entry_price)
+
+    def _order_finished(self, decision: 'TradeDecision', order):
+        """Give back risk reserved for any part of the order that never filled"""
+        if self.verbose:
+            print(f"Order {order.client_order_id} {order.status}: "
+                  f"{order.filled_quantity:g}/{order.quantity:g} {order.symbol}"
+                  + (f" @ {order.average_price:.2f}" if order.average_price is not None else "")
+                  + (f" ({order.reject_reason})" if order.reject_reason else ""))
+        if order.filled_quantity == 0:
+            self.risk.release(self.agent_id, decision)
+        elif order.filled_quantity < decision.quantity:
+            self.risk.adjust_fill(self.agent_id, decision, order.filled_quantity)
 
 # Data classes for structured responses
+# Slotted: no per-instance __dict__ and ~25% cheaper to build than a plain
+# class. Not frozen - a frozen dataclass __init__ costs twice as much, and
+# these are created for every scanned symbol. Treat them as read-only once
+# built; Pydantic models are only made from them at the API boundary.
+@dataclass(slots=True)
 class TradeDecision:
-    def __init__(self, action, symbol, quantity, price, reasoning, confidence, strategy):
-        self.action = action
-        self.symbol = symbol
-        self.quantity = quantity
-        self.price = price
-        self.reasoning = reasoning
-        self.confidence = confidence
-        self.strategy = strategy
+    action: str
+    symbol: str
+    quantity: float
+    price: Optional[float]
+    reasoning: str
+    confidence: float
+    strategy: str
 
+@dataclass(slots=True)
 class TradeResult:
-    def __init__(self, order_id, status, filled_price, filled_quantity, timestamp):
-        self.order_id = order_id
-        self.status = status
-        self.filled_price = filled_price
-        self.filled_quantity = filled_quantity
-        self.timestamp = timestamp
+    order_id: str
+    status: str
+    filled_price: float
+    filled_quantity: float
+    timestamp: Any
+
+def to_model(record, model_cls):
+    """Build a Pydantic model from a trusted record without re-validating it"""
+    values = {name: getattr(record, name) for name in model_cls.model_fields if hasattr(record, name)}
+    return model_cls.model_construct(**values)
+
+def from_model(model, record_cls=TradeDecision):
+    """Compact record from a (validated) Pydantic model, e.g. an LLM result"""
+    return record_cls(**{field.name: getattr(model, field.name) for field in fields(record_cls)})
 
 # Example usage
 async def main():
@@ -142,12 +345,9 @@ async def main():
     # Monitor multiple symbols
     symbols = ['AAPL', 'GOOGL', 'MSFT']
     
-    while True:
-        for symbol in symbols:
-            await agent.analyze_and_trade(symbol)
-        
-        # Wait before next analysis cycle
-        await asyncio.sleep(60)  # Check every minute
+    # Scan all symbols concurrently on a fixed one-minute grid
+    scheduler = ScanScheduler(agent.analyze_and_trade, symbols, interval=60, concurrency=256)
+    await scheduler.run()
 
 if __name__ == "__main__":
     asyncio.run(main())
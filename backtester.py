@@ -0,0 +1,455 @@
+"""
+Event-driven backtester for TradingAgentExample
+
+Historical bars are replayed in timestamp order through the agent's own
+analyze_and_trade pipeline (indicators -> make_trading_decision ->
+validate_risk -> execute_trade -> start_position_monitoring), so a
+backtest exercises exactly the code that trades live: the real
+RiskEngine, PositionMonitor exits and an OrderBookBroker working the
+orders. Only the edges are swapped out: get_market_data serves the bar
+being replayed, each bar is printed to the order book, and fills are
+booked on a SimulatedBroker account with slippage and fees.
+
+Nothing in the pipeline really waits during a replay, so each bar's
+coroutine is driven to completion directly instead of through an event
+loop - that is what keeps the replay in the millions of bars per minute.
+"""
+import math
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from agent_trading_example import TradeDecision, TradingAgentExample
+from execution_gateway import ExecutionGateway, Order
+from order_book import OrderBookBroker
+from risk_engine import AgentLimits, RiskEngine
+from tick_archive import NS_PER_DAY, TickArchive
+
+
+def run_sync(coro):
+    """Run a coroutine that never suspends and return its result"""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coro.close()
+    raise RuntimeError("backtest pipeline awaited real I/O; replay steps must not suspend")
+
+
+class FillModel:
+    """Slippage and commissions applied to every simulated fill"""
+
+    def __init__(self, slippage_bps: float = 2.0, fee_per_share: float = 0.005,
+                 min_fee: float = 1.0, fee_bps: float = 0.0):
+        self.slippage_bps = slippage_bps
+        self.fee_per_share = fee_per_share
+        self.min_fee = min_fee
+        self.fee_bps = fee_bps
+
+    def fill_price(self, side: str, price: float) -> float:
+        """Buys pay up and sells give up `slippage_bps` of the price"""
+        slip = price * self.slippage_bps / 10_000
+        return price + slip if side == "buy" else price - slip
+
+    def fee(self, quantity: float, price: float) -> float:
+        return max(self.min_fee, quantity * self.fee_per_share) + quantity * price * self.fee_bps / 10_000
+
+
+class Fill:
+    """One simulated execution; pnl is set when the fill reduces a position"""
+
+    __slots__ = ("timestamp", "symbol", "side", "quantity", "price", "fee", "pnl")
+
+    def __init__(self, timestamp: int, symbol: str, side: str, quantity: float,
+                 price: float, fee: float, pnl: Optional[float] = None):
+        self.timestamp = timestamp
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.price = price
+        self.fee = fee
+        self.pnl = pnl
+
+
+class SimulatedBroker:
+    """Cash, positions and fills for one backtest account
+
+    Equity is kept incrementally: marking a symbol to a new price adjusts the
+    running market value by position * price change, so reading equity after
+    every bar is O(1) however many symbols are held.
+    """
+
+    def __init__(self, initial_cash: float = 100_000.0, fill_model: Optional[FillModel] = None):
+        self.initial_cash = initial_cash
+        self.fill_model = fill_model or FillModel()
+        self.cash = initial_cash
+        self.positions: Dict[str, float] = {}
+        # Average entry price per share, entry fees included
+        self.avg_cost: Dict[str, float] = {}
+        self.last_prices: Dict[str, float] = {}
+        self.market_value = 0.0
+        self.fills: List[Fill] = []
+        # Replay clock: the bar being replayed and its index
+        self.timestamp = 0
+        self.step = 0
+
+    @property
+    def equity(self) -> float:
+        return self.cash + self.market_value
+
+    def position(self, symbol: str) -> float:
+        return self.positions.get(symbol, 0.0)
+
+    def mark(self, symbol: str, price: float):
+        last = self.last_prices.get(symbol)
+        if last is not None:
+            position = self.positions.get(symbol)
+            if position:
+                self.market_value += position * (price - last)
+        self.last_prices[symbol] = price
+
+    def execute(self, timestamp: int, symbol: str, side: str, quantity: float, price: float,
+                slippage: bool = True) -> Fill:
+        """Book a fill; limit orders pass slippage=False as they fill at their limit"""
+        fill_price = self.fill_model.fill_price(side, price) if slippage else price
+        fee = self.fill_model.fee(quantity, fill_price)
+        signed = quantity if side == "buy" else -quantity
+        position = self.positions.get(symbol, 0.0)
+        new_position = position + signed
+
+        self.cash -= signed * fill_price + fee
+        self.market_value += signed * self.last_prices.get(symbol, price)
+
+        pnl = None
+        if position and (position > 0) != (signed > 0):
+            # Reducing (or flipping) a position realizes P&L on the closed part
+            closed = min(abs(signed), abs(position))
+            direction = 1.0 if position > 0 else -1.0
+            pnl = closed * (fill_price - self.avg_cost[symbol]) * direction - fee * closed / quantity
+
+        if new_position == 0:
+            self.positions.pop(symbol, None)
+            self.avg_cost.pop(symbol, None)
+        else:
+            per_share_fee = fee / quantity
+            if position == 0 or (position > 0) != (new_position > 0):
+                # New or flipped position: the remainder opens at this fill
+                self.avg_cost[symbol] = fill_price + per_share_fee * (1 if new_position > 0 else -1)
+            elif abs(new_position) > abs(position):
+                entry = fill_price + per_share_fee * (1 if signed > 0 else -1)
+                self.avg_cost[symbol] = (position * self.avg_cost[symbol] + signed * entry) / new_position
+            self.positions[symbol] = new_position
+
+        fill = Fill(timestamp, symbol, side, quantity, fill_price, fee, pnl)
+        self.fills.append(fill)
+        return fill
+
+
+class ReplayFuture:
+    """The part of asyncio.Future the pipeline uses; callbacks run as soon as it is set"""
+
+    __slots__ = ("_result", "_done", "_callbacks")
+
+    def __init__(self):
+        self._result = None
+        self._done = False
+        self._callbacks: List[Callable] = []
+
+    def done(self) -> bool:
+        return self._done
+
+    def result(self):
+        return self._result
+
+    def set_result(self, result):
+        self._result = result
+        self._done = True
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback: Callable):
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+
+class ReplayGateway(ExecutionGateway):
+    """ExecutionGateway that hands orders to its book at once, without a router task
+
+    Fills are booked on the SimulatedBroker account; market orders pay
+    the fill model's slippage, limit orders fill at their limit.
+    """
+
+    def __init__(self, account: SimulatedBroker, order_ttl_bars: int = 1):
+        super().__init__(OrderBookBroker(ttl=order_ttl_bars, clock=lambda: account.step))
+        self.account = account
+
+    def next_client_order_id(self, agent_id: str) -> str:
+        return f"BT-{next(self._sequence)}"
+
+    def submit(self, agent_id: str, symbol: str, side: str, quantity: float,
+               order_type: str = "limit", price: Optional[float] = None,
+               stop_price: Optional[float] = None, strategy: str = "", reasoning: str = "",
+               client_order_id: Optional[str] = None, decided_ns: Optional[int] = None) -> Order:
+        if client_order_id is not None and client_order_id in self.orders:
+            return self.orders[client_order_id]
+        order = Order(client_order_id or self.next_client_order_id(agent_id), agent_id, symbol, side,
+                      quantity, order_type, price, stop_price, strategy, reasoning, decided_ns)
+        order.done = ReplayFuture()
+        self.orders[order.client_order_id] = order
+        self.backend.submit_now([order])
+        return order
+
+    def _on_fill(self, client_order_id: str, quantity: float, price: float):
+        order = self.orders.get(client_order_id)
+        if order is None or order.is_final:
+            return
+        account = self.account
+        fill = account.execute(account.timestamp, order.symbol, order.side, quantity, price,
+                               slippage=order.order_type != "limit")
+        super()._on_fill(client_order_id, quantity, fill.price)
+
+
+def backtest_limits(agent_id: str) -> AgentLimits:
+    """Permissions for a replay: no symbol, strategy, size or daily-count limits"""
+    return AgentLimits(agent_id, max_trade_size=None, max_position_size=math.inf,
+                       max_daily_trades=2 ** 62, allowed_symbols=None, allowed_strategies=None,
+                       risk_level="aggressive")
+
+
+class BacktestAgent(TradingAgentExample):
+    """TradingAgentExample with market data and execution wired to a replay
+
+    validate_risk is the agent's own RiskEngine check, on `limits` and bar
+    time, plus the account checks: a position limit in shares, no shorting
+    unless allowed, and cash for buys.
+    """
+
+    def __init__(self, broker: SimulatedBroker, max_position: Optional[float] = None,
+                 allow_short: bool = False, agent_id: str = "momentum-trader-001",
+                 strategy: Optional[Dict] = None, limits: Optional[AgentLimits] = None,
+                 exits: Optional[Dict] = None, order_ttl_bars: int = 1):
+        risk = RiskEngine(fetch=lambda since: [], clock=lambda: broker.timestamp / 1e9)
+        risk.set_limits(limits or backtest_limits(agent_id))
+        super().__init__(agent_id=agent_id, strategy=strategy, risk_engine=risk,
+                         gateway=ReplayGateway(broker, order_ttl_bars), exits=exits)
+        self.verbose = False
+        self.timings = None
+        self.broker = broker
+        # Defaults to one lot of the strategy's order quantity
+        self.max_position = self.strategy["quantity"] if max_position is None else max_position
+        self.allow_short = allow_short
+        self.bar: Dict = {}
+
+    async def get_market_data(self, symbol: str) -> Dict:
+        return self.bar
+
+    async def validate_risk(self, decision: TradeDecision) -> bool:
+        if not await super().validate_risk(decision):
+            return False
+        # The risk book already holds this order and any still working
+        position = self.risk.book(self.agent_id).positions.get(decision.symbol, 0.0)
+        if decision.action == "buy":
+            approved = position <= self.max_position and \
+                self.broker.cash >= decision.quantity * decision.price
+        else:
+            approved = (position >= 0 or self.allow_short) and -position <= self.max_position
+        if not approved:
+            self.risk.release(self.agent_id, decision)
+        return approved
+
+    def bar_handler(self) -> Callable[[str, float, float], None]:
+        """Market data side of one bar: fill resting orders, fire exits, mark risk"""
+        print_trade = self.gateway.backend.print_trade
+        on_price = self.monitor.on_price
+        mark = self.risk.mark
+
+        def on_bar(symbol: str, price: float, volume: float):
+            print_trade(symbol, price, volume)
+            on_price(symbol, price)
+            mark(symbol, price)
+
+        return on_bar
+
+
+class BacktestResult:
+    """Equity curve, fills and summary metrics of one run"""
+
+    def __init__(self, timestamps: np.ndarray, equity: np.ndarray, fills: List[Fill],
+                 initial_cash: float, bars: int, elapsed: float):
+        self.timestamps = timestamps
+        self.equity = equity
+        self.fills = fills
+        self.initial_cash = initial_cash
+        self.bars = bars
+        self.elapsed = elapsed
+
+    @property
+    def bars_per_minute(self) -> float:
+        return self.bars / self.elapsed * 60 if self.elapsed else 0.0
+
+    def drawdown(self) -> np.ndarray:
+        """Distance below the running equity peak at every timestamp"""
+        if len(self.equity) == 0:
+            return self.equity
+        return np.maximum.accumulate(np.r_[self.initial_cash, self.equity])[1:] - self.equity
+
+    def daily_equity(self) -> np.ndarray:
+        """Closing equity of each UTC day in the run"""
+        if len(self.equity) == 0:
+            return self.equity
+        days = self.timestamps // NS_PER_DAY
+        last_of_day = np.flatnonzero(np.r_[days[1:] != days[:-1], True])
+        return self.equity[last_of_day]
+
+    def sharpe_ratio(self, periods_per_year: int = 252) -> Optional[float]:
+        """Annualized Sharpe ratio of daily returns (risk-free rate 0)"""
+        daily = np.r_[self.initial_cash, self.daily_equity()]
+        returns = np.diff(daily) / daily[:-1]
+        if len(returns) < 2 or returns.std() == 0:
+            return None
+        return float(returns.mean() / returns.std(ddof=1) * math.sqrt(periods_per_year))
+
+    def metrics(self) -> Dict:
+        closed = [fill.pnl for fill in self.fills if fill.pnl is not None]
+        winning = sum(1 for pnl in closed if pnl > 0)
+        final = float(self.equity[-1]) if len(self.equity) else self.initial_cash
+        drawdown = self.drawdown()
+        max_drawdown = float(drawdown.max()) if len(drawdown) else 0.0
+        peak = max_drawdown + float(self.equity[drawdown.argmax()]) if len(drawdown) else self.initial_cash
+        return {
+            "bars": self.bars,
+            "orders": len(self.fills),
+            "total_trades": len(closed),
+            "winning_trades": winning,
+            "losing_trades": sum(1 for pnl in closed if pnl < 0),
+            "win_rate": winning / len(closed) * 100 if closed else 0.0,
+            "total_pnl": final - self.initial_cash,
+            "total_return": (final / self.initial_cash - 1) * 100,
+            "fees": sum(fill.fee for fill in self.fills),
+            "avg_trade_size": (sum(fill.quantity * fill.price for fill in self.fills) / len(self.fills)
+                               if self.fills else 0.0),
+            "max_drawdown": max_drawdown,
+            "max_drawdown_pct": max_drawdown / peak * 100 if peak else 0.0,
+            "sharpe_ratio": self.sharpe_ratio(),
+        }
+
+    def agent_performance(self, agent_id: str, performance_period: str = "backtest") -> Dict:
+        """Row shaped like the agent_performance table (win_rate is generated there)"""
+        metrics = self.metrics()
+        last_trade = self.fills[-1].timestamp if self.fills else None
+        return {
+            "agent_id": agent_id,
+            "total_trades": metrics["total_trades"],
+            "winning_trades": metrics["winning_trades"],
+            "losing_trades": metrics["losing_trades"],
+            "total_pnl": round(metrics["total_pnl"], 2),
+            "avg_trade_size": round(metrics["avg_trade_size"], 2),
+            "max_drawdown": round(metrics["max_drawdown"], 2),
+            "sharpe_ratio": None if metrics["sharpe_ratio"] is None else round(metrics["sharpe_ratio"], 4),
+            "last_trade_at": (datetime.fromtimestamp(last_trade / 1e9, tz=timezone.utc)
+                              if last_trade is not None else None),
+            "performance_period": performance_period,
+        }
+
+    def summary(self) -> str:
+        m = self.metrics()
+        sharpe = "n/a" if m["sharpe_ratio"] is None else f"{m['sharpe_ratio']:.2f}"
+        return (f"{m['bars']:,} bars in {self.elapsed:.2f}s ({self.bars_per_minute / 1e6:.2f}M bars/min): "
+                f"{m['total_trades']} trades, win rate {m['win_rate']:.1f}%, "
+                f"P&L ${m['total_pnl']:,.2f} ({m['total_return']:+.2f}%), "
+                f"max drawdown ${m['max_drawdown']:,.2f}, Sharpe {sharpe}")
+
+
+class Backtester:
+    """Replays (symbols, bars) price matrices through a fresh BacktestAgent"""
+
+    def __init__(self, fill_model: Optional[FillModel] = None, initial_cash: float = 100_000.0,
+                 max_position: Optional[float] = None, allow_short: bool = False,
+                 strategy: Optional[Dict] = None, limits: Optional[AgentLimits] = None,
+                 exits: Optional[Dict] = None,
+                 agent_factory: Optional[Callable[[SimulatedBroker], BacktestAgent]] = None):
+        self.fill_model = fill_model or FillModel()
+        self.initial_cash = initial_cash
+        self.max_position = max_position
+        self.allow_short = allow_short
+        self.strategy = strategy
+        self.limits = limits
+        self.exits = exits
+        self.agent_factory = agent_factory or self._default_agent
+
+    def _default_agent(self, broker: SimulatedBroker) -> BacktestAgent:
+        return BacktestAgent(broker, max_position=self.max_position, allow_short=self.allow_short,
+                             strategy=self.strategy, limits=self.limits, exits=self.exits)
+
+    def run(self, symbols: List[str], timestamps: np.ndarray, close: np.ndarray,
+            volume: Optional[np.ndarray] = None) -> BacktestResult:
+        """Replay bars in timestamp order; NaN marks a symbol with no bar at that time
+
+        `close` and `volume` are (symbols, bars) on the shared `timestamps`
+        axis, as returned by TickArchive.read_matrix. Resting orders fill
+        against at most a bar's volume; without `volume` it is unlimited.
+        """
+        close = np.asarray(close, dtype=np.float64).reshape(len(symbols), -1)
+        volume = np.full_like(close, math.inf) if volume is None else np.asarray(volume, dtype=np.float64)
+        broker = SimulatedBroker(self.initial_cash, self.fill_model)
+        agent = self.agent_factory(broker)
+        analyze = agent.analyze_and_trade
+        on_bar = agent.bar_handler()
+        mark = broker.mark
+
+        # Plain Python lists are much faster than NumPy scalars in the per-bar loop
+        prices = close.T.tolist()
+        volumes = volume.T.tolist()
+        stamps = np.asarray(timestamps, dtype=np.int64).tolist()
+        equity = np.empty(len(stamps))
+        bars = 0
+
+        started = time.perf_counter()
+        for t, timestamp in enumerate(stamps):
+            broker.timestamp = timestamp
+            broker.step = t
+            for symbol, price, size in zip(symbols, prices[t], volumes[t]):
+                if price != price:  # NaN: no bar for this symbol
+                    continue
+                mark(symbol, price)
+                on_bar(symbol, price, size)
+                agent.bar = {"symbol": symbol, "price": price, "volume": size,
+                             "bid": price, "ask": price, "timestamp": timestamp}
+                run_sync(analyze(symbol))
+                bars += 1
+            equity[t] = broker.cash + broker.market_value
+        elapsed = time.perf_counter() - started
+
+        return BacktestResult(np.asarray(timestamps, dtype=np.int64), equity, broker.fills,
+                              self.initial_cash, bars, elapsed)
+
+    def run_archive(self, archive: TickArchive, symbols: List[str], start_ns: int, end_ns: int) -> BacktestResult:
+        """Backtest straight from the on-disk bar archive"""
+        timestamps, close = archive.read_matrix(symbols, start_ns, end_ns, "close")
+        _, volume = archive.read_matrix(symbols, start_ns, end_ns, "volume")
+        return self.run(symbols, timestamps, close, np.nan_to_num(volume))
+
+
+def synthetic_bars(symbols: int = 10, bars: int = 100_000, seed: int = 7,
+                   bar_seconds: int = 60) -> Dict:
+    """Random-walk minute bars for trying the backtester without an archive"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, (symbols, bars)), axis=-1))
+    start = int(datetime(2024, 1, 2, tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+    return {
+        "symbols": [f"SYM{i}" for i in range(symbols)],
+        "timestamps": start + np.arange(bars, dtype=np.int64) * bar_seconds * 1_000_000_000,
+        "close": close,
+        "volume": rng.integers(1_000, 100_000, (symbols, bars)).astype(np.float64),
+    }
+
+
+if __name__ == "__main__":
+    data = synthetic_bars()
+    result = Backtester().run(data["symbols"], data["timestamps"], data["close"], data["volume"])
+    print(f"📈 {result.summary()}")
@@ -0,0 +1,288 @@
+"""
+Columnar in-memory bar and tick store for market data
+
+Each symbol gets fixed-size NumPy ring buffers per timeframe, one
+contiguous column per field (timestamp/open/high/low/close/volume).
+Rings are written twice - at slot i and i + capacity - so the last N
+bars are always one contiguous slice: windows are zero-copy views and
+appends are O(1). Views alias the ring and are overwritten once the ring
+wraps past them; copy them if they need to outlive `capacity` appends.
+
+Ticks and bars appended at the finest timeframe roll up incrementally
+into the coarser ones (1s -> 1m -> 1h by default).
+
+Timestamps are int64 epoch nanoseconds.
+
+Rings are allocated in full the first time a symbol is written: 48 bytes
+per bar slot, doubled by the second copy, per timeframe. The defaults (3
+timeframes x 256 bars, enough for the 200-bar indicator windows) come to
+72 KB per symbol, about 360 MB for a 5,000-symbol universe. Reads never
+allocate; unknown symbols read as None.
+"""
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+BAR_FIELDS = ("timestamp",) + PRICE_FIELDS
+TICK_FIELDS = ("timestamp", "price", "size")
+
+NS_PER_SECOND = 1_000_000_000
+TIMEFRAME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def timeframe_ns(timeframe: str) -> int:
+    """'1s', '5m', '1h' -> bucket width in nanoseconds"""
+    try:
+        return int(timeframe[:-1]) * TIMEFRAME_UNITS[timeframe[-1]] * NS_PER_SECOND
+    except (KeyError, ValueError):
+        raise ValueError(f"invalid timeframe {timeframe!r}, expected e.g. '1s', '1m', '1h'")
+
+
+class BarRing:
+    """Fixed-capacity ring of OHLCV bars with contiguous trailing windows"""
+
+    __slots__ = ("capacity", "timestamps", "columns", "_head", "_count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        # One row per price field, so each field is a contiguous column
+        self.columns = np.zeros((len(PRICE_FIELDS), 2 * capacity), dtype=np.float64)
+        self._head = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: int, open_: float, high: float, low: float, close: float, volume: float):
+        i = self._head
+        j = i + self.capacity
+        self.timestamps[i] = self.timestamps[j] = timestamp
+        values = (open_, high, low, close, volume)
+        self.columns[:, i] = values
+        self.columns[:, j] = values
+        self._head = (i + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def _last_slot(self) -> int:
+        return (self._head - 1) % self.capacity
+
+    def last_timestamp(self) -> Optional[int]:
+        return int(self.timestamps[self._last_slot()]) if self._count else None
+
+    def merge_last(self, high: float, low: float, close: float, volume: float):
+        """Fold more trading into the most recent (still open) bar"""
+        for slot in (self._last_slot(), self._last_slot() + self.capacity):
+            column = self.columns[:, slot]
+            column[1] = max(column[1], high)
+            column[2] = min(column[2], low)
+            column[3] = close
+            column[4] += volume
+
+    def _span(self, n: Optional[int]) -> slice:
+        n = self._count if n is None else min(n, self._count)
+        end = self._head + self.capacity
+        return slice(end - n, end)
+
+    def window(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Zero-copy views of the last n bars, oldest first"""
+        span = self._span(n)
+        window = {"timestamp": self.timestamps[span]}
+        for row, field in enumerate(PRICE_FIELDS):
+            window[field] = self.columns[row, span]
+        return window
+
+    def column(self, field: str, n: Optional[int] = None) -> np.ndarray:
+        span = self._span(n)
+        if field == "timestamp":
+            return self.timestamps[span]
+        return self.columns[PRICE_FIELDS.index(field), span]
+
+    def bar(self, offset: int = 0) -> Dict:
+        """O(1) access to the bar `offset` positions back from the latest"""
+        if offset >= self._count:
+            raise IndexError("bar offset out of range")
+        slot = (self._head - 1 - offset) % self.capacity
+        bar = {"timestamp": int(self.timestamps[slot])}
+        for row, field in enumerate(PRICE_FIELDS):
+            bar[field] = float(self.columns[row, slot])
+        return bar
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.columns.nbytes
+
+
+class TickRing:
+    """Fixed-capacity ring of raw trades, laid out like BarRing"""
+
+    __slots__ = ("capacity", "timestamps", "prices", "sizes", "_head", "_count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self.prices = np.zeros(2 * capacity, dtype=np.float64)
+        self.sizes = np.zeros(2 * capacity, dtype=np.float64)
+        self._head = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: int, price: float, size: float):
+        for slot in (self._head, self._head + self.capacity):
+            self.timestamps[slot] = timestamp
+            self.prices[slot] = price
+            self.sizes[slot] = size
+        self._head = (self._head + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def window(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        n = self._count if n is None else min(n, self._count)
+        end = self._head + self.capacity
+        span = slice(end - n, end)
+        return {"timestamp": self.timestamps[span], "price": self.prices[span], "size": self.sizes[span]}
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.prices.nbytes + self.sizes.nbytes
+
+
+class SymbolSeries:
+    """All rings for one symbol"""
+
+    __slots__ = ("ticks", "bars")
+
+    def __init__(self, timeframes: Dict[str, int], capacities: Dict[str, int], tick_capacity: int):
+        self.ticks = TickRing(tick_capacity) if tick_capacity else None
+        self.bars = {timeframe: BarRing(capacities[timeframe]) for timeframe in timeframes}
+
+
+class BarStore:
+    """Per-symbol columnar bars at several timeframes, plus recent ticks"""
+
+    def __init__(self, timeframes: Iterable[str] = ("1s", "1m", "1h"),
+                 capacity: Union[int, Dict[str, int]] = 256, tick_capacity: int = 0):
+        widths = {timeframe: timeframe_ns(timeframe) for timeframe in timeframes}
+        # Finest first, so roll-ups always flow from small to large buckets
+        self.timeframes = dict(sorted(widths.items(), key=lambda item: item[1]))
+        if isinstance(capacity, int):
+            capacity = {timeframe: capacity for timeframe in self.timeframes}
+        self.capacities = capacity
+        self.tick_capacity = tick_capacity
+        self.base_timeframe = next(iter(self.timeframes))
+        self._series: Dict[str, SymbolSeries] = {}
+
+    def symbols(self) -> List[str]:
+        return list(self._series)
+
+    def _get(self, symbol: str) -> SymbolSeries:
+        series = self._series.get(symbol)
+        if series is None:
+            series = SymbolSeries(self.timeframes, self.capacities, self.tick_capacity)
+            self._series[symbol] = series
+        return series
+
+    def append_tick(self, symbol: str, timestamp: int, price: float, size: float = 0.0):
+        """Record a trade and fold it into every timeframe's current bar"""
+        series = self._get(symbol)
+        if series.ticks is not None:
+            series.ticks.append(timestamp, price, size)
+        self._roll_up(series, timestamp, price, price, price, price, size, self.timeframes)
+
+    def append_bar(self, symbol: str, timestamp: int, open_: float, high: float, low: float,
+                   close: float, volume: float, timeframe: Optional[str] = None):
+        """Record a completed bar at `timeframe` and roll it into coarser ones"""
+        timeframe = timeframe or self.base_timeframe
+        width = self.timeframes[timeframe]
+        coarser = {tf: w for tf, w in self.timeframes.items() if w >= width}
+        self._roll_up(self._get(symbol), timestamp, open_, high, low, close, volume, coarser)
+
+    @staticmethod
+    def _roll_up(series: SymbolSeries, timestamp: int, open_: float, high: float, low: float,
+                 close: float, volume: float, timeframes: Dict[str, int]):
+        for timeframe, width in timeframes.items():
+            ring = series.bars[timeframe]
+            bucket = timestamp - timestamp % width
+            if ring.last_timestamp() == bucket:
+                ring.merge_last(high, low, close, volume)
+            else:
+                ring.append(bucket, open_, high, low, close, volume)
+
+    def window(self, symbol: str, timeframe: Optional[str] = None,
+               n: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        """Zero-copy views of the last n bars for a symbol, None if it has none"""
+        series = self._series.get(symbol)
+        if series is None:
+            return None
+        return series.bars[timeframe or self.base_timeframe].window(n)
+
+    def ticks(self, symbol: str, n: Optional[int] = None) -> Optional[Dict[str, np.ndarray]]:
+        if self.tick_capacity == 0:
+            raise ValueError("tick storage is disabled (tick_capacity=0)")
+        series = self._series.get(symbol)
+        return series.ticks.window(n) if series is not None else None
+
+    def latest(self, symbol: str, timeframe: Optional[str] = None, offset: int = 0) -> Optional[Dict]:
+        series = self._series.get(symbol)
+        if series is None:
+            return None
+        ring = series.bars[timeframe or self.base_timeframe]
+        return ring.bar(offset) if len(ring) > offset else None
+
+    def matrix(self, symbols: List[str], field: str = "close", n: int = 200,
+               timeframe: Optional[str] = None) -> np.ndarray:
+        """(symbols, n) array for the indicator engine, NaN-padded on the left
+
+        This is the one place data is copied: rows from separate rings are
+        stacked into a single array.
+        """
+        timeframe = timeframe or self.base_timeframe
+        out = np.full((len(symbols), n), np.nan)
+        for row, symbol in enumerate(symbols):
+            series = self._series.get(symbol)
+            if series is None:
+                continue
+            column = series.bars[timeframe].column(field, n)
+            if len(column):
+                out[row, n - len(column):] = column
+        return out
+
+    def memory_bytes(self) -> int:
+        """Fixed footprint of everything allocated so far"""
+        total = 0
+        for series in self._series.values():
+            total += sum(ring.nbytes for ring in series.bars.values())
+            if series.ticks is not None:
+                total += series.ticks.nbytes
+        return total
+
+
+def resample(bars: Dict[str, np.ndarray], timeframe: str) -> Dict[str, np.ndarray]:
+    """Vectorized OHLCV resample of a bar window into coarser buckets
+
+    `bars` is a window as returned by BarStore.window (timestamps ascending).
+    Tick windows work too when passed as {"timestamp", "price", "size"}.
+    """
+    if "price" in bars:
+        bars = {"timestamp": bars["timestamp"], "open": bars["price"], "high": bars["price"],
+                "low": bars["price"], "close": bars["price"], "volume": bars["size"]}
+    timestamps = np.asarray(bars["timestamp"])
+    if len(timestamps) == 0:
+        return {field: np.asarray(bars[field])[:0] for field in BAR_FIELDS}
+
+    width = timeframe_ns(timeframe)
+    buckets = timestamps - timestamps % width
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+    return {
+        "timestamp": buckets[starts],
+        "open": np.asarray(bars["open"])[starts],
+        "high": np.maximum.reduceat(bars["high"], starts),
+        "low": np.minimum.reduceat(bars["low"], starts),
+        "close": np.asarray(bars["close"])[ends],
+        "volume": np.add.reduceat(bars["volume"], starts),
+    }
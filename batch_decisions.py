@@ -0,0 +1,176 @@
+"""
+Vectorized make_trading_decision over a whole symbol universe
+
+decide() applies the example strategy's rules to (symbols,) indicator
+arrays, as produced by indicators.compute_indicators, with boolean masks
+instead of per-symbol if-chains. It returns a DecisionBatch of small integer
+action and reason codes; TradeDecision objects are only built for the
+symbols that actually trade, so holding symbols cost a few bytes each.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from agent_trading_example import DEFAULT_STRATEGY, TradeDecision, TradingAgentExample, to_model
+
+HOLD, BUY, SELL = 0, 1, 2
+ACTIONS = ("hold", "buy", "sell")
+
+NO_SIGNAL, OVERBOUGHT, OVERSOLD, MOMENTUM = 0, 1, 2, 3
+REASONS = (
+    "No clear signal",
+    "RSI indicates overbought conditions",
+    "RSI indicates oversold conditions",
+    "Price above {trend} and MACD crossover",
+)
+
+# Same constants as the per-symbol strategy
+CONFIDENCE = 0.75
+STRATEGY_NAME = "momentum_rsi"
+
+
+class DecisionBatch:
+    """Struct-of-arrays decisions for a symbol universe
+
+    One int8/float64 column per field instead of one object per symbol;
+    rows become TradeDecision records (or Pydantic models) only on request.
+    Batches packed from existing decisions also carry each row's own
+    reasoning and strategy, so LLM decisions survive the round trip.
+    """
+
+    __slots__ = ("symbols", "action", "reason", "confidence", "price", "quantity", "trend",
+                 "reasoning", "strategy")
+
+    def __init__(self, symbols: List[str], action: np.ndarray, reason: np.ndarray,
+                 confidence: np.ndarray, price: np.ndarray, quantity: np.ndarray, trend: str = "",
+                 reasoning: Optional[List[str]] = None, strategy: Optional[List[str]] = None):
+        self.symbols = symbols
+        self.action = action
+        self.reason = reason
+        self.confidence = confidence
+        self.price = price
+        self.quantity = quantity
+        # Trend EMA name for the momentum reasoning text, e.g. "EMA20"
+        self.trend = trend
+        # Per-row text and strategy name; None means the rule texts and STRATEGY_NAME
+        self.reasoning = reasoning
+        self.strategy = strategy
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def trade_rows(self) -> np.ndarray:
+        """Indices of the rows that buy or sell"""
+        return np.flatnonzero(self.action != HOLD)
+
+    def decision(self, row: int) -> TradeDecision:
+        price = float(self.price[row])
+        return TradeDecision(
+            action=ACTIONS[self.action[row]],
+            symbol=self.symbols[row],
+            quantity=float(self.quantity[row]),
+            price=None if price != price else price,
+            reasoning=(self.reasoning[row] if self.reasoning is not None
+                       else REASONS[self.reason[row]].format(trend=self.trend)),
+            confidence=float(self.confidence[row]),
+            strategy=self.strategy[row] if self.strategy is not None else STRATEGY_NAME
+        )
+
+    def to_decisions(self) -> List[TradeDecision]:
+        """TradeDecision records for the non-hold rows only"""
+        return [self.decision(row) for row in self.trade_rows().tolist()]
+
+    def to_models(self, model_cls) -> list:
+        """Pydantic models for the non-hold rows, for the API boundary"""
+        return [to_model(decision, model_cls) for decision in self.to_decisions()]
+
+    @classmethod
+    def from_decisions(cls, decisions: List[TradeDecision], trend_ema: Optional[str] = None) -> "DecisionBatch":
+        """Pack records (or Pydantic models) back into columns
+
+        Reason codes are recovered from the rule texts (with `trend_ema`,
+        default the strategy's, in the momentum text); other reasoning,
+        e.g. from the model, codes as NO_SIGNAL but is kept verbatim.
+        """
+        trend = trend_label(DEFAULT_STRATEGY["trend_ema"] if trend_ema is None else trend_ema)
+        codes = {text.format(trend=trend): code for code, text in enumerate(REASONS)}
+        return cls(
+            symbols=[d.symbol for d in decisions],
+            action=np.array([ACTIONS.index(d.action) for d in decisions], dtype=np.int8),
+            reason=np.array([codes.get(d.reasoning, NO_SIGNAL) for d in decisions], dtype=np.int8),
+            confidence=np.array([d.confidence for d in decisions], dtype=np.float64),
+            price=np.array([np.nan if d.price is None else d.price for d in decisions], dtype=np.float64),
+            quantity=np.array([d.quantity for d in decisions], dtype=np.float64),
+            trend=trend,
+            reasoning=[d.reasoning for d in decisions],
+            strategy=[d.strategy for d in decisions],
+        )
+
+
+def trend_label(trend_ema: Optional[str]) -> str:
+    """'ema_20' -> 'EMA20', as it appears in the momentum reasoning"""
+    return (trend_ema or "").upper().replace("_", "")
+
+
+def decide(symbols: List[str], batch: Dict[str, np.ndarray], strategy: Optional[Dict] = None) -> DecisionBatch:
+    """Decisions for every symbol in `batch`, as one DecisionBatch
+
+    Rules are checked in the same priority order as make_trading_decision
+    and NaN indicators (not enough history) compare false, so each row
+    matches what the per-symbol path would decide.
+    """
+    strategy = {**DEFAULT_STRATEGY, **(strategy or {})}
+    rsi = batch["rsi"]
+    trend_ema = strategy["trend_ema"]
+
+    overbought = rsi > strategy["rsi_overbought"]
+    oversold = rsi < strategy["rsi_oversold"]
+    if trend_ema:
+        momentum = (batch["price"] > batch[trend_ema]) & (batch["macd"] > batch["macd_signal"])
+    else:
+        momentum = np.zeros(rsi.shape, dtype=bool)
+
+    reason = np.select([overbought, oversold, momentum], [OVERBOUGHT, OVERSOLD, MOMENTUM],
+                       NO_SIGNAL).astype(np.int8)
+    # Reason codes map onto actions: overbought sells, oversold and momentum buy
+    action = np.array([HOLD, SELL, BUY, BUY], dtype=np.int8)[reason]
+    return DecisionBatch(
+        symbols=list(symbols),
+        action=action,
+        reason=reason,
+        confidence=np.full(rsi.shape, CONFIDENCE),
+        price=batch["price"],
+        quantity=np.full(rsi.shape, float(strategy["quantity"])),
+        trend=trend_label(trend_ema),
+    )
+
+
+def verify_against_agent(symbols: int = 2000, bars: int = 300) -> bool:
+    """Check decide() against TradingAgentExample.make_trading_decision row by row"""
+    import asyncio
+
+    from indicators import compute_indicators, indicators_for
+
+    rng = np.random.default_rng(11)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (symbols, bars)), axis=-1))
+    # Short histories leave NaN indicators in some rows
+    close[: symbols // 10, : bars - 30] = np.nan
+    batch = compute_indicators(close)
+    decided = decide([f"S{row}" for row in range(symbols)], batch)
+
+    agent = TradingAgentExample()
+    mismatches = 0
+    for row in range(symbols):
+        decision = asyncio.run(agent.make_trading_decision(
+            symbol=f"S{row}", market_data={"price": float(batch["price"][row])},
+            indicators=indicators_for(batch, row)))
+        if decision.action != ACTIONS[decided.action[row]]:
+            mismatches += 1
+    ok = mismatches == 0
+    print(f"{'✅' if ok else '❌'} batch decisions match make_trading_decision "
+          f"({symbols} symbols, {mismatches} mismatches)")
+    return ok
+
+
+if __name__ == "__main__":
+    verify_against_agent()
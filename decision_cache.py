@@ -0,0 +1,209 @@
+"""
+Decision cache for LLM-backed trading agents
+
+Asking the model is slow and costs money, and most ticks barely change
+what it sees. DecisionCache keys each decision on a quantized feature
+vector - log-price bucket, RSI band, MACD histogram sign and position
+side - so ticks that land in the same cell reuse the answer:
+
+- entries expire after `ttl` seconds;
+- when a symbol's position side changes (a fill) its entries are dropped,
+  and invalidate() does the same for other material events such as news;
+- concurrent lookups of a key that is already being computed await the
+  same call instead of starting another. The call runs in its own task,
+  so a waiter that is cancelled (a step timeout, say) leaves it running
+  for the others; it is cancelled only once nobody is waiting.
+
+StubModel stands in for pydantic_ai.Agent in tests: same run() shape,
+deterministic rule-based answers and a configurable delay.
+"""
+import asyncio
+import math
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+FeatureKey = Tuple[str, int, int, int, int]
+
+
+def _sign(value: float) -> int:
+    return (value > 0) - (value < 0)
+
+
+def feature_key(symbol: str, price: float, rsi: Optional[float], macd: Optional[Dict],
+                position: float = 0.0, price_step: float = 0.005, rsi_band: float = 5.0) -> FeatureKey:
+    """Quantize the model's inputs: (symbol, price bucket, RSI band, MACD sign, position side)
+
+    Price buckets are `price_step` wide in log space, so they are the same
+    relative width at any price level.
+    """
+    bucket = int(math.floor(math.log(price) / math.log1p(price_step))) if price > 0 else 0
+    # Indicators still warming up (None or NaN) get a band of their own
+    band = int(rsi // rsi_band) if rsi is not None and rsi == rsi else -1
+    if macd and macd.get("value") is not None and macd.get("signal") is not None:
+        histogram = _sign(macd["value"] - macd["signal"])
+    else:
+        histogram = 0
+    return symbol, bucket, band, histogram, _sign(position)
+
+
+class Inflight:
+    """A compute task shared by every lookup of one key"""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class DecisionCache:
+    """TTL cache of model decisions keyed on quantized features, with request coalescing"""
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 100_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (decision, expires_at); insertion order doubles as age for eviction
+        self._entries: Dict[FeatureKey, Tuple[Any, float]] = {}
+        self._inflight: Dict[FeatureKey, Inflight] = {}
+        self._position_side: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+
+    def get(self, key: FeatureKey) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[0]
+
+    def put(self, key: FeatureKey, decision: Any):
+        entries = self._entries
+        entries.pop(key, None)
+        entries[key] = (decision, time.monotonic() + self.ttl)
+        while len(entries) > self.max_entries:
+            del entries[next(iter(entries))]
+
+    def invalidate(self, symbol: Optional[str] = None) -> int:
+        """Drop every entry for `symbol` (or all); returns how many"""
+        if symbol is None:
+            dropped = len(self._entries)
+            self._entries.clear()
+        else:
+            stale = [key for key in self._entries if key[0] == symbol]
+            for key in stale:
+                del self._entries[key]
+            dropped = len(stale)
+        self.invalidations += dropped
+        return dropped
+
+    async def get_or_compute(self, key: FeatureKey, compute: Callable[[], Awaitable[Any]],
+                             keep: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Cached decision for `key`, or the result of one shared call to `compute`
+
+        Results for which `keep` returns False (e.g. fallbacks) are handed to
+        every waiter but not stored.
+        """
+        symbol, side = key[0], key[4]
+        if self._position_side.get(symbol, side) != side:
+            self.invalidate(symbol)  # Position opened, closed or flipped
+        self._position_side[symbol] = side
+
+        decision = self.get(key)
+        if decision is not None:
+            self.hits += 1
+            return decision
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            inflight = self._inflight[key] = Inflight(
+                asyncio.get_running_loop().create_task(self._compute(key, compute, keep)))
+            inflight.task.add_done_callback(lambda task: self._done(key, inflight))
+
+        inflight.waiters += 1
+        try:
+            return await asyncio.shield(inflight.task)
+        finally:
+            inflight.waiters -= 1
+            if not inflight.waiters and not inflight.task.done():
+                # The last waiter gave up: nobody wants the answer any more
+                inflight.task.cancel()
+                self._done(key, inflight)
+
+    async def _compute(self, key: FeatureKey, compute: Callable[[], Awaitable[Any]],
+                       keep: Optional[Callable[[Any], bool]]) -> Any:
+        decision = await compute()
+        if keep is None or keep(decision):
+            self.put(key, decision)
+        return decision
+
+    def _done(self, key: FeatureKey, inflight: Inflight):
+        if self._inflight.get(key) is inflight:
+            del self._inflight[key]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+class StubResult:
+    """What Agent.run() returns, as far as the agents use it"""
+
+    def __init__(self, output):
+        self.output = output
+        self.data = output  # Older pydantic_ai releases
+
+
+def rule_decision(features: Dict, result_type, quantity: float = 100, strategy: str = "rule_based",
+                  rsi_overbought: float = 70, rsi_oversold: float = 30, confidence: float = 0.6):
+    """The example strategy's RSI/MACD rules on a feature dict, as a `result_type` decision"""
+    rsi = features.get("rsi")
+    macd = features.get("macd") or {}
+    if rsi is not None and rsi > rsi_overbought:
+        action, reasoning = "sell", "RSI indicates overbought conditions"
+    elif rsi is not None and rsi < rsi_oversold:
+        action, reasoning = "buy", "RSI indicates oversold conditions"
+    elif macd.get("value") is not None and macd.get("signal") is not None and macd["value"] > macd["signal"]:
+        action, reasoning = "buy", "MACD above signal"
+    else:
+        action, reasoning = "hold", "No clear signal"
+    return result_type(action=action, symbol=features.get("symbol", ""), quantity=quantity,
+                       price=features.get("price"), reasoning=reasoning, confidence=confidence,
+                       strategy=strategy)
+
+
+class StubModel:
+    """Offline stand-in for pydantic_ai.Agent: rule_decision() after a fixed delay
+
+    `deps` carries the features the agent would otherwise put in the prompt;
+    decisions are built with `result_type` so callers get the same type as
+    from the real model.
+    """
+
+    def __init__(self, result_type, delay: float = 0.05, quantity: float = 100,
+                 rsi_overbought: float = 70, rsi_oversold: float = 30):
+        self.result_type = result_type
+        self.delay = delay
+        self.quantity = quantity
+        self.rsi_overbought = rsi_overbought
+        self.rsi_oversold = rsi_oversold
+        self.calls = 0
+
+    async def run(self, user_prompt: str = "", deps: Optional[Dict] = None) -> StubResult:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return StubResult(rule_decision(deps or {}, self.result_type, self.quantity, "stub_model",
+                                        self.rsi_overbought, self.rsi_oversold))
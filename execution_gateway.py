@@ -0,0 +1,374 @@
+"""
+Asynchronous order-execution gateway for trading agents
+
+Agents hand decisions to ExecutionGateway.submit(), which only assigns a
+client order ID and puts the order on a bounded queue - it never waits on
+the broker, so the analysis loop keeps its pace. A single router task
+drains the queue in batches and sends them to a pluggable BrokerBackend;
+acks and fills come back through callbacks and resolve each order's
+`done` future.
+
+Client order IDs make retries idempotent: resubmitting an ID returns the
+original order, and backends ignore IDs they have already seen. The
+gateway remembers the last `keep_finished` final orders for this and
+forgets older ones, so a long-running gateway does not grow without
+bound. Latency from decision to ack and decision to fill is kept in
+LatencyHistograms.
+"""
+import abc
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from latency import LatencyHistogram
+
+ORDER_TYPES = ("market", "limit", "stop", "stop_limit")
+
+
+class Order:
+    """One order as tracked by the gateway"""
+
+    __slots__ = ("client_order_id", "agent_id", "symbol", "side", "quantity", "order_type",
+                 "price", "stop_price", "strategy", "reasoning", "status", "broker_order_id",
+                 "filled_quantity", "average_price", "reject_reason",
+                 "decided_ns", "acked_ns", "filled_ns", "done")
+
+    def __init__(self, client_order_id: str, agent_id: str, symbol: str, side: str, quantity: float,
+                 order_type: str = "limit", price: Optional[float] = None,
+                 stop_price: Optional[float] = None, strategy: str = "", reasoning: str = "",
+                 decided_ns: Optional[int] = None):
+        if order_type not in ORDER_TYPES:
+            raise ValueError(f"unknown order type {order_type!r}")
+        self.client_order_id = client_order_id
+        self.agent_id = agent_id
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.order_type = order_type
+        self.price = price
+        self.stop_price = stop_price
+        self.strategy = strategy
+        self.reasoning = reasoning
+        self.status = "queued"
+        self.broker_order_id: Optional[str] = None
+        self.filled_quantity = 0.0
+        self.average_price: Optional[float] = None
+        self.reject_reason = ""
+        self.decided_ns = decided_ns if decided_ns is not None else time.monotonic_ns()
+        self.acked_ns: Optional[int] = None
+        self.filled_ns: Optional[int] = None
+        self.done: Optional[asyncio.Future] = None
+
+    @property
+    def remaining(self) -> float:
+        return self.quantity - self.filled_quantity
+
+    @property
+    def is_final(self) -> bool:
+        return self.status in ("filled", "cancelled", "rejected")
+
+    def to_order_data(self) -> Dict:
+        """The order_data payload execute_trade used to build"""
+        return {
+            "client_order_id": self.client_order_id,
+            "symbol": self.symbol,
+            "side": self.side,
+            "quantity": self.quantity,
+            "order_type": self.order_type,
+            "price": self.price,
+            "stop_price": self.stop_price,
+            "agent_id": self.agent_id,
+            "strategy": self.strategy,
+            "reasoning": self.reasoning,
+        }
+
+    def __repr__(self):
+        return (f"Order({self.client_order_id} {self.side} {self.quantity:g} {self.symbol} "
+                f"{self.order_type} @ {self.price}, {self.status}, filled {self.filled_quantity:g})")
+
+
+class BrokerBackend(abc.ABC):
+    """Where the gateway sends orders
+
+    Backends report progress through the callbacks installed by the
+    gateway: on_ack(client_order_id, broker_order_id), on_fill(client_order_id,
+    quantity, price), on_reject(client_order_id, reason) and
+    on_cancel(client_order_id, reason) when the broker drops the unfilled
+    rest of an order (market order out of liquidity, expiry).
+    """
+
+    # How many orders one submit() call may carry; 1 means no batching
+    max_batch = 1
+
+    def __init__(self):
+        self.on_ack: Callable[[str, str], None] = lambda *args: None
+        self.on_fill: Callable[[str, float, float], None] = lambda *args: None
+        self.on_reject: Callable[[str, str], None] = lambda *args: None
+        self.on_cancel: Callable[[str, str], None] = lambda *args: None
+
+    @abc.abstractmethod
+    async def submit(self, orders: List[Order]):
+        """Send orders to the broker; must ignore client order IDs it has already seen"""
+
+    @abc.abstractmethod
+    async def cancel(self, client_order_id: str):
+        """Cancel the working remainder of an order"""
+
+    def print_trade(self, symbol: str, price: float, quantity: float):
+        """A trade from the market data feed; simulated backends fill against it"""
+
+    async def close(self):
+        pass
+
+
+class PaperBroker(BrokerBackend):
+    """In-process paper trading: acks at once and fills at the order's price
+
+    Market orders fill at `price` (the decision price) and limit orders at
+    their limit. `fill_delay` simulates exchange round-trip time without
+    holding up the router.
+    """
+
+    max_batch = 500
+
+    def __init__(self, fill_delay: float = 0.0):
+        super().__init__()
+        self.fill_delay = fill_delay
+        self._ids = itertools.count(1)
+        self._seen: Dict[str, str] = {}
+
+    async def submit(self, orders: List[Order]):
+        loop = asyncio.get_running_loop()
+        for order in orders:
+            if order.client_order_id in self._seen:
+                continue  # Idempotent retry: already working
+            broker_id = f"PAPER-{next(self._ids)}"
+            self._seen[order.client_order_id] = broker_id
+            self.on_ack(order.client_order_id, broker_id)
+            if order.price is None:
+                self.on_reject(order.client_order_id, "paper broker needs a reference price")
+                continue
+            fill = (order.client_order_id, order.quantity, order.price)
+            if self.fill_delay:
+                loop.call_later(self.fill_delay, self.on_fill, *fill)
+            else:
+                self.on_fill(*fill)
+
+    async def cancel(self, client_order_id: str):
+        # Paper orders fill at once; nothing is left to cancel
+        pass
+
+
+class ExecutionGateway:
+    """Bounded, batching, idempotent order router in front of a broker backend
+
+    Without a backend it paper-trades on order_book.OrderBookBroker, which
+    needs the market feed passed to print_trade() to fill resting orders.
+    """
+
+    def __init__(self, backend: Optional[BrokerBackend] = None, queue_size: int = 10_000,
+                 batch_size: Optional[int] = None, max_retries: int = 3, retry_delay: float = 0.05,
+                 keep_finished: int = 10_000):
+        if backend is None:
+            # order_book imports this module for BrokerBackend and Order
+            from order_book import OrderBookBroker
+            backend = OrderBookBroker()
+        self.backend = backend
+        self.backend.on_ack = self._on_ack
+        self.backend.on_fill = self._on_fill
+        self.backend.on_reject = self._on_reject
+        self.backend.on_cancel = self._on_cancel
+        self.queue_size = queue_size
+        self.batch_size = batch_size or self.backend.max_batch
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.orders: Dict[str, Order] = {}
+        # Final orders in the order they finished; the oldest leave `orders` past keep_finished
+        self.keep_finished = keep_finished
+        self._finished: deque = deque()
+        # Called with (order, quantity, price) for every fill, e.g. PnLEngine.on_fill
+        self.fill_listeners: List[Callable[[Order, float, float], None]] = []
+        self.ack_latency = LatencyHistogram()
+        self.fill_latency = LatencyHistogram()
+        self.rejected_full = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._router: Optional[asyncio.Task] = None
+        # Orders the router has taken off the queue but not yet handed to the backend
+        self._batch: List[Order] = []
+        self._sequence = itertools.count(1)
+
+    def start(self):
+        """Start the router task on the running loop (submit() does this lazily)
+
+        Restarting after the router stopped keeps the queue, so orders
+        submitted meanwhile are still sent.
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.queue_size)
+        if self._router is None or self._router.done():
+            self._router = asyncio.get_running_loop().create_task(self._route())
+
+    def next_client_order_id(self, agent_id: str) -> str:
+        return f"{agent_id}-{time.time_ns():x}-{next(self._sequence)}"
+
+    def submit(self, agent_id: str, symbol: str, side: str, quantity: float,
+               order_type: str = "limit", price: Optional[float] = None,
+               stop_price: Optional[float] = None, strategy: str = "", reasoning: str = "",
+               client_order_id: Optional[str] = None, decided_ns: Optional[int] = None) -> Order:
+        """Queue an order and return it at once; await order.done for the outcome
+
+        Submitting an existing client_order_id returns that order unchanged.
+        A full queue rejects the order instead of blocking the caller.
+        """
+        if client_order_id is not None and client_order_id in self.orders:
+            return self.orders[client_order_id]
+        self.start()
+        order = Order(client_order_id or self.next_client_order_id(agent_id), agent_id, symbol, side,
+                      quantity, order_type, price, stop_price, strategy, reasoning, decided_ns)
+        order.done = asyncio.get_running_loop().create_future()
+        self.orders[order.client_order_id] = order
+        try:
+            self._queue.put_nowait(order)
+        except asyncio.QueueFull:
+            self.rejected_full += 1
+            self._finish(order, "rejected", "order queue full")
+        return order
+
+    def submit_decision(self, agent_id: str, decision, order_type: str = "limit",
+                        client_order_id: Optional[str] = None, decided_ns: Optional[int] = None) -> Order:
+        return self.submit(agent_id, decision.symbol, decision.action, decision.quantity, order_type,
+                           decision.price, None, decision.strategy, decision.reasoning,
+                           client_order_id, decided_ns)
+
+    async def _route(self):
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            # Orders cancelled while queued never reach the broker
+            batch = [order for order in batch if not order.is_final]
+            if batch:
+                self._batch = batch
+                await self._send(batch)
+                self._batch = []
+
+    async def _send(self, batch: List[Order]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.backend.max_batch > 1:
+                    await self.backend.submit(batch)
+                else:
+                    for order in batch:
+                        await self.backend.submit([order])
+                return
+            except Exception as e:
+                # Resending is safe: backends drop client order IDs they already have
+                if attempt == self.max_retries:
+                    for order in batch:
+                        if order.status == "queued":
+                            self._finish(order, "rejected", f"submit failed: {e}")
+                    return
+                await asyncio.sleep(self.retry_delay * (2 ** attempt))
+
+    def _finish(self, order: Order, status: str, reason: str = ""):
+        order.status = status
+        order.reject_reason = reason
+        if order.done is not None and not order.done.done():
+            order.done.set_result(order)
+        finished = self._finished
+        finished.append(order.client_order_id)
+        while len(finished) > self.keep_finished:
+            cid = finished.popleft()
+            old = self.orders.get(cid)
+            if old is not None and old.is_final:
+                del self.orders[cid]
+
+    def _on_ack(self, client_order_id: str, broker_order_id: str):
+        order = self.orders.get(client_order_id)
+        if order is None or order.acked_ns is not None:
+            return
+        order.broker_order_id = broker_order_id
+        order.acked_ns = time.monotonic_ns()
+        order.status = "accepted"
+        self.ack_latency.record(order.acked_ns - order.decided_ns)
+
+    def _on_fill(self, client_order_id: str, quantity: float, price: float):
+        order = self.orders.get(client_order_id)
+        if order is None or order.is_final:
+            return
+        filled = order.filled_quantity + quantity
+        order.average_price = ((order.average_price or 0.0) * order.filled_quantity + price * quantity) / filled
+        order.filled_quantity = filled
+        for listener in self.fill_listeners:
+            listener(order, quantity, price)
+        if filled >= order.quantity:
+            order.filled_ns = time.monotonic_ns()
+            self.fill_latency.record(order.filled_ns - order.decided_ns)
+            self._finish(order, "filled")
+        else:
+            order.status = "partially_filled"
+
+    def _on_reject(self, client_order_id: str, reason: str):
+        order = self.orders.get(client_order_id)
+        if order is not None and not order.is_final:
+            self._finish(order, "rejected", reason)
+
+    def _on_cancel(self, client_order_id: str, reason: str):
+        order = self.orders.get(client_order_id)
+        if order is None or order.is_final:
+            return
+        if order.filled_quantity > 0:
+            reason = (f"partially filled {order.filled_quantity:g}/{order.quantity:g}, "
+                      f"remainder cancelled: {reason}")
+        self._finish(order, "cancelled", reason)
+
+    def print_trade(self, symbol: str, price: float, quantity: float = 0.0):
+        """Pass a market data print to the backend (see BrokerBackend.print_trade)"""
+        self.backend.print_trade(symbol, price, quantity)
+
+    async def cancel(self, client_order_id: str):
+        order = self.orders.get(client_order_id)
+        if order is None or order.is_final:
+            return
+        await self.backend.cancel(client_order_id)
+        if not order.is_final:  # Unless the backend already reported it through on_cancel
+            self._finish(order, "cancelled")
+
+    def forget_finished(self) -> int:
+        """Drop final orders from the idempotency table; returns how many"""
+        finished = [cid for cid, order in self.orders.items() if order.is_final]
+        for cid in finished:
+            del self.orders[cid]
+        self._finished.clear()
+        return len(finished)
+
+    def stats(self) -> Dict:
+        return {
+            "open_orders": sum(1 for order in self.orders.values() if not order.is_final),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "rejected_queue_full": self.rejected_full,
+            "decision_to_ack": self.ack_latency.summary(),
+            "decision_to_fill": self.fill_latency.summary(),
+        }
+
+    async def close(self):
+        """Stop the router; a batch it had taken off the queue is still sent
+
+        Orders left on the queue stay there for a restarted router.
+        """
+        if self._router is not None:
+            self._router.cancel()
+            try:
+                await self._router
+            except asyncio.CancelledError:
+                pass
+            self._router = None
+        # Cancelled mid-send: resending is safe, backends drop IDs they already have
+        unsent = [order for order in self._batch if order.status == "queued"]
+        self._batch = []
+        if unsent:
+            await self._send(unsent)
+        await self.backend.close()
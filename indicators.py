@@ -0,0 +1,170 @@
+"""
+Vectorized technical indicators for trading agents
+
+Every function takes price arrays shaped (symbols, bars) - or a single
+(bars,) series - and works along the last axis, so one call updates a
+whole universe of symbols. Values before an indicator has enough history
+are NaN. Smoothing follows the usual TA-Lib conventions: EMAs are seeded
+with the SMA of their first `period` values, RSI and ATR use Wilder's
+smoothing.
+"""
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+def _as_prices(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float64)
+
+
+def _smooth(values: np.ndarray, alpha: float, period: int, start: int = 0) -> np.ndarray:
+    """Exponential smoothing along the last axis, seeded with an SMA
+
+    The recursion is sequential in time, so we loop over bars and let NumPy
+    handle all symbols at once on each step.
+    """
+    out = np.full(values.shape[-1:] + values.shape[:-1], np.nan)
+    first = start + period - 1
+    if values.shape[-1] <= first:
+        return np.moveaxis(out, 0, -1)
+
+    # Time-major copy so each step reads and writes one contiguous row
+    series = np.ascontiguousarray(np.moveaxis(values, -1, 0))
+    state = series[start:first + 1].mean(axis=0)
+    out[first] = state
+    for t in range(first + 1, series.shape[0]):
+        state = state + alpha * (series[t] - state)
+        out[t] = state
+    return np.moveaxis(out, 0, -1)
+
+
+def sma(close, period: int) -> np.ndarray:
+    """Simple moving average"""
+    close = _as_prices(close)
+    out = np.full(close.shape, np.nan)
+    if close.shape[-1] < period:
+        return out
+    csum = np.cumsum(close, axis=-1)
+    out[..., period - 1] = csum[..., period - 1]
+    out[..., period:] = csum[..., period:] - csum[..., :-period]
+    return out / period
+
+
+def ema(close, period: int) -> np.ndarray:
+    """Exponential moving average (alpha = 2 / (period + 1))"""
+    return _smooth(_as_prices(close), 2.0 / (period + 1), period)
+
+
+def rsi(close, period: int = 14) -> np.ndarray:
+    """Wilder's relative strength index, 0-100"""
+    close = _as_prices(close)
+    out = np.full(close.shape, np.nan)
+    if close.shape[-1] <= period:
+        return out
+
+    delta = np.diff(close, axis=-1)
+    avg_gain = _smooth(np.clip(delta, 0, None), 1.0 / period, period)
+    avg_loss = _smooth(np.clip(-delta, 0, None), 1.0 / period, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    # No losses in the window means maximally overbought
+    values = np.where((avg_loss == 0) & ~np.isnan(avg_gain), 100.0, values)
+    out[..., 1:] = values
+    return out
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """MACD line, signal line and histogram"""
+    close = _as_prices(close)
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = _smooth(line, 2.0 / (signal + 1), signal, start=slow - 1)
+    return line, signal_line, line - signal_line
+
+
+def bollinger(close, period: int = 20, num_std: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bollinger bands: (middle, upper, lower), population standard deviation"""
+    close = _as_prices(close)
+    middle = sma(close, period)
+    # Rolling variance from running sums; shifting by the first price keeps
+    # E[x^2] - E[x]^2 from cancelling catastrophically at high price levels
+    shifted = close - close[..., :1]
+    variance = sma(shifted * shifted, period) - sma(shifted, period) ** 2
+    std = np.sqrt(np.clip(variance, 0, None))
+    return middle, middle + num_std * std, middle - num_std * std
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """True range; the first bar has no previous close and uses high - low"""
+    high, low, close = _as_prices(high), _as_prices(low), _as_prices(close)
+    tr = high - low
+    prev_close = close[..., :-1]
+    tr[..., 1:] = np.maximum.reduce([
+        tr[..., 1:],
+        np.abs(high[..., 1:] - prev_close),
+        np.abs(low[..., 1:] - prev_close),
+    ])
+    return tr
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """Wilder's average true range, seeded from bar 1 like TA-Lib"""
+    return _smooth(true_range(high, low, close), 1.0 / period, period, start=1)
+
+
+def vwap(high, low, close, volume) -> np.ndarray:
+    """Cumulative volume-weighted average of the typical price over the window"""
+    high, low, close, volume = _as_prices(high), _as_prices(low), _as_prices(close), _as_prices(volume)
+    typical = (high + low + close) / 3.0
+    cum_volume = np.cumsum(volume, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.cumsum(typical * volume, axis=-1) / cum_volume
+
+
+def compute_indicators(close, high=None, low=None, volume=None) -> Dict[str, np.ndarray]:
+    """Latest value of every indicator for each symbol
+
+    Inputs are (symbols, bars); outputs are (symbols,) arrays keyed by
+    indicator name. High/low default to close and volume to ones when a
+    feed only has trade prices.
+    """
+    close = _as_prices(close)
+    high = close if high is None else _as_prices(high)
+    low = close if low is None else _as_prices(low)
+    volume = np.ones_like(close) if volume is None else _as_prices(volume)
+
+    macd_line, macd_signal, macd_hist = macd(close)
+    bb_middle, bb_upper, bb_lower = bollinger(close)
+    return {
+        "price": close[..., -1],
+        "rsi": rsi(close)[..., -1],
+        "macd": macd_line[..., -1],
+        "macd_signal": macd_signal[..., -1],
+        "macd_hist": macd_hist[..., -1],
+        "ema_20": ema(close, 20)[..., -1],
+        "ema_50": ema(close, 50)[..., -1],
+        "sma_20": bb_middle[..., -1],
+        "bb_upper": bb_upper[..., -1],
+        "bb_lower": bb_lower[..., -1],
+        "atr": atr(high, low, close)[..., -1],
+        "vwap": vwap(high, low, close, volume)[..., -1],
+        "volume_avg": sma(volume, 20)[..., -1],
+    }
+
+
+def indicators_for(batch: Dict[str, np.ndarray], index: Optional[int] = None) -> Dict:
+    """One symbol's row from compute_indicators, shaped like calculate_indicators"""
+    def pick(name):
+        value = batch[name] if index is None else batch[name][index]
+        return float(value)
+
+    return {
+        "rsi": pick("rsi"),
+        "macd": {"value": pick("macd"), "signal": pick("macd_signal")},
+        "ema_20": pick("ema_20"),
+        "ema_50": pick("ema_50"),
+        "sma_20": pick("sma_20"),
+        "bollinger": {"upper": pick("bb_upper"), "middle": pick("sma_20"), "lower": pick("bb_lower")},
+        "atr": pick("atr"),
+        "vwap": pick("vwap"),
+        "volume_avg": pick("volume_avg"),
+    }
@@ -0,0 +1,250 @@
+"""
+Latency histograms for the trading hot path
+
+LatencyHistogram is a log-linear (HDR-style) histogram of integer
+nanoseconds: 32 linear sub-buckets per power of two keep every recorded
+value within ~3% while the whole range up to hours fits in a fixed list,
+so record() is a couple of integer operations and never allocates.
+
+StageTimer times the stages of analyze_and_trade per agent. The hot path
+only appends one tuple of stage-boundary timestamps to a buffer owned by
+the calling thread; histograms are filled when the buffers are collected.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+BUCKETS = (64 - SUB_BUCKET_BITS) * SUB_BUCKETS
+
+
+def bucket_index(value: int) -> int:
+    if value < SUB_BUCKETS:
+        return max(value, 0)
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def bucket_value(index: int) -> int:
+    """Midpoint of the values that land in `index`"""
+    if index < SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    low = (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+    return low + (1 << shift) // 2
+
+
+class LatencyHistogram:
+    """Fixed-size histogram of nanosecond latencies"""
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min: Optional[int] = None
+        self.max = 0
+
+    def record(self, value_ns: int):
+        self.counts[bucket_index(value_ns)] += 1
+        self.count += 1
+        self.total += value_ns
+        if value_ns > self.max:
+            self.max = value_ns
+        if self.min is None or value_ns < self.min:
+            self.min = value_ns
+
+    def record_many(self, values_ns: np.ndarray):
+        """Record an array of latencies at once"""
+        values = np.maximum(np.asarray(values_ns, dtype=np.int64), 0)
+        if not len(values):
+            return
+        # frexp's exponent is the bit length for integers below 2**53
+        shift = np.maximum(np.frexp(values.astype(np.float64))[1] - SUB_BUCKET_BITS - 1, 0)
+        index = np.where(values < SUB_BUCKETS, values,
+                         (shift + 1) * SUB_BUCKETS + (values >> shift) - SUB_BUCKETS)
+        counts = np.bincount(index, minlength=BUCKETS)
+        for i in np.flatnonzero(counts).tolist():
+            self.counts[i] += int(counts[i])
+        self.count += len(values)
+        # Summed in 32-bit halves so large values cannot overflow int64
+        self.total += (int((values >> 32).sum()) << 32) + int((values & 0xFFFFFFFF).sum())
+        low, high = int(values.min()), int(values.max())
+        if high > self.max:
+            self.max = high
+        if self.min is None or low < self.min:
+            self.min = low
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, n in enumerate(other.counts):
+            if n:
+                self.counts[index] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+
+    def reset(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def percentile(self, p: float) -> int:
+        """Value at percentile p (0-100), within one bucket's precision"""
+        if not self.count:
+            return 0
+        rank = max(1, int(round(p / 100.0 * self.count)))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bucket_value(index), self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        """Count, mean and p50/p90/p99/max in microseconds"""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count / 1000,
+            "p50_us": self.percentile(50) / 1000,
+            "p90_us": self.percentile(90) / 1000,
+            "p99_us": self.percentile(99) / 1000,
+            "max_us": self.max / 1000,
+        }
+
+    def __str__(self):
+        s = self.summary()
+        if not s["count"]:
+            return "no samples"
+        return (f"n={s['count']} p50={s['p50_us']:.1f}us p90={s['p90_us']:.1f}us "
+                f"p99={s['p99_us']:.1f}us max={s['max_us']:.1f}us")
+
+
+# Stages of TradingAgentExample.analyze_and_trade, in order
+STAGES = ("market_data", "indicators", "decision", "risk", "execution")
+
+
+class StageTimer:
+    """Per-agent, per-stage latency histograms fed from per-thread span buffers
+
+    record() takes the monotonic ns timestamp at the start of the pipeline
+    followed by the end of each stage, None for stages that did not run;
+    a stage's time runs from the previous recorded boundary. Each thread
+    appends only to its own buffer, which is all the hot path does.
+    collect() folds the buffers into the histograms in bulk, and a daemon
+    thread calls it every `interval` seconds; spans beyond `max_buffered`
+    per thread between collections are counted as dropped, not stored.
+    A buffer whose thread has exited is dropped once it has been drained.
+    """
+
+    def __init__(self, stages: Sequence[str] = STAGES, interval: float = 1.0,
+                 max_buffered: int = 100_000):
+        self.stages = tuple(stages)
+        self.interval = interval
+        self.max_buffered = max_buffered
+        self.dropped = 0
+        # agent_id -> one histogram per stage, then the whole pipeline
+        self.histograms: Dict[str, List[LatencyHistogram]] = {}
+        self._local = threading.local()
+        # (owning thread, its buffer)
+        self._buffers: List[Tuple[threading.Thread, list]] = []
+        self._lock = threading.Lock()
+        self._collector: Optional[threading.Thread] = None
+
+    def _new_buffer(self) -> list:
+        buffer = self._local.buffer = []
+        with self._lock:
+            self._buffers.append((threading.current_thread(), buffer))
+            if self._collector is None and self.interval:
+                self._collector = threading.Thread(target=self._collect_forever,
+                                                   name="stage-timer", daemon=True)
+                self._collector.start()
+        return buffer
+
+    def _collect_forever(self):
+        while True:
+            time.sleep(self.interval)
+            self.collect()
+
+    def record(self, agent_id: str, marks: tuple):
+        try:
+            buffer = self._local.buffer
+        except AttributeError:
+            buffer = self._new_buffer()
+        if len(buffer) < self.max_buffered:
+            buffer.append((agent_id, marks))
+        else:
+            self.dropped += 1
+
+    def collect(self):
+        """Fold every thread's buffered spans into the histograms"""
+        with self._lock:
+            by_agent: Dict[str, list] = {}
+            for thread, buffer in self._buffers:
+                # Only the owning thread appends, and only at the end, so this is safe without its cooperation
+                n = len(buffer)
+                spans = buffer[:n]
+                del buffer[:n]
+                for agent_id, marks in spans:
+                    marked = by_agent.get(agent_id)
+                    if marked is None:
+                        marked = by_agent[agent_id] = []
+                    marked.append(marks)
+            # Drop exited threads' buffers; one that appended after the drain waits for the next collect
+            self._buffers = [(thread, buffer) for thread, buffer in self._buffers
+                             if thread.is_alive() or buffer]
+            for agent_id, marked in by_agent.items():
+                histograms = self.histograms.get(agent_id)
+                if histograms is None:
+                    histograms = self.histograms[agent_id] = [
+                        LatencyHistogram() for _ in range(len(self.stages) + 1)]
+                # One row per span; stages that did not run are NaN
+                marks = np.array(marked, dtype=np.float64)
+                previous = start = marks[:, 0]
+                for stage in range(marks.shape[1] - 1):
+                    mark = marks[:, stage + 1]
+                    ran = ~np.isnan(mark)
+                    histograms[stage].record_many((mark - previous)[ran])
+                    previous = np.where(ran, mark, previous)
+                histograms[-1].record_many(previous - start)
+
+    def summary(self, agent_id: Optional[str] = None) -> Dict[str, Dict]:
+        """p50/p90/p99/max per stage, for one agent or all of them together"""
+        self.collect()
+        if agent_id is not None:
+            histograms = self.histograms.get(agent_id)
+            if histograms is None:
+                return {}
+        else:
+            histograms = [LatencyHistogram() for _ in range(len(self.stages) + 1)]
+            for per_agent in self.histograms.values():
+                for total, histogram in zip(histograms, per_agent):
+                    total.merge(histogram)
+        return {stage: histogram.summary()
+                for stage, histogram in zip(self.stages + ("total",), histograms)}
+
+    def reset(self):
+        self.collect()
+        with self._lock:
+            self.histograms = {}
+
+    def report(self, agent_id: Optional[str] = None) -> str:
+        lines = [agent_id or "all agents"]
+        for stage, stats in self.summary(agent_id).items():
+            if stats["count"]:
+                lines.append(f"  {stage:<12} n={stats['count']} p50={stats['p50_us']:.1f}us "
+                             f"p99={stats['p99_us']:.1f}us max={stats['max_us']:.1f}us")
+        return "\n".join(lines)
+
+
+# Shared by every agent in the process unless an agent is given its own
+PIPELINE_TIMINGS = StageTimer()
@@ -0,0 +1,311 @@
+"""
+Deadline-aware scheduler for LLM calls from trading agents
+
+Every model call goes through LLMScheduler.call() instead of straight to
+pydantic_ai.Agent.run(). Per provider ("openai", "google-gla", ...) it keeps:
+
+- token buckets for requests and tokens per minute, plus a concurrency cap,
+  so bursts from many agents queue here instead of hitting rate limits;
+- a priority queue: exits before entries before background work, and
+  earlier deadlines first within a class;
+- a running estimate of call latency.
+
+A request that can no longer finish by its deadline - expired in the
+queue, still waiting on the buckets when the estimated call time no longer
+fits, or timed out in flight - is answered by its fallback (normally the
+rule-based decision) instead of arriving late. FakeProvider answers like a
+model with random latency and rate-limit errors, for offline tests.
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from agent_trading_example import DEFAULT_STRATEGY
+from decision_cache import StubModel, StubResult, rule_decision
+from latency import LatencyHistogram
+
+EXIT, ENTRY, BACKGROUND = 0, 1, 2
+PRIORITIES = ("exit", "entry", "background")
+# Strategy name on decisions made by fallback_decision(), so callers can tell them from model answers
+FALLBACK_STRATEGY = "rule_fallback"
+
+
+class DeadlineMissed(Exception):
+    """A request without a fallback could not be answered in time"""
+
+
+class RateLimited(Exception):
+    """Raised by providers (see FakeProvider) when they reject a call as over the limit"""
+
+
+class TokenBucket:
+    """`rate` units per second up to `capacity`, refilled lazily"""
+
+    __slots__ = ("rate", "capacity", "level", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)"""
+        now = time.monotonic()
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(missing / self.rate, 0.0) if self.rate else (0.0 if missing <= 0 else float("inf"))
+
+    def take(self, amount: float):
+        self._refill(time.monotonic())
+        self.level -= min(amount, self.capacity)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the provider said we were over the limit"""
+        self.level = min(self.level, 0.0)
+        self.updated = time.monotonic()
+
+
+class ProviderLimits:
+    """Rate limits of one model provider"""
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 200_000,
+                 max_concurrency: int = 16, expected_latency: float = 1.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.expected_latency = expected_latency
+
+
+class Request:
+    """One queued model call"""
+
+    __slots__ = ("run", "priority", "deadline", "tokens", "fallback", "future", "enqueued", "started")
+
+    def __init__(self, run: Callable[[], Awaitable], priority: int, deadline: float, tokens: int,
+                 fallback: Optional[Callable[[], Any]], future: asyncio.Future):
+        self.run = run
+        self.priority = priority
+        self.deadline = deadline
+        self.tokens = tokens
+        self.fallback = fallback
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.started = False
+
+
+class ProviderQueue:
+    """Queue, buckets and statistics for one provider"""
+
+    def __init__(self, name: str, limits: ProviderLimits):
+        self.name = name
+        self.limits = limits
+        self.requests = TokenBucket(limits.requests_per_minute / 60.0, max(limits.requests_per_minute / 60.0, 1.0))
+        self.tokens = TokenBucket(limits.tokens_per_minute / 60.0, limits.tokens_per_minute / 60.0 * 5)
+        self.slots = asyncio.Semaphore(limits.max_concurrency)
+        self.expected_latency = limits.expected_latency
+        self.heap: List = []
+        self.wakeup = asyncio.Event()
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.sequence = itertools.count()
+        self.completed = 0
+        self.fallbacks: Dict[str, int] = {}
+        self.latency = LatencyHistogram()
+
+    def observe(self, seconds: float):
+        # Exponentially weighted, so a provider slowing down is noticed within a few calls
+        self.expected_latency += 0.2 * (seconds - self.expected_latency)
+
+    def stats(self) -> Dict:
+        return {
+            "queued": sum(1 for *_, request in self.heap if not request.future.done()),
+            "completed": self.completed,
+            "fallbacks": dict(self.fallbacks),
+            "expected_latency_ms": self.expected_latency * 1000,
+            "latency": self.latency.summary(),
+        }
+
+
+class LLMScheduler:
+    """Rate-limited, prioritized, deadline-aware front for model calls"""
+
+    def __init__(self, providers: Optional[Dict[str, ProviderLimits]] = None,
+                 default_limits: Optional[ProviderLimits] = None):
+        self.limits = dict(providers or {})
+        self.default_limits = default_limits or ProviderLimits()
+        self.providers: Dict[str, ProviderQueue] = {}
+        # Calls in flight; the loop only keeps weak references to tasks
+        self._running: Set[asyncio.Task] = set()
+
+    @staticmethod
+    def provider_of(model_name: str) -> str:
+        """'openai:gpt-4' -> 'openai'"""
+        return model_name.split(":", 1)[0]
+
+    def _queue(self, provider: str) -> ProviderQueue:
+        queue = self.providers.get(provider)
+        if queue is None:
+            queue = self.providers[provider] = ProviderQueue(provider, self.limits.get(provider, self.default_limits))
+        if queue.dispatcher is None or queue.dispatcher.done():
+            queue.dispatcher = asyncio.get_running_loop().create_task(self._dispatch(queue))
+        return queue
+
+    async def call(self, provider: str, run: Callable[[], Awaitable], priority: int = ENTRY,
+                   deadline: float = 5.0, tokens: int = 800,
+                   fallback: Optional[Callable[[], Any]] = None) -> Any:
+        """Result of `run()`, or of `fallback()` if it cannot be had within `deadline` seconds"""
+        queue = self._queue(provider)
+        loop = asyncio.get_running_loop()
+        request = Request(run, priority, time.monotonic() + deadline, tokens, fallback, loop.create_future())
+        heapq.heappush(queue.heap, (priority, request.deadline, next(queue.sequence), request))
+        queue.wakeup.set()
+        # Answered at the deadline even if it never left the queue
+        expiry = loop.call_later(deadline, self._expire, queue, request)
+        try:
+            return await request.future
+        finally:
+            expiry.cancel()
+
+    def _expire(self, queue: ProviderQueue, request: Request):
+        if not request.started:
+            self._fall_back(queue, request, "expired_in_queue")
+
+    def _fall_back(self, queue: ProviderQueue, request: Request, reason: str):
+        if request.future.done():
+            return
+        queue.fallbacks[reason] = queue.fallbacks.get(reason, 0) + 1
+        if request.fallback is None:
+            request.future.set_exception(DeadlineMissed(f"{queue.name}: {reason}"))
+            return
+        try:
+            request.future.set_result(request.fallback())
+        except Exception as e:
+            request.future.set_exception(e)
+
+    async def _dispatch(self, queue: ProviderQueue):
+        heap = queue.heap
+        while True:
+            if not heap:
+                queue.wakeup.clear()
+                await queue.wakeup.wait()
+                continue
+            request = heap[0][3]
+            if request.future.done():
+                heapq.heappop(heap)  # Expired or cancelled while queued
+                continue
+            now = time.monotonic()
+            if now + queue.expected_latency > request.deadline:
+                heapq.heappop(heap)
+                self._fall_back(queue, request, "would_miss_deadline")
+                continue
+            wait = max(queue.requests.wait_time(1), queue.tokens.wait_time(request.tokens))
+            if wait > 0:
+                if now + wait + queue.expected_latency > request.deadline:
+                    heapq.heappop(heap)
+                    self._fall_back(queue, request, "rate_limited")
+                    continue
+                # Sleep, then look again: a more urgent request may have arrived meanwhile
+                queue.wakeup.clear()
+                try:
+                    await asyncio.wait_for(queue.wakeup.wait(), wait)
+                except TimeoutError:
+                    pass
+                continue
+            await queue.slots.acquire()
+            if heap and heap[0][3] is request and not request.future.done():
+                heapq.heappop(heap)
+                queue.requests.take(1)
+                queue.tokens.take(request.tokens)
+                request.started = True
+                task = asyncio.get_running_loop().create_task(self._run(queue, request))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+            else:
+                queue.slots.release()  # The queue changed while we waited for a slot
+
+    async def _run(self, queue: ProviderQueue, request: Request):
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(request.run(), max(request.deadline - started, 0.0))
+        except TimeoutError:
+            queue.observe(time.monotonic() - started)
+            self._fall_back(queue, request, "timed_out")
+        except asyncio.CancelledError:
+            self._fall_back(queue, request, "cancelled")
+            raise
+        except RateLimited:
+            queue.requests.drain()
+            queue.tokens.drain()
+            self._fall_back(queue, request, "provider_rate_limited")
+        except Exception as e:
+            self._fall_back(queue, request, f"error:{type(e).__name__}")
+        else:
+            finished = time.monotonic()
+            queue.observe(finished - started)
+            queue.latency.record(int((finished - request.enqueued) * 1e9))
+            queue.completed += 1
+            if not request.future.done():
+                request.future.set_result(result)
+        finally:
+            queue.slots.release()
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: queue.stats() for name, queue in self.providers.items()}
+
+    async def close(self):
+        """Stop dispatching and cancel calls in flight; their callers and queued ones get the fallback"""
+        tasks = [q.dispatcher for q in self.providers.values() if q.dispatcher] + list(self._running)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for queue in self.providers.values():
+            while queue.heap:
+                self._fall_back(queue, heapq.heappop(queue.heap)[3], "closed")
+
+
+class FakeProvider(StubModel):
+    """Offline model with random latency that rejects calls beyond `max_concurrency`"""
+
+    def __init__(self, result_type, latency: float = 0.5, jitter: float = 0.5,
+                 max_concurrency: Optional[int] = None, seed: Optional[int] = None, **rules):
+        super().__init__(result_type, delay=0.0, **rules)
+        self.latency = latency
+        self.jitter = jitter
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.rejected = 0
+        self._random = random.Random(seed)
+
+    async def run(self, user_prompt: str = "", deps: Optional[Dict] = None) -> StubResult:
+        if self.max_concurrency is not None and self.in_flight >= self.max_concurrency:
+            self.rejected += 1
+            raise RateLimited("429: too many concurrent requests")
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(self.latency * (1 + self._random.uniform(-self.jitter, self.jitter)))
+            return await super().run(user_prompt, deps)
+        finally:
+            self.in_flight -= 1
+
+
+def fallback_decision(features: Dict, result_type, strategy: Optional[Dict] = None):
+    """Rule-based stand-in when the model cannot answer in time
+
+    Size and RSI thresholds come from the caller's `strategy` (over
+    DEFAULT_STRATEGY), so a fallback trades what the agent's rules would.
+    """
+    strategy = {**DEFAULT_STRATEGY, **(strategy or {})}
+    return rule_decision(features, result_type, strategy["quantity"], FALLBACK_STRATEGY,
+                         strategy["rsi_overbought"], strategy["rsi_oversold"])
+
+
+def is_fallback(decision) -> bool:
+    """True for decisions made by fallback_decision() rather than the model"""
+    return getattr(decision, "strategy", None) == FALLBACK_STRATEGY
@@ -0,0 +1,284 @@
+"""
+Parameter sweeps and walk-forward optimization over the backtester
+
+Grid or random strategy parameter sets are fanned out to a
+ProcessPoolExecutor. The price matrices live in shared memory: every
+worker maps them once at start-up, and a task only carries its
+parameters and a bar range, so nothing big is pickled per task.
+
+    python optimizer.py --random 200 --workers 8
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent_trading_example import DEFAULT_STRATEGY
+from backtester import Backtester, FillModel, synthetic_bars
+
+# Ranges for the magic numbers in make_trading_decision
+DEFAULT_SPACE = {
+    "rsi_overbought": [60, 65, 70, 75, 80],
+    "rsi_oversold": [20, 25, 30, 35, 40],
+    "trend_ema": ["ema_20", "ema_50", None],
+    "quantity": [50, 100, 200],
+}
+
+# Metrics where smaller is better; every other objective is maximized
+LOWER_IS_BETTER = {"max_drawdown", "max_drawdown_pct", "fees", "losing_trades"}
+
+
+def grid(space: Dict[str, Sequence]) -> List[Dict]:
+    """Every combination of the listed values"""
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_search(space: Dict[str, Sequence], samples: int, seed: int = 7) -> List[Dict]:
+    """Distinct random parameter sets; a (low, high) tuple samples uniformly, a list picks a value"""
+    rng = random.Random(seed)
+    params, seen = [], set()
+    for _ in range(samples * 10):
+        if len(params) == samples:
+            break
+        choice = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                choice[name] = rng.randint(low, high) if isinstance(low, int) else rng.uniform(low, high)
+            else:
+                choice[name] = rng.choice(list(values))
+        key = tuple(choice.items())
+        if key not in seen:
+            seen.add(key)
+            params.append(choice)
+    return params
+
+
+def walk_forward_splits(bars: int, folds: int = 4, train_fraction: float = 0.75) -> List[Tuple[slice, slice]]:
+    """Rolling (train, test) bar ranges; each test window follows its train window"""
+    window = bars // folds
+    train = int(window * train_fraction)
+    return [(slice(start, start + train), slice(start + train, start + window))
+            for start in range(0, folds * window, window)]
+
+
+class SharedMarketData:
+    """Symbols, timestamps, close and volume in named shared memory blocks
+
+    The creating process owns the blocks and unlinks them on close(); workers
+    attach by name through the picklable `spec`.
+    """
+
+    def __init__(self, symbols: List[str], blocks: Dict[str, shared_memory.SharedMemory],
+                 arrays: Dict[str, np.ndarray], owner: bool):
+        self.symbols = symbols
+        self._blocks = blocks
+        self.arrays = arrays
+        self.owner = owner
+
+    @classmethod
+    def create(cls, symbols: List[str], timestamps, close, volume=None) -> "SharedMarketData":
+        close = np.asarray(close, dtype=np.float64)
+        sources = {
+            "timestamps": np.asarray(timestamps, dtype=np.int64),
+            "close": close,
+            "volume": np.zeros_like(close) if volume is None else np.asarray(volume, dtype=np.float64),
+        }
+        blocks, arrays = {}, {}
+        for field, source in sources.items():
+            block = shared_memory.SharedMemory(create=True, size=max(source.nbytes, 1))
+            array = np.ndarray(source.shape, dtype=source.dtype, buffer=block.buf)
+            array[...] = source
+            blocks[field], arrays[field] = block, array
+        return cls(list(symbols), blocks, arrays, owner=True)
+
+    @property
+    def spec(self) -> Dict:
+        return {
+            "symbols": self.symbols,
+            "fields": {field: (self._blocks[field].name, array.shape, array.dtype.str)
+                       for field, array in self.arrays.items()},
+        }
+
+    @classmethod
+    def attach(cls, spec: Dict) -> "SharedMarketData":
+        blocks, arrays = {}, {}
+        for field, (name, shape, dtype) in spec["fields"].items():
+            block = shared_memory.SharedMemory(name=name)
+            blocks[field] = block
+            arrays[field] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        return cls(spec["symbols"], blocks, arrays, owner=False)
+
+    @property
+    def bars(self) -> int:
+        return len(self.arrays["timestamps"])
+
+    def close(self):
+        self.arrays = {}
+        for block in self._blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self._blocks = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Per-worker state, set once by the pool initializer
+_worker_data: Optional[SharedMarketData] = None
+_worker_backtest: Dict = {}
+
+
+def _init_worker(spec: Dict, backtest_options: Dict):
+    global _worker_data, _worker_backtest
+    _worker_data = SharedMarketData.attach(spec)
+    _worker_backtest = backtest_options
+
+
+def _evaluate(task: Tuple[Dict, int, int]) -> Dict:
+    """Backtest one parameter set on bars [start, stop) of the shared data"""
+    params, start, stop = task
+    data = _worker_data
+    options = dict(_worker_backtest)
+    fill_model = FillModel(**options.pop("fill_model", {}))
+    backtester = Backtester(fill_model=fill_model, strategy=params, **options)
+    window = slice(start, stop)
+    result = backtester.run(data.symbols, data.arrays["timestamps"][window],
+                            data.arrays["close"][:, window], data.arrays["volume"][:, window])
+    return {"params": params, "start": start, "stop": stop, **result.metrics()}
+
+
+def _format_score(row: Dict, objective: str) -> str:
+    value = row.get(objective)
+    return "n/a" if value is None else f"{value:.2f}"
+
+
+def _score(row: Dict, objective: str) -> float:
+    """Higher is better whatever the objective; missing values rank last"""
+    value = row.get(objective)
+    if value is None or value != value:
+        return -math.inf
+    return -value if objective in LOWER_IS_BETTER else value
+
+
+def rank(rows: List[Dict], objective: str = "sharpe_ratio") -> List[Dict]:
+    """Best first: largest objective, or smallest for LOWER_IS_BETTER metrics"""
+    return sorted(rows, key=lambda row: _score(row, objective), reverse=True)
+
+
+def format_table(rows: List[Dict], objective: str = "sharpe_ratio", limit: int = 20) -> str:
+    """Ranked results as a fixed-width text table"""
+    names = list(DEFAULT_STRATEGY)
+    header = f"{'#':>4}  " + "  ".join(f"{name:>14}" for name in names) + \
+        f"  {'sharpe':>8}  {'pnl':>12}  {'max_dd':>10}  {'trades':>7}  {'win%':>6}"
+    lines = [header, "-" * len(header)]
+    for position, row in enumerate(rows[:limit], 1):
+        sharpe = row["sharpe_ratio"]
+        lines.append(
+            f"{position:>4}  " + "  ".join(f"{str(row['params'].get(name, '-')):>14}" for name in names) +
+            f"  {'n/a' if sharpe is None else f'{sharpe:.2f}':>8}  {row['total_pnl']:>12,.2f}"
+            f"  {row['max_drawdown']:>10,.2f}  {row['total_trades']:>7}  {row['win_rate']:>6.1f}"
+        )
+    if objective != "sharpe_ratio":
+        lines.append(f"(ranked by {objective})")
+    return "\n".join(lines)
+
+
+class Optimizer:
+    """Runs parameter sets through the backtester on a process pool"""
+
+    def __init__(self, symbols: List[str], timestamps, close, volume=None,
+                 workers: Optional[int] = None, objective: str = "sharpe_ratio",
+                 backtest_options: Optional[Dict] = None):
+        self.data = SharedMarketData.create(symbols, timestamps, close, volume)
+        self.workers = workers or os.cpu_count() or 1
+        self.objective = objective
+        # Backtester keyword arguments; fill_model is given as FillModel kwargs
+        self.backtest_options = backtest_options or {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(self.data.spec, self.backtest_options))
+        return self._pool
+
+    def evaluate(self, param_sets: List[Dict], window: Optional[slice] = None) -> List[Dict]:
+        """Backtest every parameter set on one bar window; results ranked best first"""
+        window = window or slice(0, self.data.bars)
+        start, stop, _ = window.indices(self.data.bars)
+        tasks = [(params, start, stop) for params in param_sets]
+        # Batch several tasks per round trip once there are many more tasks than workers
+        chunksize = max(1, len(tasks) // (self.workers * 8))
+        rows = list(self._executor().map(_evaluate, tasks, chunksize=chunksize))
+        return rank(rows, self.objective)
+
+    def walk_forward(self, param_sets: List[Dict], folds: int = 4,
+                     train_fraction: float = 0.75) -> List[Dict]:
+        """Pick the best set on each train window and score it on the following test window"""
+        report = []
+        for fold, (train, test) in enumerate(walk_forward_splits(self.data.bars, folds, train_fraction)):
+            best = self.evaluate(param_sets, train)[0]
+            out_of_sample = self.evaluate([best["params"]], test)[0]
+            report.append({"fold": fold, "params": best["params"],
+                           "train": best, "test": out_of_sample})
+        return report
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self.data.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize the example strategy's parameters")
+    parser.add_argument("--symbols", type=int, default=10, help="Synthetic symbols to backtest")
+    parser.add_argument("--bars", type=int, default=20_000, help="Synthetic bars per symbol")
+    parser.add_argument("--random", type=int, default=0, metavar="N",
+                        help="Sample N random parameter sets instead of the full grid")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--objective", default="sharpe_ratio", help="Metric to rank by")
+    parser.add_argument("--walk-forward", type=int, default=0, metavar="FOLDS",
+                        help="Run a walk-forward analysis with this many folds")
+    args = parser.parse_args()
+
+    data = synthetic_bars(args.symbols, args.bars)
+    param_sets = random_search(DEFAULT_SPACE, args.random) if args.random else grid(DEFAULT_SPACE)
+    print(f"🔍 {len(param_sets)} parameter sets x {args.symbols * args.bars:,} bars")
+
+    started = time.perf_counter()
+    with Optimizer(data["symbols"], data["timestamps"], data["close"], data["volume"],
+                   workers=args.workers, objective=args.objective) as optimizer:
+        if args.walk_forward:
+            for fold in optimizer.walk_forward(param_sets, args.walk_forward):
+                train, test = fold["train"], fold["test"]
+                print(f"fold {fold['fold']}: {fold['params']}")
+                print(f"   train {args.objective}={_format_score(train, args.objective)} "
+                      f"test {args.objective}={_format_score(test, args.objective)} "
+                      f"test pnl ${test['total_pnl']:,.2f}")
+        else:
+            print(format_table(optimizer.evaluate(param_sets), args.objective))
+    print(f"⏱️  {time.perf_counter() - started:.1f}s on {optimizer.workers} workers")
+
+
+if __name__ == "__main__":
+    main()
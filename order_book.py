@@ -0,0 +1,415 @@
+"""
+Price-time-priority limit order book for paper trading and backtests
+
+Each side keeps its price levels as a sorted list of keys with the best
+level at the end (bids keyed by price, asks by -price), so the touch is
+list[-1] and new levels go in with bisect. A level is a deque of resting
+orders in arrival order. Cancels are lazy: the order is flagged and the
+level's open quantity reduced at once, and the dead entry is skipped when
+it reaches the front of its queue - so a cancel is O(1).
+
+Stop and stop-limit orders wait in heaps keyed by stop price and are
+released as soon as a trade prints through them.
+
+Market prints from a data feed can be replayed with print_trade(), which
+lets resting paper orders fill only once real volume has traded through
+their queue position.
+"""
+import heapq
+import itertools
+import time
+from bisect import insort
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+from execution_gateway import BrokerBackend, Order
+
+BUY, SELL = "buy", "sell"
+
+
+class BookOrder:
+    """A resting or working order inside the book"""
+
+    __slots__ = ("order_id", "side", "price", "quantity", "remaining", "order_type",
+                 "stop_price", "owner", "active")
+
+    def __init__(self, order_id, side: str, quantity: float, price: Optional[float],
+                 order_type: str = "limit", stop_price: Optional[float] = None, owner=None):
+        self.order_id = order_id
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.remaining = quantity
+        self.order_type = order_type
+        self.stop_price = stop_price
+        self.owner = owner
+        self.active = True
+
+
+# (maker order id, taker order id, price, quantity)
+Trade = Tuple[object, object, float, float]
+
+
+class OrderBook:
+    """One symbol's book: matching, stops, cancel and replace"""
+
+    def __init__(self, symbol: str, on_trade: Optional[Callable[[BookOrder, BookOrder, float, float], None]] = None,
+                 on_unfilled: Optional[Callable[[BookOrder], None]] = None):
+        self.symbol = symbol
+        self.on_trade = on_trade
+        # Called with a market order (or triggered stop) that ran out of liquidity
+        self.on_unfilled = on_unfilled
+        # Sorted level keys per side, best last; level queues and open size by key
+        self._bid_keys: List[float] = []
+        self._ask_keys: List[float] = []
+        self._bids: Dict[float, deque] = {}
+        self._asks: Dict[float, deque] = {}
+        self._bid_size: Dict[float, float] = {}
+        self._ask_size: Dict[float, float] = {}
+        self._orders: Dict[object, BookOrder] = {}
+        # (stop price, sequence, order); sell stops are keyed by -stop so both heaps are min-heaps
+        self._buy_stops: List = []
+        self._sell_stops: List = []
+        self._sequence = itertools.count()
+        self.last_price: Optional[float] = None
+
+    # -- queries -----------------------------------------------------------
+
+    def best_bid(self) -> Optional[float]:
+        self._trim(self._bid_keys, self._bid_size)
+        return self._bid_keys[-1] if self._bid_keys else None
+
+    def best_ask(self) -> Optional[float]:
+        self._trim(self._ask_keys, self._ask_size)
+        return -self._ask_keys[-1] if self._ask_keys else None
+
+    def depth(self, levels: int = 5) -> Dict[str, List[Tuple[float, float]]]:
+        """Top price levels per side as (price, open quantity), best first"""
+        bids = [(key, self._bid_size[key]) for key in reversed(self._bid_keys) if self._bid_size[key] > 0]
+        asks = [(-key, self._ask_size[key]) for key in reversed(self._ask_keys) if self._ask_size[key] > 0]
+        return {"bids": bids[:levels], "asks": asks[:levels]}
+
+    def get(self, order_id) -> Optional[BookOrder]:
+        return self._orders.get(order_id)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    # -- order entry -------------------------------------------------------
+
+    def submit(self, order_id, side: str, quantity: float, price: Optional[float] = None,
+               order_type: str = "limit", stop_price: Optional[float] = None, owner=None) -> BookOrder:
+        """Enter an order: match what crosses, rest the remainder (limit) or drop it (market)"""
+        order = BookOrder(order_id, side, quantity, price, order_type, stop_price, owner)
+        if order_type in ("stop", "stop_limit"):
+            self._orders[order_id] = order
+            if side == BUY:
+                heapq.heappush(self._buy_stops, (stop_price, next(self._sequence), order))
+            else:
+                heapq.heappush(self._sell_stops, (-stop_price, next(self._sequence), order))
+            self._trigger_stops()
+            return order
+        self._execute(order)
+        return order
+
+    def _execute(self, order: BookOrder):
+        limit = None if order.order_type == "market" else order.price
+        # Only call into the matcher when the order crosses the touch
+        if order.side == BUY:
+            keys = self._ask_keys
+            if keys and (limit is None or -keys[-1] <= limit):
+                self._match(order, keys, self._asks, self._ask_size, limit, -1.0)
+        else:
+            keys = self._bid_keys
+            if keys and (limit is None or keys[-1] >= limit):
+                self._match(order, keys, self._bids, self._bid_size, limit, 1.0)
+
+        if order.remaining > 0 and limit is not None:
+            self._rest(order)
+        else:
+            # Filled, or a market order with no more liquidity: nothing rests
+            order.active = False
+            self._orders.pop(order.order_id, None)
+            if order.remaining > 0 and self.on_unfilled is not None:
+                self.on_unfilled(order)
+        if self._buy_stops or self._sell_stops:
+            self._trigger_stops()
+
+    def _match(self, taker: BookOrder, keys: List[float], levels: Dict[float, deque],
+               sizes: Dict[float, float], limit: Optional[float], sign: float):
+        # sign turns a level key back into a price: asks are keyed by -price
+        on_trade = self.on_trade
+        while taker.remaining > 0 and keys:
+            key = keys[-1]
+            price = key * sign
+            if limit is not None and (price > limit if sign < 0 else price < limit):
+                break
+            queue = levels[key]
+            while queue and taker.remaining > 0:
+                maker = queue[0]
+                if not maker.active:
+                    queue.popleft()
+                    continue
+                quantity = maker.remaining if maker.remaining < taker.remaining else taker.remaining
+                maker.remaining -= quantity
+                taker.remaining -= quantity
+                sizes[key] -= quantity
+                self.last_price = price
+                if maker.remaining <= 0:
+                    maker.active = False
+                    queue.popleft()
+                    self._orders.pop(maker.order_id, None)
+                if on_trade is not None:
+                    on_trade(maker, taker, price, quantity)
+            if not queue:
+                keys.pop()
+                del levels[key]
+                del sizes[key]
+
+    def _rest(self, order: BookOrder):
+        if order.side == BUY:
+            key, keys, levels, sizes = order.price, self._bid_keys, self._bids, self._bid_size
+        else:
+            key, keys, levels, sizes = -order.price, self._ask_keys, self._asks, self._ask_size
+        queue = levels.get(key)
+        if queue is None:
+            queue = levels[key] = deque()
+            sizes[key] = 0.0
+            insort(keys, key)
+        queue.append(order)
+        sizes[key] += order.remaining
+        self._orders[order.order_id] = order
+
+    def _trim(self, keys: List[float], sizes: Dict[float, float]):
+        """Drop touch levels emptied by lazy cancels"""
+        levels = self._bids if keys is self._bid_keys else self._asks
+        while keys and sizes[keys[-1]] <= 0:
+            key = keys.pop()
+            del levels[key]
+            del sizes[key]
+
+    def _trigger_stops(self):
+        last = self.last_price
+        if last is None:
+            return
+        triggered = []
+        while self._buy_stops and self._buy_stops[0][0] <= last:
+            triggered.append(heapq.heappop(self._buy_stops)[2])
+        while self._sell_stops and -self._sell_stops[0][0] >= last:
+            triggered.append(heapq.heappop(self._sell_stops)[2])
+        for order in triggered:
+            if order.active:
+                self._orders.pop(order.order_id, None)
+                order.order_type = "limit" if order.order_type == "stop_limit" else "market"
+                self._execute(order)
+
+    # -- cancel / replace --------------------------------------------------
+
+    def cancel(self, order_id) -> bool:
+        order = self._orders.pop(order_id, None)
+        if order is None or not order.active:
+            return False
+        order.active = False
+        if order.order_type in ("stop", "stop_limit"):
+            return True  # Left in its heap and skipped when it triggers
+        if order.side == BUY:
+            self._bid_size[order.price] -= order.remaining
+        else:
+            self._ask_size[-order.price] -= order.remaining
+        return True
+
+    def replace(self, order_id, quantity: Optional[float] = None, price: Optional[float] = None,
+                new_order_id=None) -> Optional[BookOrder]:
+        """Amend an order; shrinking in place keeps queue priority, anything else requeues"""
+        order = self._orders.get(order_id)
+        if order is None or not order.active:
+            return None
+        filled = order.quantity - order.remaining
+        quantity = order.quantity if quantity is None else quantity
+        if (price is None or price == order.price) and quantity <= order.quantity and \
+                order.order_type == "limit":
+            reduce_by = order.quantity - quantity
+            order.quantity = quantity
+            order.remaining -= reduce_by
+            key = order.price if order.side == BUY else -order.price
+            (self._bid_size if order.side == BUY else self._ask_size)[key] -= reduce_by
+            if order.remaining <= 0:
+                self.cancel(order_id)
+            return order
+        self.cancel(order_id)
+        remaining = quantity - filled
+        if remaining <= 0:
+            return None
+        return self.submit(new_order_id if new_order_id is not None else order_id, order.side, remaining,
+                           order.price if price is None else price, order.order_type,
+                           order.stop_price, order.owner)
+
+    # -- market data -------------------------------------------------------
+
+    def print_trade(self, price: float, quantity: float):
+        """Replay a trade from the market feed through resting orders
+
+        The print consumes resting bids at or above `price` and asks at or
+        below it, in priority order, up to `quantity` on each side.
+        """
+        # The opposite side of each resting queue is the anonymous market
+        if self._bid_keys and self._bid_keys[-1] >= price:
+            self._match(BookOrder(None, SELL, quantity, price), self._bid_keys, self._bids,
+                        self._bid_size, price, 1.0)
+        if self._ask_keys and -self._ask_keys[-1] <= price:
+            self._match(BookOrder(None, BUY, quantity, price), self._ask_keys, self._asks,
+                        self._ask_size, price, -1.0)
+        self.last_price = price
+        if self._buy_stops or self._sell_stops:
+            self._trigger_stops()
+
+
+class MatchingEngine:
+    """Order books for many symbols behind one trade callback"""
+
+    def __init__(self, on_trade: Optional[Callable[[str, BookOrder, BookOrder, float, float], None]] = None,
+                 on_unfilled: Optional[Callable[[str, BookOrder], None]] = None):
+        self.on_trade = on_trade
+        self.on_unfilled = on_unfilled
+        self.books: Dict[str, OrderBook] = {}
+
+    def book(self, symbol: str) -> OrderBook:
+        book = self.books.get(symbol)
+        if book is None:
+            callback = unfilled = None
+            if self.on_trade is not None:
+                on_trade = self.on_trade
+                callback = lambda maker, taker, price, qty: on_trade(symbol, maker, taker, price, qty)
+            if self.on_unfilled is not None:
+                on_unfilled = self.on_unfilled
+                unfilled = lambda order: on_unfilled(symbol, order)
+            book = self.books[symbol] = OrderBook(symbol, callback, unfilled)
+        return book
+
+
+class OrderBookBroker(BrokerBackend):
+    """Paper-trading backend that works orders in local order books
+
+    Agent orders rest in price-time priority and fill as the market data
+    feed (print_trade) trades through them or as other orders cross them.
+    Market orders (and triggered stops) take whatever liquidity the book
+    has; the book only holds our own orders, so with `market_at_last` the
+    rest fills at the feed's last print, as it would against the real
+    market. Without a print to fill at, the rest is cancelled and the
+    order reported as partially filled.
+
+    With `ttl`, limit orders still resting more than `ttl` after they were
+    entered (in units of `clock`: seconds live, bars in a replay) are
+    cancelled as expired.
+    """
+
+    max_batch = 500
+
+    def __init__(self, market_at_last: bool = True, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.market_at_last = market_at_last
+        self.ttl = ttl
+        self.clock = clock
+        self.engine = MatchingEngine(self._trade, self._unfilled)
+        self._ids = itertools.count(1)
+        self._symbols: Dict[str, str] = {}
+        # (expiry, client order id) in entry order; ttl is fixed, so also in expiry order
+        self._expiries: deque = deque()
+
+    def _trade(self, symbol: str, maker: BookOrder, taker: BookOrder, price: float, quantity: float):
+        for order in (maker, taker):
+            if order.owner is not None:
+                self.on_fill(order.owner, quantity, price)
+
+    def _unfilled(self, symbol: str, order: BookOrder):
+        if order.owner is None:
+            return
+        last = self.engine.book(symbol).last_price
+        if self.market_at_last and last is not None:
+            remaining, order.remaining = order.remaining, 0.0
+            self.on_fill(order.owner, remaining, last)
+        else:
+            self.on_cancel(order.owner, "no liquidity for market order")
+
+    async def submit(self, orders: List[Order]):
+        self.submit_now(orders)
+
+    def submit_now(self, orders: List[Order]):
+        """submit() without the coroutine, for synchronous replays"""
+        for order in orders:
+            cid = order.client_order_id
+            if cid in self._symbols:
+                continue  # Idempotent retry
+            self._symbols[cid] = order.symbol
+            self.on_ack(cid, f"BOOK-{next(self._ids)}")
+            working = self.engine.book(order.symbol).submit(
+                cid, order.side, order.quantity, order.price, order.order_type,
+                order.stop_price, owner=cid)
+            if self.ttl is not None and working.active and working.order_type == "limit":
+                self._expiries.append((self.clock() + self.ttl, cid))
+
+    async def cancel(self, client_order_id: str):
+        self.cancel_now(client_order_id, "cancelled")
+
+    def cancel_now(self, client_order_id: str, reason: str) -> bool:
+        symbol = self._symbols.get(client_order_id)
+        if symbol is not None and self.engine.book(symbol).cancel(client_order_id):
+            self.on_cancel(client_order_id, reason)
+            return True
+        return False
+
+    def expire(self) -> int:
+        """Cancel resting orders past their ttl; returns how many"""
+        expiries, now, expired = self._expiries, self.clock(), 0
+        while expiries and expiries[0][0] < now:
+            expired += self.cancel_now(expiries.popleft()[1], "expired")
+        return expired
+
+    def print_trade(self, symbol: str, price: float, quantity: float):
+        if self._expiries:
+            self.expire()
+        self.engine.book(symbol).print_trade(price, quantity)
+
+
+def benchmark(events: int = 1_000_000, seed: int = 3) -> float:
+    """Random limit/market/cancel flow around a mid price; returns events per second"""
+    import random
+    import time
+
+    rng = random.Random(seed)
+    book = OrderBook("BENCH")
+    ids = itertools.count()
+    live: List[int] = []
+    flow = []
+    for _ in range(events):
+        r = rng.random()
+        if r < 0.6:
+            side = BUY if rng.random() < 0.5 else SELL
+            offset = rng.randint(0, 20) * 0.01
+            price = round(100.0 - offset if side == BUY else 100.0 + offset, 2)
+            flow.append(("limit", side, rng.randint(1, 10) * 100, price))
+        elif r < 0.9:
+            flow.append(("cancel", rng.random()))
+        else:
+            flow.append(("market", BUY if rng.random() < 0.5 else SELL, rng.randint(1, 5) * 100, None))
+
+    started = time.perf_counter()
+    for event in flow:
+        if event[0] == "cancel":
+            if live:
+                index = int(event[1] * len(live))
+                live[index], live[-1] = live[-1], live[index]
+                book.cancel(live.pop())
+            continue
+        order_id = next(ids)
+        order = book.submit(order_id, event[1], event[2], event[3], event[0])
+        if order.active and order.remaining > 0:
+            live.append(order_id)
+    elapsed = time.perf_counter() - started
+    return events / elapsed
+
+
+if __name__ == "__main__":
+    rate = benchmark()
+    print(f"📚 {rate / 1e6:.2f}M order events/s on one core")
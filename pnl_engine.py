@@ -0,0 +1,345 @@
+"""
+In-memory mark-to-market P&L for agent positions
+
+Positions are rows in flat NumPy arrays (symbol index, agent index,
+quantity, average price), and prices a vector indexed by symbol, so
+marking every position after a batch of ticks is a handful of vectorized
+operations and per-agent / per-vault totals are np.bincount sums.
+
+Postgres only hears about it through flush(): rows whose P&L moved by a
+material amount are written at once, everything else that changed is
+written on a throttled schedule. agent_positions derives market_value and
+unrealized_pnl from current_price, so writing current_price is enough.
+
+A closed position keeps its slot until its final (usually zero-quantity)
+row has been written; its realized P&L then moves to a per-agent total.
+Feed it with update_price() and on_fill() - AgentRuntime does both when
+given an engine.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL', 'https://your-project.supabase.co')
+SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY', 'your_supabase_service_role_key_here')
+
+DEFAULT_VAULT = "default"
+
+
+def supabase_position_writer(rows: List[Dict]):
+    """Upsert agent_positions rows through the Supabase REST API"""
+    import requests
+
+    headers = {
+        "apikey": SUPABASE_SERVICE_KEY,
+        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+        "Content-Type": "application/json",
+        "Prefer": "resolution=merge-duplicates,return=minimal",
+    }
+    response = requests.post(f"{SUPABASE_URL}/rest/v1/agent_positions",
+                             params={"on_conflict": "agent_id,symbol,paper_position"},
+                             headers=headers, json=rows, timeout=10)
+    response.raise_for_status()
+
+
+class Registry:
+    """Stable integer ids for names, for indexing the position arrays"""
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def id(self, name: str) -> int:
+        i = self.index.get(name)
+        if i is None:
+            i = self.index[name] = len(self.names)
+            self.names.append(name)
+        return i
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class PnLEngine:
+    """Vectorized mark-to-market of all positions with throttled writeback"""
+
+    def __init__(self, writer: Optional[Callable[[List[Dict]], None]] = None, flush_interval: float = 5.0,
+                 material_pnl: float = 100.0, material_move: float = 0.005, capacity: int = 1024):
+        self.writer = writer or supabase_position_writer
+        self.flush_interval = flush_interval
+        # A row is written at once if its unrealized P&L moved this many dollars,
+        # or its price this fraction, since it was last written
+        self.material_pnl = material_pnl
+        self.material_move = material_move
+
+        self.symbols = Registry()
+        self.agents = Registry()
+        self.vaults = Registry()
+        self.vaults.id(DEFAULT_VAULT)
+        self.prices = np.full(64, np.nan)
+        self.agent_vault = np.zeros(64, dtype=np.int32)
+        # Realized P&L of positions whose slots have been freed, per agent
+        self.closed_realized = np.zeros(64)
+
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._free: List[int] = []
+        self.size = 0
+        self.symbol_of = np.zeros(capacity, dtype=np.int32)
+        self.agent_of = np.zeros(capacity, dtype=np.int32)
+        self.quantity = np.zeros(capacity)
+        self.average_price = np.zeros(capacity)
+        self.realized = np.zeros(capacity)
+        self.active = np.zeros(capacity, dtype=bool)
+        # Price and P&L as last written to the database, and whether anything changed since
+        self.written_price = np.full(capacity, np.nan)
+        self.written_pnl = np.zeros(capacity)
+        self.changed = np.zeros(capacity, dtype=bool)
+        # Closed, with the final row still to be written
+        self.closing = np.zeros(capacity, dtype=bool)
+        self._last_flush = time.monotonic()
+
+    # -- registry and storage ----------------------------------------------
+
+    def _grow_ids(self, array: np.ndarray, needed: int, fill) -> np.ndarray:
+        if needed <= len(array):
+            return array
+        grown = np.full(max(needed, 2 * len(array)), fill, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _symbol(self, symbol: str) -> int:
+        i = self.symbols.id(symbol)
+        self.prices = self._grow_ids(self.prices, i + 1, np.nan)
+        return i
+
+    def _agent(self, agent_id: str) -> int:
+        i = self.agents.id(agent_id)
+        self.agent_vault = self._grow_ids(self.agent_vault, i + 1, 0)
+        self.closed_realized = self._grow_ids(self.closed_realized, i + 1, 0.0)
+        return i
+
+    def assign_vault(self, agent_id: str, vault: str):
+        """Count an agent's positions towards a vault's totals"""
+        agent = self._agent(agent_id)
+        self.agent_vault[agent] = self.vaults.id(vault)
+
+    def _slot(self, agent_id: str, symbol: str) -> int:
+        key = (agent_id, symbol)
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = self.size
+            self.size += 1
+            if slot >= len(self.quantity):
+                self._grow_rows()
+        self._slots[key] = slot
+        self.symbol_of[slot] = self._symbol(symbol)
+        self.agent_of[slot] = self._agent(agent_id)
+        self.quantity[slot] = self.average_price[slot] = self.realized[slot] = 0.0
+        self.written_price[slot] = np.nan
+        self.written_pnl[slot] = 0.0
+        self.active[slot] = True
+        self.closing[slot] = False
+        return slot
+
+    def _grow_rows(self):
+        for name in ("symbol_of", "agent_of", "quantity", "average_price", "realized",
+                     "active", "written_price", "written_pnl", "changed", "closing"):
+            array = getattr(self, name)
+            grown = np.zeros(2 * len(array), dtype=array.dtype)
+            if name == "written_price":
+                grown[:] = np.nan
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    # -- positions ---------------------------------------------------------
+
+    def set_position(self, agent_id: str, symbol: str, quantity: float, average_price: float,
+                     realized_pnl: float = 0.0):
+        """Load or overwrite a position, e.g. from agent_positions at start-up"""
+        slot = self._slot(agent_id, symbol)
+        self.quantity[slot] = quantity
+        self.average_price[slot] = average_price
+        self.realized[slot] = realized_pnl
+        self.changed[slot] = True
+
+    def apply_fill(self, agent_id: str, symbol: str, side: str, quantity: float, price: float):
+        """Fold a fill into the position: average in when adding, realize P&L when reducing"""
+        slot = self._slot(agent_id, symbol)
+        position = self.quantity[slot]
+        signed = quantity if side == "buy" else -quantity
+        new_position = position + signed
+        if position and (position > 0) != (signed > 0):
+            closed = min(abs(signed), abs(position))
+            self.realized[slot] += closed * (price - self.average_price[slot]) * (1 if position > 0 else -1)
+            if new_position and (new_position > 0) != (position > 0):
+                self.average_price[slot] = price  # Flipped: the remainder opens here
+        elif new_position:
+            self.average_price[slot] = (position * self.average_price[slot] + signed * price) / new_position
+        self.quantity[slot] = new_position
+        self.changed[slot] = True
+        if np.isnan(self.prices[self.symbol_of[slot]]):
+            self.prices[self.symbol_of[slot]] = price  # No tick seen yet: mark at the fill
+
+    def on_fill(self, order, quantity: float, price: float):
+        """ExecutionGateway fill listener: apply the fill, and close the position once flat"""
+        self.apply_fill(order.agent_id, order.symbol, order.side, quantity, price)
+        if self.quantity[self._slots[(order.agent_id, order.symbol)]] == 0:
+            self.close_position(order.agent_id, order.symbol)
+
+    def close_position(self, agent_id: str, symbol: str):
+        """Forget a flat position once its last row is written (the row stays in the database)
+
+        A new fill in the symbol opens a fresh slot straight away.
+        """
+        slot = self._slots.pop((agent_id, symbol), None)
+        if slot is not None:
+            self.closing[slot] = True
+            self.changed[slot] = True
+
+    def _release(self, slots: np.ndarray):
+        """Free closed slots whose final row has been written"""
+        np.add.at(self.closed_realized, self.agent_of[slots], self.realized[slots])
+        self.active[slots] = False
+        self.closing[slots] = False
+        self._free.extend(slots.tolist())
+
+    def detach_agent(self, agent_id: str) -> Dict:
+        """Hand over an agent's open positions and realized P&L (see restore_agent)
+
+        The slots are freed without a final write: the agent's new engine
+        writes the same rows from here on.
+        """
+        positions = []
+        for (owner, symbol), slot in list(self._slots.items()):
+            if owner != agent_id:
+                continue
+            del self._slots[(owner, symbol)]
+            positions.append({"symbol": symbol, "quantity": float(self.quantity[slot]),
+                              "average_price": float(self.average_price[slot]),
+                              "realized_pnl": float(self.realized[slot])})
+            self.active[slot] = self.changed[slot] = False
+            self._free.append(slot)
+        agent = self.agents.index.get(agent_id)
+        closed = 0.0
+        if agent is not None:
+            closed, self.closed_realized[agent] = float(self.closed_realized[agent]), 0.0
+        return {"positions": positions, "closed_realized": closed}
+
+    def restore_agent(self, agent_id: str, saved: Dict):
+        for position in saved.get("positions", ()):
+            self.set_position(agent_id, **position)
+        self.closed_realized[self._agent(agent_id)] += saved.get("closed_realized", 0.0)
+
+    # -- prices and marking -------------------------------------------------
+
+    def update_price(self, symbol: str, price: float):
+        self.prices[self._symbol(symbol)] = price
+
+    def update_prices(self, prices: Dict[str, float]):
+        """Apply a batch of ticks; only the price vector is touched"""
+        index = self.symbols.index
+        for symbol, price in prices.items():
+            i = index.get(symbol)
+            if i is None:
+                i = self._symbol(symbol)
+            self.prices[i] = price
+
+    def mark(self) -> Dict[str, np.ndarray]:
+        """Current price, market value and unrealized P&L for every position slot"""
+        n = self.size
+        quantity = self.quantity[:n]
+        price = self.prices[self.symbol_of[:n]]
+        # Positions without a price yet are marked at cost
+        price = np.where(np.isnan(price), self.average_price[:n], price)
+        market_value = quantity * price
+        unrealized = quantity * (price - self.average_price[:n])
+        active = self.active[:n]
+        return {"price": price, "market_value": np.where(active, market_value, 0.0),
+                "unrealized_pnl": np.where(active, unrealized, 0.0),
+                "realized_pnl": np.where(active, self.realized[:n], 0.0)}
+
+    def _totals(self, group_of: np.ndarray, groups: int, agent_group: np.ndarray) -> Dict[str, np.ndarray]:
+        marked = self.mark()
+        totals = {field: np.bincount(group_of, weights=values, minlength=groups)
+                  for field, values in marked.items() if field != "price"}
+        agents = len(self.agents)
+        totals["realized_pnl"] += np.bincount(agent_group, weights=self.closed_realized[:agents],
+                                              minlength=groups)
+        return totals
+
+    def agent_totals(self) -> Dict[str, Dict[str, float]]:
+        agents = len(self.agents)
+        totals = self._totals(self.agent_of[:self.size], agents, np.arange(agents))
+        return {name: {field: float(values[i]) for field, values in totals.items()}
+                for i, name in enumerate(self.agents.names)}
+
+    def vault_totals(self) -> Dict[str, Dict[str, float]]:
+        vault_of = self.agent_vault[self.agent_of[:self.size]]
+        totals = self._totals(vault_of, len(self.vaults), self.agent_vault[:len(self.agents)])
+        return {name: {field: float(values[i]) for field, values in totals.items()}
+                for i, name in enumerate(self.vaults.names)}
+
+    # -- writeback -----------------------------------------------------------
+
+    def pending_rows(self, force: bool = False) -> np.ndarray:
+        """Slots to write now: material moves always, any change once the interval is up"""
+        n = self.size
+        marked = self.mark()
+        price, unrealized = marked["price"], marked["unrealized_pnl"]
+        written = self.written_price[:n]
+        active = self.active[:n]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            moved = np.abs(price / written - 1.0) >= self.material_move
+        material = active & (self.closing[:n] | np.isnan(written) | moved |
+                             (np.abs(unrealized - self.written_pnl[:n]) >= self.material_pnl))
+        if force or time.monotonic() - self._last_flush >= self.flush_interval:
+            changed = active & (self.changed[:n] | (price != written))
+            return np.flatnonzero(material | changed)
+        return np.flatnonzero(material)
+
+    def rows(self, slots: Iterable[int]) -> List[Dict]:
+        now = datetime.now(timezone.utc).isoformat()
+        marked = self.mark()
+        return [{
+            "agent_id": self.agents.names[self.agent_of[slot]],
+            "symbol": self.symbols.names[self.symbol_of[slot]],
+            "quantity": float(self.quantity[slot]),
+            "average_price": float(self.average_price[slot]),
+            "current_price": float(marked["price"][slot]),
+            "paper_position": True,
+            "last_updated": now,
+        } for slot in slots]
+
+    def flush(self, force: bool = False) -> int:
+        """Write pending rows; returns how many were written"""
+        full = force or time.monotonic() - self._last_flush >= self.flush_interval
+        slots = self.pending_rows(force)
+        if len(slots):
+            self.writer(self.rows(slots.tolist()))
+            marked = self.mark()
+            self.written_price[slots] = marked["price"][slots]
+            self.written_pnl[slots] = marked["unrealized_pnl"][slots]
+            self.changed[slots] = False
+            closed = slots[self.closing[slots]]
+            if len(closed):
+                self._release(closed)
+        if full:
+            self._last_flush = time.monotonic()
+        return len(slots)
+
+    async def run_writeback(self, interval: float = 1.0):
+        """Check for rows to write every `interval` seconds, writing in a worker thread"""
+        while True:
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"⚠️  P&L writeback failed: {e}")
+            await asyncio.sleep(interval)
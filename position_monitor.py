@@ -0,0 +1,262 @@
+"""
+Event-driven stop-loss / take-profit / trailing-stop monitor
+
+One PositionMonitor watches every open position. Exit levels live in
+per-symbol sorted structures, so a price update only touches the levels
+it actually crosses:
+
+- Fixed levels sit in two heaps per symbol: "falls" (long stop-loss,
+  short take-profit) fire when price <= level, "rises" (long take-profit,
+  short stop-loss) when price >= level.
+- Trailing stops are grouped by trail percent. Within a group, positions
+  whose high-water mark the price has passed all end up with the same
+  mark, so they are merged into one bucket instead of each being moved;
+  buckets are kept in a sorted list and only the ends are touched.
+
+A tick therefore costs O(log n + triggered) (amortized for the bucket
+merges) however many positions are open. A position exits once: when
+one level fires, or it is removed, its other levels are dropped lazily.
+Once a symbol holds more retired positions than live ones its heaps and
+buckets are rebuilt without them, so positions that are re-added on every
+fill do not pile up dead levels.
+"""
+import heapq
+import itertools
+from bisect import bisect_left, insort
+from typing import Callable, Dict, List, Optional, Tuple
+
+LONG, SHORT = "long", "short"
+# Retired positions a symbol may carry before its levels are compacted
+COMPACT_MIN = 64
+
+# (position, reason, trigger price)
+Exit = Tuple["MonitoredPosition", str, float]
+
+
+class MonitoredPosition:
+    """An open position and its exit levels"""
+
+    __slots__ = ("position_id", "agent_id", "symbol", "side", "quantity", "entry_price",
+                 "stop_loss", "take_profit", "trail_pct", "active", "exit_reason", "exit_price")
+
+    def __init__(self, position_id, agent_id: str, symbol: str, side: str, quantity: float,
+                 entry_price: float, stop_loss: Optional[float] = None,
+                 take_profit: Optional[float] = None, trail_pct: Optional[float] = None):
+        if side not in (LONG, SHORT):
+            raise ValueError(f"side must be {LONG!r} or {SHORT!r}")
+        self.position_id = position_id
+        self.agent_id = agent_id
+        self.symbol = symbol
+        self.side = side
+        self.quantity = quantity
+        self.entry_price = entry_price
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.trail_pct = trail_pct
+        self.active = True
+        self.exit_reason: Optional[str] = None
+        self.exit_price: Optional[float] = None
+
+    def __repr__(self):
+        return (f"MonitoredPosition({self.position_id} {self.side} {self.quantity:g} {self.symbol} "
+                f"@ {self.entry_price}, {'open' if self.active else self.exit_reason})")
+
+
+class TrailingGroup:
+    """Trailing stops on one symbol and side that share a trail percent
+
+    Marks are stored as keys that grow in the profitable direction (price
+    for longs, -price for shorts), so both sides use the same logic: a
+    position's stop fires once key(price) <= mark key * factor, with
+    factor 1 - t for longs and 1 + t for shorts.
+    """
+
+    __slots__ = ("factor", "sign", "marks", "members")
+
+    def __init__(self, side: str, trail_pct: float):
+        self.sign = 1.0 if side == LONG else -1.0
+        self.factor = (1.0 - trail_pct) if side == LONG else (1.0 + trail_pct)
+        self.marks: List[float] = []  # ascending mark keys
+        self.members: Dict[float, List[MonitoredPosition]] = {}
+
+    def add(self, position: MonitoredPosition, mark: float):
+        key = mark * self.sign
+        bucket = self.members.get(key)
+        if bucket is None:
+            bucket = self.members[key] = []
+            insort(self.marks, key)
+        bucket.append(position)
+
+    def update(self, price: float, fired: List[MonitoredPosition]):
+        key = price * self.sign
+        marks = self.marks
+        # Every mark the price has moved past becomes the price itself: merge those buckets
+        passed = bisect_left(marks, key)
+        if passed:
+            merged = self.members.pop(key, None) or []
+            for old in marks[:passed]:
+                bucket = self.members.pop(old)
+                if len(bucket) > len(merged):
+                    bucket, merged = merged, bucket
+                merged.extend(bucket)
+            del marks[:passed]
+            if not marks or marks[0] != key:
+                marks.insert(0, key)
+            self.members[key] = merged
+        # Buckets whose stop the price has gone through: a stop fires once
+        # key <= mark * factor, i.e. for every mark >= key / factor (best marks last)
+        first = bisect_left(marks, key / self.factor)
+        if first < len(marks):
+            for mark in marks[first:]:
+                fired.extend(self.members.pop(mark))
+            del marks[first:]
+
+    def compact(self):
+        """Drop positions that are no longer active, and buckets left empty"""
+        marks = []
+        for key in self.marks:
+            bucket = [position for position in self.members[key] if position.active]
+            if bucket:
+                self.members[key] = bucket
+                marks.append(key)
+            else:
+                del self.members[key]
+        self.marks[:] = marks
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self.members.values())
+
+
+class SymbolLevels:
+    """All exit levels on one symbol"""
+
+    __slots__ = ("falls", "rises", "trailing", "live", "retired")
+
+    def __init__(self):
+        # falls: (-level, seq, position, reason) max-heap; rises: (level, seq, position, reason) min-heap
+        self.falls: List = []
+        self.rises: List = []
+        self.trailing: Dict[Tuple[str, float], TrailingGroup] = {}
+        # Active positions, and inactive ones whose levels may still be stored
+        self.live = 0
+        self.retired = 0
+
+    def compact(self):
+        """Rebuild the heaps and trailing groups from active positions only (in place)"""
+        for heap in (self.falls, self.rises):
+            heap[:] = [entry for entry in heap if entry[2].active]
+            heapq.heapify(heap)
+        for side_pct, group in list(self.trailing.items()):
+            group.compact()
+            if not group.marks:
+                del self.trailing[side_pct]
+        self.retired = 0
+
+    def size(self) -> int:
+        """Stored level entries, dead ones included"""
+        return len(self.falls) + len(self.rises) + sum(len(group) for group in self.trailing.values())
+
+
+class PositionMonitor:
+    """Watches open positions against a price stream and reports exits"""
+
+    def __init__(self, on_exit: Optional[Callable[[MonitoredPosition, str, float], None]] = None):
+        self.on_exit = on_exit
+        self.positions: Dict[object, MonitoredPosition] = {}
+        self._symbols: Dict[str, SymbolLevels] = {}
+        self._sequence = itertools.count()
+
+    def _levels(self, symbol: str) -> SymbolLevels:
+        levels = self._symbols.get(symbol)
+        if levels is None:
+            levels = self._symbols[symbol] = SymbolLevels()
+        return levels
+
+    def add(self, position_id, agent_id: str, symbol: str, side: str, quantity: float,
+            entry_price: float, stop_loss: Optional[float] = None, take_profit: Optional[float] = None,
+            trail_pct: Optional[float] = None) -> MonitoredPosition:
+        """Start watching a position; levels are absolute prices, trail_pct a fraction"""
+        if position_id in self.positions:
+            self.remove(position_id)
+        position = MonitoredPosition(position_id, agent_id, symbol, side, quantity, entry_price,
+                                     stop_loss, take_profit, trail_pct)
+        self.positions[position_id] = position
+        levels = self._levels(symbol)
+        levels.live += 1
+        # A long's stop is below and its target above the price; a short is the mirror image
+        if side == LONG:
+            (fall_level, fall_reason), (rise_level, rise_reason) = (stop_loss, "stop_loss"), (take_profit, "take_profit")
+        else:
+            (fall_level, fall_reason), (rise_level, rise_reason) = (take_profit, "take_profit"), (stop_loss, "stop_loss")
+        if fall_level is not None:
+            heapq.heappush(levels.falls, (-fall_level, next(self._sequence), position, fall_reason))
+        if rise_level is not None:
+            heapq.heappush(levels.rises, (rise_level, next(self._sequence), position, rise_reason))
+        if trail_pct:
+            group = levels.trailing.get((side, trail_pct))
+            if group is None:
+                group = levels.trailing[(side, trail_pct)] = TrailingGroup(side, trail_pct)
+            group.add(position, entry_price)
+        return position
+
+    def remove(self, position_id) -> Optional[MonitoredPosition]:
+        """Stop watching (e.g. closed by the strategy); its levels are dropped lazily"""
+        position = self.positions.pop(position_id, None)
+        if position is not None:
+            position.active = False
+            levels = self._symbols[position.symbol]
+            self._retire(levels)
+            self._maybe_compact(levels)
+        return position
+
+    @staticmethod
+    def _retire(levels: SymbolLevels):
+        levels.live -= 1
+        levels.retired += 1
+
+    @staticmethod
+    def _maybe_compact(levels: SymbolLevels):
+        if levels.retired >= COMPACT_MIN and levels.retired > levels.live:
+            levels.compact()
+
+    def on_price(self, symbol: str, price: float) -> List[Exit]:
+        """Fire every level this price crosses; returns the exits in trigger order"""
+        levels = self._symbols.get(symbol)
+        if levels is None:
+            return []
+        exits: List[Exit] = []
+        falls, rises = levels.falls, levels.rises
+        while falls and -falls[0][0] >= price:
+            _, _, position, reason = heapq.heappop(falls)
+            self._exit(position, reason, price, exits)
+        while rises and rises[0][0] <= price:
+            _, _, position, reason = heapq.heappop(rises)
+            self._exit(position, reason, price, exits)
+        if levels.trailing:
+            fired: List[MonitoredPosition] = []
+            for group in levels.trailing.values():
+                group.update(price, fired)
+            for position in fired:
+                self._exit(position, "trailing_stop", price, exits)
+        if exits:
+            self._maybe_compact(levels)
+        return exits
+
+    def _exit(self, position: MonitoredPosition, reason: str, price: float, exits: List[Exit]):
+        if not position.active:
+            return  # Already exited through another level, or removed
+        position.active = False
+        position.exit_reason = reason
+        position.exit_price = price
+        self.positions.pop(position.position_id, None)
+        self._retire(self._symbols[position.symbol])
+        exits.append((position, reason, price))
+        if self.on_exit is not None:
+            self.on_exit(position, reason, price)
+
+    def stats(self) -> Dict:
+        return {
+            "open_positions": len(self.positions),
+            "symbols": len(self._symbols),
+            "levels": sum(levels.size() for levels in self._symbols.values()),
+        }
@@ -0,0 +1,219 @@
+"""
+On-demand sampling profiler for a running agent host
+
+ProfilerServer listens on a local Unix socket from its own thread, so it
+answers even while the event loop is stuck. A "profile <seconds>" request
+samples every thread's stack with sys._current_frames() at a fixed rate
+for that long and writes the result as collapsed stacks (one
+"frame;frame;... count" line per distinct stack), which flamegraph.pl,
+speedscope and inferno read directly.
+
+Samples taken inside TradingAgentExample.analyze_and_trade are tagged
+with the agent (read from the frame's `self`) and the pipeline stage
+(from which stage method is on the stack), so the flamegraph splits by
+agent_id and stage at the root. Nothing runs on the hot path between
+captures.
+
+    python profiler.py --socket /tmp/agent-host-1234.sock --seconds 10
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+# Methods of analyze_and_trade's pipeline, by stage (see latency.STAGES)
+STAGE_FUNCTIONS = {
+    "get_market_data": "market_data",
+    "calculate_indicators": "indicators",
+    "make_trading_decision": "decision",
+    "validate_risk": "risk",
+    "execute_trade": "execution",
+    "start_position_monitoring": "execution",
+}
+
+PIPELINE_FUNCTION = "analyze_and_trade"
+
+DEFAULT_SOCKET = "/tmp/agent-host-{pid}.sock"
+
+
+def frame_label(code) -> str:
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_qualname}:{code.co_firstlineno}"
+
+
+def sample_stack(frame) -> Tuple[Tuple[str, ...], Optional[str], Optional[str]]:
+    """(frames root first, agent_id, stage) for one thread's current frame"""
+    labels = []
+    agent_id = stage = None
+    while frame is not None:
+        code = frame.f_code
+        labels.append(frame_label(code))
+        name = code.co_name
+        if stage is None and name in STAGE_FUNCTIONS:
+            stage = STAGE_FUNCTIONS[name]
+        if agent_id is None and name == PIPELINE_FUNCTION:
+            agent = frame.f_locals.get("self")
+            agent_id = getattr(agent, "agent_id", None)
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels), agent_id, stage
+
+
+class SamplingProfiler:
+    """Samples all threads' stacks at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.taken = 0
+
+    def capture(self, seconds: float) -> Counter:
+        """Sample for `seconds` from the calling thread (which is left out)"""
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while next_sample < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack, agent_id, stage = sample_stack(frame)
+                root = [f"thread:{names.get(ident, ident)}"]
+                if agent_id is not None:
+                    root.append(f"agent:{agent_id}")
+                if stage is not None:
+                    root.append(f"stage:{stage}")
+                self.samples[";".join(root + list(stack))] += 1
+            self.taken += 1
+            next_sample += self.interval
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_sample = time.monotonic()  # Fell behind: don't burst to catch up
+        return self.samples
+
+    def write_collapsed(self, path: str) -> int:
+        """Write 'stack count' lines; returns how many distinct stacks"""
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return len(self.samples)
+
+    def by_tag(self, prefix: str) -> Dict[str, int]:
+        """Sample counts per agent ("agent:") or stage ("stage:")"""
+        counts: Counter = Counter()
+        for stack, count in self.samples.items():
+            for frame in stack.split(";", 3)[:3]:
+                if frame.startswith(prefix):
+                    counts[frame[len(prefix):]] += count
+        return dict(counts)
+
+
+class ProfilerServer:
+    """Local control socket that runs captures on request
+
+    Commands, one per line:
+      ping
+      profile <seconds> [interval_ms] [output_path]
+    A profile reply is "ok <path> <samples> <stacks>" once the file is written.
+    """
+
+    def __init__(self, path: str = DEFAULT_SOCKET, output_dir: str = "/tmp"):
+        self.path = path.format(pid=os.getpid())
+        self.output_dir = output_dir
+        self._server: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._capture_lock = threading.Lock()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self._server.listen(4)
+        self._thread = threading.Thread(target=self._serve, name="profiler-control", daemon=True)
+        self._thread.start()
+        print(f"🔬 Profiler listening on {self.path}")
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return  # Closed by stop()
+            threading.Thread(target=self._handle, args=(conn,), name="profiler-capture",
+                             daemon=True).start()
+
+    def _handle(self, conn: socket.socket):
+        with conn:
+            try:
+                line = conn.makefile().readline().split()
+                conn.sendall((self._command(line) + "\n").encode())
+            except Exception as e:
+                conn.sendall(f"error {type(e).__name__}: {e}\n".encode())
+
+    def _command(self, args) -> str:
+        if not args or args[0] == "ping":
+            return "pong"
+        if args[0] != "profile":
+            return f"error unknown command {args[0]!r}"
+        seconds = float(args[1]) if len(args) > 1 else 10.0
+        interval = float(args[2]) / 1000 if len(args) > 2 else 0.005
+        path = args[3] if len(args) > 3 else os.path.join(
+            self.output_dir, f"agent-profile-{os.getpid()}-{int(time.time())}.collapsed")
+        if not self._capture_lock.acquire(blocking=False):
+            return "error a capture is already running"
+        try:
+            profiler = SamplingProfiler(interval)
+            profiler.capture(seconds)
+            stacks = profiler.write_collapsed(path)
+        finally:
+            self._capture_lock.release()
+        return f"ok {path} {profiler.taken} {stacks}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            self._thread = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+def request_profile(path: str, seconds: float = 10.0, interval_ms: float = 5.0,
+                    output: Optional[str] = None) -> str:
+    """Ask a running host for a capture; returns the server's reply line"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(seconds + 30)
+        conn.connect(path)
+        command = f"profile {seconds} {interval_ms}" + (f" {output}" if output else "")
+        conn.sendall((command + "\n").encode())
+        return conn.makefile().readline().strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture a flamegraph from a running agent host")
+    parser.add_argument("--socket", required=True, help="control socket of the host")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--interval-ms", type=float, default=5.0)
+    parser.add_argument("--out", help="collapsed-stack output path (written by the host)")
+    args = parser.parse_args()
+    reply = request_profile(args.socket, args.seconds, args.interval_ms, args.out)
+    if not reply.startswith("ok "):
+        print(f"❌ {reply}")
+        sys.exit(1)
+    _, path, samples, stacks = reply.split()
+    print(f"✅ {samples} samples, {stacks} distinct stacks -> {path}")
+    print(f"   flamegraph.pl {path} > profile.svg")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,9 @@ import sys
 import json
 import time
 import threading
-from typing import Dict, Any, Optional
+import asyncio
+import argparse
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 
 class MockRedis:
@@ -21,12 +23,18 @@ class MockRedis:
         self.lock = threading.Lock()
         print("🔧 Mock Redis service initialized")
     
-    def set(self, key: str, value: Any, ex: Optional[int] = None) -> bool:
-        """Set a key-value pair with optional expiry"""
+    def set(self, key: str, value: Any, ex: Optional[int] = None, px: Optional[int] = None,
+            nx: bool = False, xx: bool = False) -> Optional[bool]:
+        """Set a key-value pair with optional expiry; None if NX/XX prevented it (as redis-py)"""
         with self.lock:
+            if nx or xx:
+                expires = self.expiry.get(key)
+                present = key in self.data and not (expires and time.time() > expires)
+                if (nx and present) or (xx and not present):
+                    return None
             self.data[key] = value
-            if ex:
-                self.expiry[key] = time.time() + ex
+            if ex or px:
+                self.expiry[key] = time.time() + (ex if ex else px / 1000)
             elif key in self.expiry:
                 del self.expiry[key]
         return True
@@ -75,6 +83,145 @@ class MockRedis:
                 return [k for k in self.data.keys() if k.startswith(prefix)]
             return [k for k in self.data.keys() if k == pattern]
 
+class ProtocolError(Exception):
+    """Malformed RESP input; the connection is answered with an error and closed"""
+
+class RespServer:
+    """Minimal RESP (Redis protocol) front end for MockRedis
+    
+    Lets redis-py, redis-cli and benchmarks talk to the mock over TCP when no
+    real Redis is installed. Supports the commands MockRedis implements.
+    """
+    
+    def __init__(self, store: Optional[MockRedis] = None, host: str = "127.0.0.1", port: int = 6379):
+        self.store = store or MockRedis()
+        self.host = host
+        self.port = port
+    
+    async def serve_forever(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        print(f"🔌 RESP stand-in listening on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+    
+    async def _read_command(self, reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, e.g. from telnet or redis-benchmark -I
+            return line.strip().split()
+        args = []
+        for _ in range(self._length(line, b"*")):
+            header = await reader.readline()
+            length = self._length(header, b"$")
+            data = await reader.readexactly(length + 2)
+            args.append(data[:-2])
+        return args
+    
+    @staticmethod
+    def _length(header: bytes, prefix: bytes) -> int:
+        """Count from a '*<n>' or '$<n>' header line"""
+        if not header.startswith(prefix):
+            raise ProtocolError(f"expected '{prefix.decode()}', got {header[:1]!r}")
+        try:
+            length = int(header[1:])
+        except ValueError:
+            raise ProtocolError(f"invalid length {header[1:].strip()!r}")
+        if length < 0:
+            raise ProtocolError(f"invalid length {length}")
+        return length
+    
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if value is True:
+            return b"+OK\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, Exception):
+            return f"-ERR {value}\r\n".encode()
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(RespServer._encode(item) for item in value)
+        data = value if isinstance(value, bytes) else str(value).encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+    
+    def execute(self, args: List[bytes]) -> Any:
+        command = args[0].decode().upper()
+        params = [arg.decode() for arg in args[1:]]
+        
+        if command == "PING":
+            return params[0] if params else "PONG"
+        if command == "ECHO":
+            return params[0]
+        if command == "GET":
+            return self.store.get(params[0])
+        if command == "SET":
+            return self._set(params)
+        if command == "DEL":
+            return self.store.delete(*params)
+        if command == "EXISTS":
+            return sum(1 for key in params if self.store.exists(key))
+        if command == "KEYS":
+            return self.store.keys(params[0] if params else "*")
+        if command in ("FLUSHALL", "FLUSHDB"):
+            return self.store.flushall()
+        if command == "DBSIZE":
+            return len(self.store.keys())
+        if command in ("SELECT", "CLIENT", "COMMAND"):
+            return True  # connection setup chatter from clients
+        return ValueError(f"unknown command '{command}'")
+    
+    def _set(self, params: List[str]) -> Any:
+        """SET key value [EX seconds | PX milliseconds] [NX | XX]"""
+        key, value = params[0], params[1]
+        options: Dict[str, Any] = {}
+        i = 2
+        while i < len(params):
+            option = params[i].upper()
+            if option in ("NX", "XX"):
+                options[option.lower()] = True
+                i += 1
+            elif option in ("EX", "PX") and i + 1 < len(params):
+                amount = int(params[i + 1])
+                if amount <= 0:
+                    return ValueError("invalid expire time in 'set' command")
+                options[option.lower()] = amount
+                i += 2
+            else:
+                return ValueError("syntax error")
+        if ("nx" in options and "xx" in options) or ("ex" in options and "px" in options):
+            return ValueError("syntax error")
+        return self.store.set(key, value, **options)
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    args = await self._read_command(reader)
+                except ProtocolError as e:
+                    writer.write(f"-ERR Protocol error: {e}\r\n".encode())
+                    await writer.drain()
+                    break
+                if args is None:
+                    break
+                if not args:
+                    continue
+                try:
+                    reply = self.execute(args)
+                except (IndexError, ValueError) as e:
+                    reply = ValueError(f"wrong arguments: {e}")
+                if args[0].upper() == b"QUIT":
+                    writer.write(b"+OK\r\n")
+                    break
+                writer.write(self._encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
 class RedisSetup:
     """Redis setup and configuration manager"""
     
@@ -264,6 +411,20 @@ def main():
     return True
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Redis setup and RESP stand-in")
+    parser.add_argument("--serve", action="store_true",
+                        help="serve MockRedis over the Redis protocol instead of running setup")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv('REDIS_PORT', 6379)))
+    args = parser.parse_args()
+    
+    if args.serve:
+        try:
+            asyncio.run(RespServer(host=args.host, port=args.port).serve_forever())
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+    
     try:
         result = main()
         sys.exit(0 if result else 1)
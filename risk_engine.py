@@ -0,0 +1,271 @@
+"""
+In-memory pre-trade risk engine for trading agents
+
+Limits from agent_trading_permissions are loaded once into slotted
+AgentLimits records (allowed symbols as frozensets) and refreshed only
+when rows change, by polling on updated_at. Each agent's daily trade
+count and positions live in an AgentBook guarded by its own lock, so a
+check-and-reserve is atomic per agent and never touches the database.
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+SUPABASE_URL = os.getenv('NEXT_PUBLIC_SUPABASE_URL', 'https://your-project.supabase.co')
+SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY', 'your_supabase_service_role_key_here')
+
+# Minimum decision confidence each risk level will trade on
+RISK_LEVEL_MIN_CONFIDENCE = {"conservative": 0.7, "moderate": 0.5, "aggressive": 0.0}
+
+# Strategies an agent without a permissions row may run, the example's momentum_rsi included
+DEFAULT_ALLOWED_STRATEGIES = ("momentum", "momentum_rsi", "mean_reversion", "arbitrage")
+
+
+def _as_set(values) -> Optional[frozenset]:
+    return None if values is None else frozenset(values)
+
+
+def _utc_day(now: float) -> int:
+    return int(now // 86400)
+
+
+class AgentLimits:
+    """One agent_trading_permissions row, ready for constant-time checks"""
+
+    __slots__ = ("agent_id", "max_trade_size", "max_position_size", "max_daily_trades",
+                 "allowed_symbols", "allowed_strategies", "risk_level", "min_confidence",
+                 "is_active", "paper_trading_only", "updated_at")
+
+    def __init__(self, agent_id: str, max_trade_size: Optional[float] = 10000.0,
+                 max_position_size: float = 50000.0, max_daily_trades: int = 100,
+                 allowed_symbols=("AAPL", "GOOGL", "MSFT", "AMZN"),
+                 allowed_strategies=DEFAULT_ALLOWED_STRATEGIES,
+                 risk_level: str = "moderate", is_active: bool = True,
+                 paper_trading_only: bool = True, updated_at: Optional[str] = None):
+        self.agent_id = agent_id
+        self.max_trade_size = None if max_trade_size is None else float(max_trade_size)
+        self.max_position_size = float(max_position_size)
+        self.max_daily_trades = int(max_daily_trades)
+        self.allowed_symbols = _as_set(allowed_symbols)
+        self.allowed_strategies = _as_set(allowed_strategies)
+        self.risk_level = risk_level
+        self.min_confidence = RISK_LEVEL_MIN_CONFIDENCE.get(risk_level, 0.5)
+        self.is_active = is_active
+        self.paper_trading_only = paper_trading_only
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_row(cls, row: Dict) -> "AgentLimits":
+        """Build from a database row; missing columns take the schema defaults"""
+        defaults = cls("")
+        return cls(
+            agent_id=row["agent_id"],
+            max_trade_size=row.get("max_trade_size", defaults.max_trade_size),
+            max_position_size=row.get("max_position_size", defaults.max_position_size),
+            max_daily_trades=row.get("max_daily_trades", defaults.max_daily_trades),
+            allowed_symbols=row.get("allowed_symbols", defaults.allowed_symbols),
+            allowed_strategies=row.get("allowed_strategies", defaults.allowed_strategies),
+            risk_level=row.get("risk_level", defaults.risk_level),
+            is_active=row.get("is_active", True),
+            paper_trading_only=row.get("paper_trading_only", True),
+            updated_at=row.get("updated_at"),
+        )
+
+
+class AgentBook:
+    """Mutable per-agent risk state: today's trade count and positions"""
+
+    __slots__ = ("lock", "day", "trades_today", "positions")
+
+    def __init__(self, day: int):
+        self.lock = threading.Lock()
+        self.day = day
+        self.trades_today = 0
+        self.positions: Dict[str, float] = {}
+
+
+class RiskCheck:
+    """Outcome of one pre-trade check"""
+
+    __slots__ = ("approved", "reason")
+
+    def __init__(self, approved: bool, reason: str = ""):
+        self.approved = approved
+        self.reason = reason
+
+    def __bool__(self) -> bool:
+        return self.approved
+
+    def __repr__(self):
+        return "RiskCheck(approved)" if self.approved else f"RiskCheck(rejected: {self.reason})"
+
+
+APPROVED = RiskCheck(True)
+
+
+def fetch_permissions(since: Optional[str] = None) -> List[Dict]:
+    """agent_trading_permissions rows from Supabase, optionally only those changed after `since`"""
+    # Only the refresh path needs HTTP; checks and backtests run without requests installed
+    import requests
+
+    headers = {
+        "apikey": SUPABASE_SERVICE_KEY,
+        "Authorization": f"Bearer {SUPABASE_SERVICE_KEY}",
+    }
+    params = {"select": "*", "order": "updated_at.asc"}
+    if since:
+        params["updated_at"] = f"gt.{since}"
+    response = requests.get(f"{SUPABASE_URL}/rest/v1/agent_trading_permissions",
+                            headers=headers, params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+class RiskEngine:
+    """Validates trade decisions against per-agent limits without I/O
+
+    check() approves a decision and reserves it in one step: the daily
+    counter and the position are updated under the agent's lock, so two
+    concurrent decisions cannot both squeeze under the same limit. Call
+    release() if a reserved order is then rejected or cancelled.
+
+    Market orders carry no price; they are valued at the last price passed
+    to mark(), and rejected if there is none. `clock` decides when daily
+    counters roll over (backtests pass bar time).
+    """
+
+    def __init__(self, fetch: Callable[[Optional[str]], List[Dict]] = fetch_permissions,
+                 clock: Callable[[], float] = time.time):
+        self.fetch = fetch
+        self.clock = clock
+        self._limits: Dict[str, AgentLimits] = {}
+        self._books: Dict[str, AgentBook] = {}
+        self._marks: Dict[str, float] = {}
+        self._books_lock = threading.Lock()
+        # Highest updated_at seen, so refreshes only pull changed rows
+        self.version: Optional[str] = None
+
+    def set_limits(self, limits: AgentLimits):
+        # A single dict assignment, so checks see either the old or the new limits
+        self._limits[limits.agent_id] = limits
+        if limits.updated_at and (self.version is None or str(limits.updated_at) > self.version):
+            self.version = str(limits.updated_at)
+
+    def load(self, rows: List[Dict]) -> int:
+        for row in rows:
+            self.set_limits(AgentLimits.from_row(row))
+        return len(rows)
+
+    def limits(self, agent_id: str) -> Optional[AgentLimits]:
+        return self._limits.get(agent_id)
+
+    def refresh(self) -> int:
+        """Pull rows changed since the last load; returns how many changed"""
+        return self.load(self.fetch(self.version))
+
+    async def run_refresh(self, interval: float = 30.0):
+        """Poll for permission changes in a worker thread until cancelled"""
+        while True:
+            try:
+                changed = await asyncio.to_thread(self.refresh)
+                if changed:
+                    print(f"🛡️  Reloaded trading permissions for {changed} agent(s)")
+            except Exception as e:
+                print(f"⚠️  Permission refresh failed: {e}")
+            await asyncio.sleep(interval)
+
+    def book(self, agent_id: str) -> AgentBook:
+        book = self._books.get(agent_id)
+        if book is None:
+            with self._books_lock:
+                book = self._books.setdefault(agent_id, AgentBook(_utc_day(self.clock())))
+        return book
+
+    def mark(self, symbol: str, price: float):
+        """Last traded price, used to value orders that carry no price"""
+        self._marks[symbol] = price
+
+    def check(self, agent_id: str, decision) -> RiskCheck:
+        """Approve and reserve a buy/sell decision, or say why not"""
+        limits = self._limits.get(agent_id)
+        if limits is None:
+            return RiskCheck(False, "no trading permissions")
+        if not limits.is_active:
+            return RiskCheck(False, "agent is not active")
+        symbol = decision.symbol
+        if limits.allowed_symbols is not None and symbol not in limits.allowed_symbols:
+            return RiskCheck(False, f"{symbol} is not an allowed symbol")
+        if limits.allowed_strategies is not None and decision.strategy not in limits.allowed_strategies:
+            return RiskCheck(False, f"strategy {decision.strategy} is not allowed")
+        if decision.confidence < limits.min_confidence:
+            return RiskCheck(False, f"confidence {decision.confidence:.2f} below {limits.risk_level} minimum")
+
+        price = decision.price if decision.price is not None else self._marks.get(symbol)
+        if price is None or price <= 0:
+            return RiskCheck(False, f"no price to value the {symbol} order")
+        quantity = decision.quantity
+        if limits.max_trade_size is not None and quantity * price > limits.max_trade_size:
+            return RiskCheck(False, f"trade size ${quantity * price:,.0f} exceeds ${limits.max_trade_size:,.0f}")
+        signed = quantity if decision.action == "buy" else -quantity
+
+        book = self.book(agent_id)
+        with book.lock:
+            today = _utc_day(self.clock())
+            if book.day != today:
+                book.day = today
+                book.trades_today = 0
+            if book.trades_today >= limits.max_daily_trades:
+                return RiskCheck(False, f"daily trade limit {limits.max_daily_trades} reached")
+            position = book.positions.get(symbol, 0.0) + signed
+            if abs(position) * price > limits.max_position_size:
+                return RiskCheck(False, f"position in {symbol} would exceed ${limits.max_position_size:,.0f}")
+            book.trades_today += 1
+            book.positions[symbol] = position
+        return APPROVED
+
+    def release(self, agent_id: str, decision):
+        """Undo the reservation of an approved decision that did not execute"""
+        book = self.book(agent_id)
+        signed = decision.quantity if decision.action == "buy" else -decision.quantity
+        with book.lock:
+            book.trades_today = max(book.trades_today - 1, 0)
+            book.positions[decision.symbol] = book.positions.get(decision.symbol, 0.0) - signed
+
+    def adjust_fill(self, agent_id: str, decision, filled_quantity: float):
+        """Correct a reservation when an order fills for less than requested"""
+        unfilled = decision.quantity - filled_quantity
+        if unfilled:
+            book = self.book(agent_id)
+            signed = unfilled if decision.action == "buy" else -unfilled
+            with book.lock:
+                book.positions[decision.symbol] = book.positions.get(decision.symbol, 0.0) - signed
+
+    def record_fill(self, agent_id: str, symbol: str, side: str, quantity: float):
+        """Apply a fill that was not reserved through check(), such as a stop-loss exit"""
+        book = self.book(agent_id)
+        signed = quantity if side == "buy" else -quantity
+        with book.lock:
+            book.positions[symbol] = book.positions.get(symbol, 0.0) + signed
+
+    def load_positions(self, agent_id: str, positions: Dict[str, float], trades_today: int = 0,
+                       day: Optional[int] = None):
+        """Seed an agent's book, e.g. from agent_positions at start-up"""
+        book = self.book(agent_id)
+        with book.lock:
+            book.positions = dict(positions)
+            book.trades_today = trades_today
+            book.day = _utc_day(self.clock()) if day is None else day
+
+    def export_book(self, agent_id: str) -> Dict:
+        """JSON-ready copy of an agent's book, for load_positions(**book) elsewhere"""
+        book = self.book(agent_id)
+        with book.lock:
+            return {"positions": dict(book.positions), "trades_today": book.trades_today, "day": book.day}
+
+    def forget(self, agent_id: str):
+        """Drop an agent's limits and book, e.g. once it is hosted by another process"""
+        self._limits.pop(agent_id, None)
+        with self._books_lock:
+            self._books.pop(agent_id, None)
@@ -0,0 +1,119 @@
+"""
+Fixed-rate, bounded-concurrency symbol scan loop for trading agents
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+class TickReport:
+    """Timing summary for one scan cycle"""
+
+    def __init__(self, tick: int, scheduled_at: float, deadline: float):
+        self.tick = tick
+        self.scheduled_at = scheduled_at
+        self.deadline = deadline
+        self.started_at = 0.0
+        self.finished_at = 0.0
+        self.symbols = 0
+        self.errors: Dict[str, str] = {}
+        self.skipped_ticks = 0
+
+    @property
+    def duration(self) -> float:
+        return self.finished_at - self.started_at
+
+    @property
+    def start_lag(self) -> float:
+        """How late the tick started relative to its schedule"""
+        return max(self.started_at - self.scheduled_at, 0.0)
+
+    @property
+    def overrun(self) -> float:
+        """How far past its deadline (the next tick's start) the scan finished"""
+        return max(self.finished_at - self.deadline, 0.0)
+
+    def __str__(self):
+        line = (f"tick {self.tick}: {self.symbols} symbols in {self.duration:.2f}s "
+                f"({len(self.errors)} errors, lag {self.start_lag:.3f}s, overrun {self.overrun:.3f}s)")
+        if self.skipped_ticks:
+            line += f", skipped {self.skipped_ticks} tick(s)"
+        return line
+
+
+class ScanScheduler:
+    """Fans a symbol universe out to `scan` on fixed-rate ticks
+
+    Each tick runs every symbol through `scan` inside an asyncio.TaskGroup,
+    with a semaphore bounding how many scans are in flight. Ticks are
+    scheduled at start + n * interval, so time spent scanning does not push
+    later ticks back; a tick that runs past the next start is reported as an
+    overrun and the missed ticks are skipped rather than run back to back.
+    """
+
+    def __init__(self, scan: Callable[[str], Awaitable], symbols: List[str],
+                 interval: float = 60.0, concurrency: int = 256,
+                 on_report: Optional[Callable[[TickReport], None]] = None):
+        self.scan = scan
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.concurrency = concurrency
+        self.on_report = on_report or self._print_report
+        self.running = False
+
+    @staticmethod
+    def _print_report(report: TickReport):
+        timestamp = time.strftime("%H:%M:%S")
+        print(f"[{timestamp}] {report}")
+        for symbol, error in list(report.errors.items())[:5]:
+            print(f"   ⚠️  {symbol}: {error}")
+
+    async def _scan_one(self, symbol: str, semaphore: asyncio.Semaphore, report: TickReport):
+        async with semaphore:
+            try:
+                await self.scan(symbol)
+            except Exception as e:
+                # One bad symbol must not cancel the rest of the TaskGroup
+                report.errors[symbol] = f"{type(e).__name__}: {e}"
+
+    async def run_tick(self, tick: int, scheduled_at: float) -> TickReport:
+        """Scan every symbol once"""
+        loop = asyncio.get_running_loop()
+        report = TickReport(tick, scheduled_at, scheduled_at + self.interval)
+        report.symbols = len(self.symbols)
+        report.started_at = loop.time()
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with asyncio.TaskGroup() as tg:
+            for symbol in self.symbols:
+                tg.create_task(self._scan_one(symbol, semaphore, report))
+
+        report.finished_at = loop.time()
+        return report
+
+    async def run(self, ticks: Optional[int] = None):
+        """Run ticks at a fixed rate until stopped (or `ticks` have run)"""
+        loop = asyncio.get_running_loop()
+        self.running = True
+        start = loop.time()
+        tick = 0
+        skipped = 0
+
+        while self.running and (ticks is None or tick < ticks):
+            scheduled_at = start + tick * self.interval
+            delay = scheduled_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            report = await self.run_tick(tick, scheduled_at)
+            report.skipped_ticks = skipped
+            self.on_report(report)
+
+            # Next tick on the original grid; drop any we have already missed
+            next_tick = tick + 1
+            behind = int((loop.time() - start) // self.interval) - next_tick + 1
+            skipped = max(behind, 0)
+            tick = next_tick + skipped
+
+    def stop(self):
+        self.running = False
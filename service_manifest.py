@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Declarative service manifest for Cival Dashboard
+Loads services.toml: commands, env, dependencies, probes, replicas and limits
+"""
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+DEFAULT_MANIFEST = Path(__file__).parent / "services.toml"
+
+PROBE_KEYS = {"type", "port", "path", "timeout"}
+
+
+class ManifestError(ValueError):
+    """Raised when services.toml is malformed or inconsistent"""
+
+
+class ProbeSpec:
+    """How to tell that a service is ready: a TCP connect or an HTTP 2xx"""
+
+    def __init__(self, type: str = "tcp", port: Optional[int] = None,
+                 path: str = "/health", timeout: float = 30.0):
+        if type not in ("tcp", "http"):
+            raise ManifestError(f"unknown probe type {type!r}")
+        self.type = type
+        self.port = port
+        self.path = path
+        self.timeout = timeout
+
+
+class ServiceSpec:
+    """One service entry from the manifest"""
+
+    def __init__(self, name: str, data: Dict, base_dir: Path, defaults: Dict):
+        if "command" not in data:
+            raise ManifestError(f"service {name!r} has no command")
+        self.name = name
+        self.command: List[str] = [str(part) for part in data["command"]]
+        self.cwd = (base_dir / data.get("cwd", ".")).resolve()
+        self.env: Dict[str, str] = {key: str(value) for key, value in data.get("env", {}).items()}
+        self.depends_on: List[str] = list(data.get("depends_on", []))
+        self.port: Optional[int] = data.get("port")
+        self.replicas = int(data.get("replicas", 1))
+        self.worker_base_port: Optional[int] = data.get("worker_base_port")
+        self.enabled = bool(data.get("enabled", True))
+        self.reloadable = bool(data.get("reloadable", False))
+        self.label = data.get("label", name.upper())
+        self.limits: Dict = dict(data.get("limits", {}))
+        self.start_delay = float(data.get("start_delay", 0))
+        self.banner: List[str] = list(data.get("banner", []))
+        self.drain_timeout = float(data.get("drain_timeout", defaults.get("drain_timeout", 30.0)))
+
+        probe = dict(data.get("probe", {}))
+        unknown = sorted(set(probe) - PROBE_KEYS)
+        if unknown:
+            raise ManifestError(f"service {name!r} probe has unknown key(s): {', '.join(unknown)}")
+        probe.setdefault("port", self.port)
+        probe.setdefault("timeout", defaults.get("startup_timeout", 30.0))
+        self.probe = ProbeSpec(**probe) if probe.get("port") else None
+
+        setup = data.get("setup")
+        self.setup: Optional[List[str]] = [str(part) for part in setup] if setup else None
+        creates = data.get("setup_creates")
+        self.setup_creates: Optional[Path] = (self.cwd / creates) if creates else None
+        self.check_pool()
+
+    def check_pool(self):
+        """A pooled service needs `port` for its proxy"""
+        if self.pooled and self.port is None:
+            reason = f"replicas = {self.replicas}" if self.replicas > 1 else "reloadable = true"
+            raise ManifestError(f"service {self.name!r} has {reason} but no port for its proxy")
+
+    @property
+    def pooled(self) -> bool:
+        """Replicated and reloadable services run behind the round-robin proxy on `port`
+
+        A reloadable service needs the proxy even with one replica: it holds
+        the port while the new generation starts next to the old one.
+        """
+        return self.replicas > 1 or self.reloadable
+
+    def render_command(self, port: Optional[int] = None) -> List[str]:
+        """Substitute {python} and {port} placeholders"""
+        values = {"python": sys.executable, "port": port if port is not None else self.port}
+        return [part.format(**values) for part in self.command]
+
+    def render_env(self, port: Optional[int] = None) -> Dict[str, str]:
+        env = os.environ.copy()
+        env.update(self.env)
+        if port is not None or self.port is not None:
+            env["PORT"] = str(port if port is not None else self.port)
+        return env
+
+
+class Manifest:
+    """All services from a manifest, with profile and replica overrides"""
+
+    def __init__(self, services: Dict[str, ServiceSpec], profiles: Dict[str, Dict],
+                 defaults: Dict, path: Optional[Path] = None):
+        self.services = services
+        self.profiles = profiles
+        self.defaults = defaults
+        self.path = path
+
+    def apply_profile(self, name: str):
+        """Enable the profile's services and apply its replica counts"""
+        if name not in self.profiles:
+            raise ManifestError(f"unknown profile {name!r}")
+        profile = self.profiles[name]
+        if "services" in profile:
+            wanted = set(profile["services"])
+            self._check_names(wanted)
+            for service_name, spec in self.services.items():
+                spec.enabled = service_name in wanted
+        for service_name, replicas in profile.get("replicas", {}).items():
+            self.set_replicas(service_name, replicas)
+
+    def set_replicas(self, name: str, replicas: int):
+        self._check_names([name])
+        spec = self.services[name]
+        spec.replicas = max(int(replicas), 1)
+        spec.check_pool()
+
+    def enable(self, names: List[str]):
+        self._check_names(names)
+        for name in names:
+            self.services[name].enabled = True
+
+    def enabled_services(self) -> List[ServiceSpec]:
+        return [spec for spec in self.services.values() if spec.enabled]
+
+    def start_order(self) -> List[ServiceSpec]:
+        """Enabled services with their dependencies first (started even if disabled)"""
+        order: List[str] = []
+        visiting = set()
+
+        def visit(name: str, chain: List[str]):
+            if name in order:
+                return
+            if name in visiting:
+                raise ManifestError(f"dependency cycle: {' -> '.join(chain + [name])}")
+            if name not in self.services:
+                raise ManifestError(f"{chain[-1]!r} depends on unknown service {name!r}")
+            visiting.add(name)
+            for dependency in self.services[name].depends_on:
+                visit(dependency, chain + [name])
+            visiting.discard(name)
+            order.append(name)
+
+        for spec in self.enabled_services():
+            visit(spec.name, [])
+        return [self.services[name] for name in order]
+
+    def _check_names(self, names):
+        unknown = [name for name in names if name not in self.services]
+        if unknown:
+            raise ManifestError(f"unknown service(s): {', '.join(unknown)}")
+
+
+def load_manifest(path: Optional[Path] = None) -> Manifest:
+    """Parse a TOML service manifest"""
+    path = Path(path or DEFAULT_MANIFEST)
+    try:
+        with open(path, "rb") as f:
+            data = tomllib.load(f)
+    except FileNotFoundError:
+        raise ManifestError(f"manifest not found: {path}")
+    except tomllib.TOMLDecodeError as e:
+        raise ManifestError(f"{path}: {e}")
+
+    defaults = data.get("defaults", {})
+    services = {
+        name: ServiceSpec(name, service, path.parent, defaults)
+        for name, service in data.get("services", {}).items()
+    }
+    return Manifest(services, data.get("profiles", {}), defaults, path)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Resource accounting and limits for services supervised by ServiceManager
+Samples CPU, memory, file descriptors and threads from /proc and applies
+optional cgroup-v2 or setrlimit caps to child processes
+"""
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROC = Path("/proc")
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def read_proc_stat(pid: int) -> Optional[Dict]:
+    """Parse the fields we need from /proc/<pid>/stat"""
+    try:
+        raw = (PROC / str(pid) / "stat").read_text()
+    except OSError:
+        return None
+    # comm may contain spaces or parentheses, so split after the last ')'
+    fields = raw[raw.rfind(")") + 2:].split()
+    return {
+        "ppid": int(fields[1]),
+        "cpu_ticks": int(fields[11]) + int(fields[12]),
+        "threads": int(fields[17]),
+        "rss_bytes": int(fields[21]) * PAGE_SIZE,
+    }
+
+
+def count_fds(pid: int) -> Optional[int]:
+    """Number of open file descriptors, None if not readable"""
+    try:
+        return len(os.listdir(PROC / str(pid) / "fd"))
+    except OSError:
+        return None
+
+
+def children_map() -> Dict[int, List[int]]:
+    """Map every pid on the system to its direct children"""
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir(PROC)
+    except OSError:
+        return children
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        stat = read_proc_stat(int(entry))
+        if stat:
+            children.setdefault(stat["ppid"], []).append(int(entry))
+    return children
+
+
+def process_tree(pid: int, children: Dict[int, List[int]]) -> List[int]:
+    """A pid and all of its descendants (npm -> node -> next, etc.)"""
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+class ProcessSampler:
+    """Samples resource usage of supervised process trees from /proc"""
+
+    def __init__(self):
+        self._last: Dict[str, Tuple[int, float, int]] = {}
+
+    def sample(self, pids: Dict[str, int]) -> Dict[str, Dict]:
+        """CPU%, RSS, open FDs and thread count per named process tree"""
+        if not PROC.exists():
+            return {name: {"pid": pid} for name, pid in pids.items()}
+
+        children = children_map()
+        now = time.monotonic()
+        samples = {}
+        for name, pid in pids.items():
+            cpu_ticks = rss = threads = fds = 0
+            for member in process_tree(pid, children):
+                stat = read_proc_stat(member)
+                if not stat:
+                    continue
+                cpu_ticks += stat["cpu_ticks"]
+                rss += stat["rss_bytes"]
+                threads += stat["threads"]
+                fds += count_fds(member) or 0
+
+            cpu_percent = None
+            last = self._last.get(name)
+            if last and last[0] == pid and now > last[1]:
+                cpu_percent = round((cpu_ticks - last[2]) / CLK_TCK / (now - last[1]) * 100, 1)
+            self._last[name] = (pid, now, cpu_ticks)
+
+            samples[name] = {
+                "pid": pid,
+                "cpu_percent": cpu_percent,
+                "rss_mb": round(rss / (1024 * 1024), 1),
+                "open_fds": fds,
+                "threads": threads,
+            }
+        return samples
+
+
+class ResourceLimits:
+    """Optional caps for one service: cgroup-v2 when available, setrlimit otherwise"""
+
+    def __init__(self, memory_mb: Optional[int] = None, cpu_percent: Optional[int] = None,
+                 nofile: Optional[int] = None):
+        self.memory_mb = memory_mb
+        self.cpu_percent = cpu_percent
+        self.nofile = nofile
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ResourceLimits":
+        return cls(
+            memory_mb=data.get("memory_mb"),
+            cpu_percent=data.get("cpu_percent"),
+            nofile=data.get("nofile"),
+        )
+
+    def is_empty(self) -> bool:
+        return self.memory_mb is None and self.cpu_percent is None and self.nofile is None
+
+    def preexec_fn(self, cgroup: Optional[str] = None) -> Optional[Callable[[], None]]:
+        """Caps applied in the child between fork and exec
+
+        `cgroup` names a group made by prepare_cgroup(): the child joins it
+        before exec, so the service never runs outside it. Memory is then
+        capped by the group and RLIMIT_DATA is left alone: it also counts
+        reserved but untouched address space, which postgres and node
+        allocate plenty of. RLIMIT_NOFILE has no cgroup counterpart and
+        always applies.
+        """
+        memory_mb = None if cgroup else self.memory_mb
+        nofile = self.nofile
+        procs = str(CGROUP_ROOT / "cival" / cgroup / "cgroup.procs") if cgroup else None
+        rlimits = resource is not None and (memory_mb is not None or nofile is not None)
+        if procs is None and not rlimits:
+            return None
+
+        def apply_limits():
+            if procs is not None:
+                try:
+                    with open(procs, "w") as f:
+                        f.write(str(os.getpid()))
+                except OSError:
+                    pass  # Could not join the group; the service runs without its caps
+            if not rlimits:
+                return
+            if memory_mb is not None:
+                limit = memory_mb * 1024 * 1024
+                resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+            if nofile is not None:
+                resource.setrlimit(resource.RLIMIT_NOFILE, (nofile, nofile))
+
+        return apply_limits
+
+    def prepare_cgroup(self, name: str) -> bool:
+        """Create the service's cgroup-v2 group with memory/CPU caps before it starts
+
+        Returns False if there is nothing to cap there or /sys/fs/cgroup is
+        not writable, in which case preexec_fn() falls back to setrlimit.
+        """
+        if self.memory_mb is None and self.cpu_percent is None:
+            return False
+        parent = CGROUP_ROOT / "cival"
+        group = parent / name
+        try:
+            group.mkdir(parents=True, exist_ok=True)
+            try:
+                (parent / "cgroup.subtree_control").write_text("+memory +cpu")
+            except OSError:
+                pass  # already enabled, or delegated without these controllers
+            if self.memory_mb is not None:
+                (group / "memory.max").write_text(str(self.memory_mb * 1024 * 1024))
+            if self.cpu_percent is not None:
+                period = 100000
+                (group / "cpu.max").write_text(f"{self.cpu_percent * period // 100} {period}")
+            return True
+        except OSError:
+            return False
+
+
+
+class MetricsReporter:
+    """Periodic JSON status line plus a local HTTP endpoint with the latest sample"""
+
+    def __init__(self, collect: Callable[[], Dict], interval: float = 10.0,
+                 http_port: Optional[int] = None, emit_lines: bool = True, stream=None):
+        self.collect = collect
+        self.interval = interval
+        self.http_port = http_port
+        self.emit_lines = emit_lines
+        self.stream = stream or sys.stdout
+        self.latest: Dict = {}
+        self._stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        if self.http_port:
+            self._start_http()
+
+    def stop(self):
+        self._stop.set()
+        if self._server:
+            self._server.shutdown()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.latest = {"timestamp": time.time(), "services": self.collect()}
+            if self.emit_lines:
+                self.stream.write(json.dumps(self.latest) + "\n")
+                self.stream.flush()
+            self._stop.wait(self.interval)
+
+    def _start_http(self):
+        reporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(reporter.latest).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.http_port), MetricsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
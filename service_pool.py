@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Service worker pool for Cival Dashboard
+Runs several replicas of a service (e.g. basic_server.py) behind a small
+round-robin TCP proxy
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# Request lines we count as a new HTTP request on a proxied connection
+HTTP_METHODS = (b"GET ", b"POST ", b"PUT ", b"PATCH ", b"DELETE ", b"HEAD ", b"OPTIONS ")
+
+UNAVAILABLE_RESPONSE = (
+    b"HTTP/1.1 503 Service Unavailable\r\n"
+    b"Content-Length: 0\r\n"
+    b"Connection: close\r\n\r\n"
+)
+
+
+class Backend:
+    """A single upstream worker as seen by the proxy"""
+
+    def __init__(self, worker_id: str, host: str, port: int):
+        self.worker_id = worker_id
+        self.host = host
+        self.port = port
+        self.enabled = True
+        self.active = 0
+        self.connections = 0
+        self.requests = 0
+
+
+class RoundRobinProxy:
+    """Small asyncio TCP proxy spreading connections across backends"""
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 9000):
+        self.host = host
+        self.port = port
+        self.backends: Dict[str, Backend] = {}
+        self.lock = threading.Lock()
+        self._order: List[str] = []
+        self._next = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def add_backend(self, worker_id: str, port: int, host: str = "127.0.0.1"):
+        """Register a worker and put it into rotation"""
+        with self.lock:
+            self.backends[worker_id] = Backend(worker_id, host, port)
+            if worker_id not in self._order:
+                self._order.append(worker_id)
+
+    def remove_backend(self, worker_id: str):
+        """Take a worker out of the proxy entirely"""
+        with self.lock:
+            self.backends.pop(worker_id, None)
+            if worker_id in self._order:
+                self._order.remove(worker_id)
+
+    def set_enabled(self, worker_id: str, enabled: bool):
+        """Start or stop routing new connections to a worker"""
+        with self.lock:
+            backend = self.backends.get(worker_id)
+            if backend:
+                backend.enabled = enabled
+
+    def _pick(self) -> Optional[Backend]:
+        """Choose the next enabled backend in round-robin order and count the connection on it
+
+        Counting under the lock means a reload that swaps backends (also
+        under the lock) never sees an old backend idle while a connection
+        is still on its way to it.
+        """
+        with self.lock:
+            for _ in range(len(self._order)):
+                worker_id = self._order[self._next % len(self._order)]
+                self._next += 1
+                backend = self.backends[worker_id]
+                if backend.enabled:
+                    backend.active += 1
+                    return backend
+        return None
+
+    def start(self, timeout: float = 5.0):
+        """Run the proxy on its own event loop in a background thread"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        if self._error:
+            raise self._error
+
+    def stop_accepting(self):
+        """Close the listening socket; connections already open keep flowing"""
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+    def idle(self) -> bool:
+        return all(backend.active == 0 for backend in list(self.backends.values()))
+
+    def stop(self):
+        """Stop accepting connections and shut the loop down"""
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+        except OSError as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            self._loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        backend = self._pick()
+        if backend is None:
+            writer.write(UNAVAILABLE_RESPONSE)
+            await self._close(writer)
+            return
+
+        try:
+            up_reader, up_writer = await asyncio.open_connection(backend.host, backend.port)
+        except OSError:
+            backend.active -= 1
+            writer.write(UNAVAILABLE_RESPONSE)
+            await self._close(writer)
+            return
+
+        backend.connections += 1
+        try:
+            await asyncio.gather(
+                self._pipe(reader, up_writer, backend),
+                self._pipe(up_reader, writer, None),
+            )
+        finally:
+            backend.active -= 1
+            await self._close(up_writer)
+            await self._close(writer)
+
+    async def _pipe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                    backend: Optional[Backend]):
+        """Copy bytes one way, counting request lines on the client side"""
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                if backend is not None and data.startswith(HTTP_METHODS):
+                    backend.requests += 1
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+
+        # Client half-close is forwarded; upstream EOF ends the connection
+        if backend is not None and writer.can_write_eof() and not writer.is_closing():
+            try:
+                writer.write_eof()
+                return
+            except OSError:
+                pass
+        await self._close(writer)
+
+    @staticmethod
+    async def _close(writer: asyncio.StreamWriter):
+        if writer.is_closing():
+            return
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+def check_health(port: int, path: str = "/health", timeout: float = 2.0,
+                 host: str = "127.0.0.1") -> bool:
+    """True if the service answers its health endpoint with a 2xx"""
+    try:
+        with urllib.request.urlopen(f"http://{host}:{port}{path}", timeout=timeout) as response:
+            return 200 <= response.status < 300
+    except (OSError, ValueError):
+        return False
+
+
+def wait_for_port(port: int, process: Optional[subprocess.Popen] = None,
+                  timeout: float = 30.0, host: str = "127.0.0.1") -> bool:
+    """Wait until something accepts TCP connections on a port"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class WorkerPool:
+    """Supervises N replicas of a service behind a RoundRobinProxy"""
+
+    def __init__(self, cwd: Path, command: Optional[List[str]] = None, label: str = "AI",
+                 env: Optional[Dict[str, str]] = None,
+                 workers: Optional[int] = None, port: int = 9000,
+                 base_port: Optional[int] = None, startup_timeout: float = 30.0,
+                 health_path: Optional[str] = "/health",
+                 preexec_fn: Optional[Callable[[], None]] = None):
+        self.cwd = cwd
+        self.command = command or [sys.executable, "basic_server.py"]
+        self.label = label
+        self.env = env
+        self.size = workers or os.cpu_count() or 1
+        self.port = port
+        self.base_port = base_port or port + 1
+        self.startup_timeout = startup_timeout
+        self.health_path = health_path
+        self.preexec_fn = preexec_fn
+        self.proxy = RoundRobinProxy(port=port)
+        self.generation = 0
+        self.processes: Dict[str, subprocess.Popen] = {}
+        self.ports: Dict[str, int] = {}
+        self.restarts: Dict[str, int] = {}
+        self.retired_requests: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def worker_ids(self) -> List[str]:
+        return [f"worker_{i}" for i in range(self.size)]
+
+    def _generation_port(self, index: int, generation: int) -> int:
+        """Generations alternate between two port blocks so they can overlap"""
+        return self.base_port + (generation % 2) * self.size + index
+
+    def _spawn(self, worker_id: str, port: int) -> subprocess.Popen:
+        """Start one worker process on its private port"""
+        env = dict(self.env) if self.env is not None else os.environ.copy()
+        env["PORT"] = str(port)
+        env["WORKER_ID"] = worker_id
+
+        process = subprocess.Popen(
+            [part.replace("{port}", str(port)) for part in self.command],
+            cwd=self.cwd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+            bufsize=1,
+            preexec_fn=self.preexec_fn
+        )
+
+        def monitor_worker_output():
+            for line in iter(process.stdout.readline, ''):
+                if line:
+                    print(f"[{self.label}:{worker_id}] {line.strip()}")
+
+        threading.Thread(target=monitor_worker_output, daemon=True).start()
+        return process
+
+    def _wait_healthy(self, port: int, process: subprocess.Popen) -> bool:
+        """Port open and health endpoint answering before we route to it"""
+        deadline = time.monotonic() + self.startup_timeout
+        if not wait_for_port(port, process, self.startup_timeout):
+            return False
+        if self.health_path is None:
+            return True
+        while time.monotonic() < deadline and process.poll() is None:
+            if check_health(port, self.health_path):
+                return True
+            time.sleep(0.2)
+        return False
+
+    def start(self) -> bool:
+        """Start the proxy and every worker, then put healthy workers in rotation"""
+        self.proxy.start()
+        for i, worker_id in enumerate(self.worker_ids()):
+            self.ports[worker_id] = self._generation_port(i, self.generation)
+            self.restarts[worker_id] = 0
+            self.retired_requests[worker_id] = 0
+            self.processes[worker_id] = self._spawn(worker_id, self.ports[worker_id])
+
+        healthy = 0
+        for worker_id in self.worker_ids():
+            if self._wait_healthy(self.ports[worker_id], self.processes[worker_id]):
+                self.proxy.add_backend(worker_id, self.ports[worker_id])
+                healthy += 1
+            else:
+                print(f"⚠️  {self.label} {worker_id} did not come up on port {self.ports[worker_id]}")
+        return healthy > 0
+
+    @staticmethod
+    def _wait_idle(backend: Optional[Backend], timeout: float) -> bool:
+        """Wait for a backend's in-flight connections to finish"""
+        deadline = time.monotonic() + timeout
+        while backend and backend.active > 0 and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return not backend or backend.active == 0
+
+    @staticmethod
+    def _stop_process(process: Optional[subprocess.Popen], timeout: float = 5.0):
+        if process and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def restart_worker(self, worker_id: str, drain_timeout: float = 30.0) -> bool:
+        """Take one worker out of rotation, restart it and put it back"""
+        with self._lock:
+            self.proxy.set_enabled(worker_id, False)
+            if not self._wait_idle(self.proxy.backends.get(worker_id), drain_timeout):
+                print(f"⚠️  {self.label} {worker_id} still busy after {drain_timeout}s, restarting anyway")
+            self._stop_process(self.processes.get(worker_id))
+
+            process = self._spawn(worker_id, self.ports[worker_id])
+            self.processes[worker_id] = process
+            self.restarts[worker_id] += 1
+            if not self._wait_healthy(self.ports[worker_id], process):
+                print(f"❌ {self.label} {worker_id} failed to restart")
+                return False
+
+            if worker_id in self.proxy.backends:
+                self.proxy.set_enabled(worker_id, True)
+            else:
+                self.proxy.add_backend(worker_id, self.ports[worker_id])
+            return True
+
+    def roll(self, drain_timeout: float = 30.0) -> bool:
+        """Restart workers one at a time so the pool never goes fully down"""
+        print(f"🔄 Rolling {self.label} workers...")
+        for worker_id in self.worker_ids():
+            if not self.restart_worker(worker_id, drain_timeout):
+                return False
+            print(f"✅ {self.label} {worker_id} restarted")
+        return True
+
+    def reload(self, drain_timeout: float = 30.0) -> bool:
+        """Start a new generation, health-check it, then retire the old one"""
+        with self._lock:
+            generation = self.generation + 1
+            print(f"🔄 Starting {self.label} worker generation {generation}...")
+            new_ports = {
+                worker_id: self._generation_port(i, generation)
+                for i, worker_id in enumerate(self.worker_ids())
+            }
+            new_processes = {
+                worker_id: self._spawn(worker_id, port) for worker_id, port in new_ports.items()
+            }
+
+            for worker_id, process in new_processes.items():
+                if not self._wait_healthy(new_ports[worker_id], process):
+                    print(f"❌ {self.label} {worker_id} generation {generation} failed its health check, "
+                          f"keeping generation {self.generation}")
+                    for failed in new_processes.values():
+                        self._stop_process(failed)
+                    return False
+
+            # Swap the proxy over; open connections keep their old backend
+            old_backends = {worker_id: self.proxy.backends.get(worker_id) for worker_id in new_ports}
+            old_processes = dict(self.processes)
+            for worker_id, port in new_ports.items():
+                self.proxy.add_backend(worker_id, port)
+            self.processes.update(new_processes)
+            self.ports.update(new_ports)
+            self.generation = generation
+
+            for worker_id, backend in old_backends.items():
+                if not self._wait_idle(backend, drain_timeout):
+                    print(f"⚠️  {self.label} {worker_id} old generation still busy after {drain_timeout}s")
+                if backend:
+                    self.retired_requests[worker_id] += backend.requests
+                self._stop_process(old_processes.get(worker_id))
+                self.restarts[worker_id] += 1
+
+            print(f"✅ {self.label} worker generation {generation} is live")
+            return True
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """Stop taking new connections and wait for in-flight ones to finish"""
+        self.proxy.stop_accepting()
+        deadline = time.monotonic() + timeout
+        while not self.proxy.idle() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return self.proxy.idle()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Per-worker process state and proxy counters"""
+        stats = {}
+        for worker_id in self.worker_ids():
+            process = self.processes.get(worker_id)
+            backend = self.proxy.backends.get(worker_id)
+            stats[worker_id] = {
+                "pid": process.pid if process else None,
+                "port": self.ports.get(worker_id),
+                "generation": self.generation,
+                "state": "running" if process and process.poll() is None else "stopped",
+                "in_rotation": bool(backend and backend.enabled),
+                "requests": self.retired_requests.get(worker_id, 0) + (backend.requests if backend else 0),
+                "connections": backend.connections if backend else 0,
+                "active": backend.active if backend else 0,
+                "restarts": self.restarts.get(worker_id, 0),
+            }
+        return stats
+
+    def stop(self, timeout: float = 5.0):
+        """Stop every worker and the proxy"""
+        for worker_id in self.worker_ids():
+            self.proxy.set_enabled(worker_id, False)
+            self._stop_process(self.processes.get(worker_id), timeout)
+        self.proxy.stop()
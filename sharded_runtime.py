@@ -0,0 +1,336 @@
+"""
+Sharded multi-process agent host
+
+One AgentRuntime tops out at one core, so ShardedRuntime runs one per
+worker process and splits agents between them:
+
+- Ownership is a consistent hash of agent_id over a ring of virtual
+  nodes. Adding or removing a worker moves only the agents whose owner
+  changed (about 1/n of them). The old worker cancels a moved agent's
+  working orders, then exports its indicators, risk book, monitored
+  positions and P&L rows, which the new worker restores; otherwise agent
+  state never leaves its worker.
+- Market data is written once by the parent into a shared-memory quote
+  table (one row per symbol, guarded by a per-row sequence number used as
+  a seqlock). Workers poll the sequence column and publish changed rows
+  into their local MarketDataHub, so no worker fetches quotes itself.
+- The parent talks to each worker over a Pipe: add/remove agents, stats,
+  stop. Requests carry a sequence number so a reply that arrives after its
+  call timed out is dropped instead of answering the next call; a command
+  that fails in the worker comes back as an error reply and is raised in
+  the parent as WorkerError, leaving the worker and its agents running.
+"""
+import asyncio
+import bisect
+import hashlib
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+QUOTE_DTYPE = np.dtype([("seq", "<u8"), ("price", "<f8"), ("volume", "<f8"), ("timestamp", "<i8")])
+
+
+class WorkerError(Exception):
+    """A command failed inside a worker process"""
+
+
+def ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent hashing of agent ids onto workers"""
+
+    def __init__(self, replicas: int = 128):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+
+    @property
+    def workers(self) -> List[str]:
+        return sorted(set(self._owners.values()))
+
+    def add(self, worker: str):
+        for i in range(self.replicas):
+            point = ring_hash(f"{worker}#{i}")
+            if point not in self._owners:
+                self._owners[point] = worker
+                bisect.insort(self._points, point)
+
+    def remove(self, worker: str):
+        self._points = [p for p in self._points if self._owners[p] != worker]
+        self._owners = {p: w for p, w in self._owners.items() if w != worker}
+
+    def owner(self, key: str) -> str:
+        if not self._points:
+            raise LookupError("hash ring has no workers")
+        i = bisect.bisect(self._points, ring_hash(key)) % len(self._points)
+        return self._owners[self._points[i]]
+
+
+class SharedQuotes:
+    """Latest quote per symbol in a shared memory block, written by one process
+
+    Each row's seq is odd while the writer is updating it; readers retry if
+    they see an odd seq or the seq changed under them.
+    """
+
+    def __init__(self, symbols: List[str], block: shared_memory.SharedMemory, owner: bool):
+        self.symbols = symbols
+        self.index = {symbol: i for i, symbol in enumerate(symbols)}
+        self._block = block
+        self.quotes = np.ndarray(len(symbols), dtype=QUOTE_DTYPE, buffer=block.buf)
+        self.owner = owner
+
+    @classmethod
+    def create(cls, symbols: List[str]) -> "SharedQuotes":
+        block = shared_memory.SharedMemory(create=True, size=max(len(symbols) * QUOTE_DTYPE.itemsize, 1))
+        quotes = cls(list(symbols), block, owner=True)
+        quotes.quotes[...] = 0
+        quotes.quotes["price"] = np.nan
+        return quotes
+
+    @property
+    def spec(self) -> Dict:
+        return {"symbols": self.symbols, "name": self._block.name}
+
+    @classmethod
+    def attach(cls, spec: Dict) -> "SharedQuotes":
+        return cls(spec["symbols"], shared_memory.SharedMemory(name=spec["name"]), owner=False)
+
+    def write(self, symbol: str, price: float, volume: float = 0.0, timestamp: Optional[int] = None):
+        i = self.index[symbol]
+        seq = self.quotes["seq"]
+        seq[i] += 1
+        self.quotes["price"][i] = price
+        self.quotes["volume"][i] = volume
+        self.quotes["timestamp"][i] = timestamp if timestamp is not None else time.time_ns()
+        seq[i] += 1
+
+    def changed(self, seen: np.ndarray) -> np.ndarray:
+        """Rows whose sequence differs from `seen`"""
+        return np.flatnonzero(self.quotes["seq"] != seen)
+
+    def read(self, i: int) -> Optional[Tuple[int, float, float]]:
+        """(seq, price, volume) of a row, or None if it is mid-update"""
+        seq = self.quotes["seq"]
+        for _ in range(100):
+            before = int(seq[i])
+            if before & 1:
+                continue
+            price = float(self.quotes["price"][i])
+            volume = float(self.quotes["volume"][i])
+            if int(seq[i]) == before:
+                return before, price, volume
+        return None
+
+    def close(self):
+        self.quotes = None
+        self._block.close()
+        if self.owner:
+            self._block.unlink()
+
+
+def build_agent(spec: Dict, runtime):
+    """Default agent factory: a TradingAgentExample wired to the worker's shared services"""
+    from agent_trading_example import TradingAgentExample
+    from risk_engine import AgentLimits
+
+    agent = TradingAgentExample(agent_id=spec["agent_id"], strategy=spec.get("strategy"),
+                                exits=spec.get("exits"), **runtime.shared())
+    agent.verbose = False
+    limits = spec.get("limits")
+    runtime.risk.set_limits(AgentLimits.from_row({"agent_id": spec["agent_id"], **limits})
+                            if limits else AgentLimits(spec["agent_id"]))
+    return agent
+
+
+async def _serve(worker_id: str, conn, quotes_spec: Dict, factory: Callable, poll_interval: float,
+                 runtime_options: Dict):
+    from agent_runtime import AgentRuntime
+
+    runtime = AgentRuntime(**runtime_options)
+    await runtime.start()
+    quotes = SharedQuotes.attach(quotes_spec)
+    seen = np.zeros(len(quotes.symbols), dtype=np.uint64)
+    market = runtime.market
+    try:
+        while True:
+            for i in quotes.changed(seen):
+                row = quotes.read(i)
+                if row is None:
+                    continue  # Mid-update: picked up on the next poll
+                seen[i] = row[0]
+                symbol = quotes.symbols[i]
+                if symbol in market.subscribers:
+                    market.publish(symbol, row[1], row[2])
+            while conn.poll():
+                seq, command, payload = conn.recv()
+                if command == "stop":
+                    conn.send((seq, "ok", None))
+                    return
+                try:
+                    reply = (seq, "ok", await _handle(runtime, factory, command, payload))
+                except Exception as e:
+                    # One bad command must not take down the worker and every agent on it
+                    reply = (seq, "error", repr(e))
+                conn.send(reply)
+            await asyncio.sleep(poll_interval)
+    finally:
+        await runtime.stop()
+        quotes.close()
+
+
+async def _handle(runtime, factory: Callable, command: str, payload: Any):
+    if command == "add":
+        if payload["agent_id"] in runtime.agents:
+            # Before the factory runs: it would overwrite the hosted agent's limits
+            raise ValueError(f"agent {payload['agent_id']!r} is already hosted")
+        runtime.adopt_agent(factory(payload, runtime), payload["symbols"], payload.get("state"))
+        return True
+    if command == "remove":
+        # Positions, risk book and P&L rows move with the agent; working orders are cancelled
+        return await runtime.evict_agent(payload)
+    if command == "stats":
+        return {"runtime": runtime.stats(), "agents": runtime.agent_stats()}
+    raise ValueError(f"unknown command {command!r}")
+
+
+def _worker_main(worker_id: str, conn, quotes_spec: Dict, factory: Callable, poll_interval: float,
+                 runtime_options: Dict):
+    try:
+        asyncio.run(_serve(worker_id, conn, quotes_spec, factory, poll_interval, runtime_options))
+    except KeyboardInterrupt:
+        pass
+
+
+class WorkerHandle:
+    """Parent-side view of one worker process"""
+
+    def __init__(self, worker_id: str, process: mp.Process, conn):
+        self.worker_id = worker_id
+        self.process = process
+        self.conn = conn
+        self._seq = 0
+
+    def call(self, command: str, payload: Any = None, timeout: float = 30.0):
+        self._seq += 1
+        seq = self._seq
+        self.conn.send((seq, command, payload))
+        deadline = time.monotonic() + timeout
+        while True:
+            if not self.conn.poll(max(deadline - time.monotonic(), 0.0)):
+                raise TimeoutError(f"worker {self.worker_id} did not answer {command!r}")
+            answered, status, value = self.conn.recv()
+            if answered != seq:
+                continue  # Late reply to a call that already timed out
+            if status == "error":
+                raise WorkerError(f"worker {self.worker_id} failed {command!r}: {value}")
+            return value
+
+
+class ShardedRuntime:
+    """Spreads agents over worker processes by consistent hash of agent_id"""
+
+    def __init__(self, symbols: Iterable[str], workers: int = 0,
+                 factory: Callable[[Dict, Any], Any] = build_agent, poll_interval: float = 0.001,
+                 runtime_options: Optional[Dict] = None):
+        self.quotes = SharedQuotes.create(list(symbols))
+        self.factory = factory
+        self.poll_interval = poll_interval
+        self.runtime_options = runtime_options or {}
+        self.ring = HashRing()
+        self.workers: Dict[str, WorkerHandle] = {}
+        # agent_id -> spec (without state); the state itself lives in the owning worker
+        self.specs: Dict[str, Dict] = {}
+        self.owners: Dict[str, str] = {}
+        self._ids = 0
+        for _ in range(workers or mp.cpu_count()):
+            self.add_worker()
+
+    def _start_worker(self) -> WorkerHandle:
+        worker_id = f"worker-{self._ids}"
+        self._ids += 1
+        parent, child = mp.Pipe()
+        process = mp.Process(target=_worker_main, name=worker_id, daemon=True,
+                             args=(worker_id, child, self.quotes.spec, self.factory,
+                                   self.poll_interval, self.runtime_options))
+        process.start()
+        return WorkerHandle(worker_id, process, parent)
+
+    def add_agent(self, agent_id: str, symbols: List[str], **spec):
+        """Host an agent on its owning worker; extra keywords go to the factory spec"""
+        if agent_id in self.specs:
+            raise ValueError(f"agent {agent_id!r} is already hosted")
+        unknown = [s for s in symbols if s not in self.quotes.index]
+        if unknown:
+            raise ValueError(f"symbols outside the shared quote table: {unknown}")
+        spec = {"agent_id": agent_id, "symbols": list(symbols), **spec}
+        owner = self.ring.owner(agent_id)
+        self.workers[owner].call("add", spec)
+        self.specs[agent_id] = spec
+        self.owners[agent_id] = owner
+
+    def remove_agent(self, agent_id: str) -> Optional[Dict]:
+        """Stop hosting an agent; returns its exported state"""
+        owner = self.owners.pop(agent_id, None)
+        self.specs.pop(agent_id, None)
+        return self.workers[owner].call("remove", agent_id) if owner else None
+
+    def add_worker(self) -> str:
+        """Start a worker and move over the agents the ring now assigns to it"""
+        handle = self._start_worker()
+        self.workers[handle.worker_id] = handle
+        self.ring.add(handle.worker_id)
+        self._rebalance()
+        return handle.worker_id
+
+    def remove_worker(self, worker_id: str):
+        """Hand a worker's agents to their new owners, then stop it"""
+        self.ring.remove(worker_id)
+        self._rebalance()
+        handle = self.workers.pop(worker_id)
+        handle.call("stop")
+        handle.process.join(5)
+
+    def _rebalance(self) -> int:
+        moved = 0
+        for agent_id, spec in self.specs.items():
+            old, new = self.owners[agent_id], self.ring.owner(agent_id)
+            if old == new:
+                continue
+            state = self.workers[old].call("remove", agent_id)
+            self.workers[new].call("add", {**spec, "state": state})
+            self.owners[agent_id] = new
+            moved += 1
+        if moved:
+            print(f"🔀 Moved {moved} agent(s) across {len(self.workers)} workers")
+        return moved
+
+    def publish(self, symbol: str, price: float, volume: float = 0.0):
+        """Broadcast a tick to every worker through shared memory"""
+        self.quotes.write(symbol, price, volume)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {worker_id: handle.call("stats") for worker_id, handle in self.workers.items()}
+
+    def close(self):
+        for handle in self.workers.values():
+            try:
+                handle.call("stop", timeout=5)
+            except (TimeoutError, WorkerError, OSError, EOFError):
+                pass
+            handle.process.join(5)
+            if handle.process.is_alive():
+                handle.process.terminate()
+        self.workers = {}
+        self.quotes.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -9,6 +9,11 @@ from pydantic_ai import Agent, RunContext
 from pydantic import BaseModel
 import numpy as np
 
+from agent_trading_example import DEFAULT_STRATEGY
+from decision_cache import DecisionCache, feature_key
+from llm_scheduler import ENTRY, EXIT, LLMScheduler, fallback_decision, is_fallback
+from tiered_pipeline import TieredPipeline, TieredResult
+
 class TradeDecision(BaseModel):
     action: str  # 'buy', 'sell', 'hold'
     symbol: str
@@ -28,15 +33,34 @@ class MarketData(BaseModel):
     timestamp: datetime
 
 class SmartTradingAgent:
-    def __init__(self, agent_id: str, api_url: str = "http://localhost:3000"):
+    def __init__(self, agent_id: str, api_url: str = "http://localhost:3000",
+                 model=None, cache: Optional[DecisionCache] = None,
+                 scheduler: Optional[LLMScheduler] = None, model_name: str = 'openai:gpt-4',
+                 deadline: float = 3.0, strategy: Optional[Dict] = None):
         self.agent_id = agent_id
+        # Rule parameters for the tier-1 screen and for fallbacks when the model is late
+        self.strategy = {**DEFAULT_STRATEGY, **(strategy or {})}
         self.api_url = api_url
         self.ws_url = "ws://localhost:3001"
         self.is_registered = False
+        # Model calls are rate limited and prioritized per provider; share one scheduler across agents
+        self.scheduler = scheduler or LLMScheduler()
+        self.provider = LLMScheduler.provider_of(model_name)
+        # Seconds a decision may take before the rule-based fallback answers instead
+        self.deadline = deadline
+        # Decisions reused while the quantized market state is unchanged
+        self.cache = cache or DecisionCache()
+        # Rule screen over the universe; only ambiguous or high-opportunity symbols reach the model
+        self.pipeline = TieredPipeline(self.decide_features, strategy=self.strategy)
+        
+        if model is not None:
+            # Anything with Agent.run()'s shape, e.g. decision_cache.StubModel for offline tests
+            self.ai_agent = model
+            return
         
         # Initialize PydanticAI agent
         self.ai_agent = Agent(
-            'openai:gpt-4',  # or 'google-gla:gemini-1.5-pro'
+            model_name,  # e.g. 'openai:gpt-4' or 'google-gla:gemini-1.5-pro'
             system_prompt="""You are an expert trading agent that makes decisions based on:
             1. Technical indicators (RSI, MACD, EMA)
             2. Market momentum and volume
@@ -49,3 +73,51 @@ class SmartTradingAgent:
         
         # Register tools for the AI agent
         self._register_ai_tools()
+    
+    def _register_ai_tools(self):
+        @self.ai_agent.tool
+        async def get_market_features(ctx: RunContext[Dict]) -> Dict:
+            """Current price, indicators and position for the symbol being decided"""
+            return ctx.deps
+    
+    async def decide(self, market_data: MarketData, position: float = 0.0) -> TradeDecision:
+        """Trading decision for the current tick, from the cache when the market state is unchanged"""
+        decision = await self.decide_features({
+            "symbol": market_data.symbol,
+            "price": market_data.price,
+            "change_percent": market_data.change_percent,
+            "volume": market_data.volume,
+            "rsi": market_data.rsi,
+            "macd": market_data.macd,
+            "position": position,
+        })
+        if decision.price != market_data.price:
+            # Reused from an earlier tick in the same bucket: quote the current price
+            decision = decision.model_copy(update={"price": market_data.price})
+        return decision
+    
+    async def decide_universe(self, symbols, batch, positions: Optional[Dict[str, float]] = None) -> TieredResult:
+        """Decisions for a whole universe of indicator arrays (see indicators.compute_indicators)"""
+        return await self.pipeline.run(symbols, batch, positions)
+    
+    async def decide_features(self, features: Dict) -> TradeDecision:
+        key = feature_key(features["symbol"], features["price"], features.get("rsi"),
+                          features.get("macd"), features.get("position", 0.0))
+        # Fallback answers go to everyone waiting on the key but are not cached
+        return await self.cache.get_or_compute(key, lambda: self._ask_model(features),
+                                               keep=lambda decision: not is_fallback(decision))
+    
+    async def _ask_model(self, features: Dict) -> TradeDecision:
+        """Queue the model call; a position we might need to exit goes ahead of new entries"""
+        return await self.scheduler.call(
+            self.provider, lambda: self._run_model(features),
+            priority=EXIT if features.get("position") else ENTRY,
+            deadline=self.deadline,
+            fallback=lambda: fallback_decision(features, TradeDecision, self.strategy)
+        )
+    
+    async def _run_model(self, features: Dict) -> TradeDecision:
+        prompt = (f"Decide whether to buy, sell or hold {features['symbol']} at {features['price']}. "
+                  f"Market features: {features}")
+        result = await self.ai_agent.run(prompt, deps=features)
+        return result.output if hasattr(result, "output") else result.data
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Service startup script for Cival Dashboard
-Starts both AI services and Next.js dashboard
+Starts the services described in services.toml (AI services and Next.js
+dashboard by default; Redis stand-in and Postgres via profiles)
 """
 import subprocess
 import time
@@ -9,77 +10,172 @@ import os
 import sys
 import signal
 import threading
+import argparse
 from pathlib import Path
 
+from service_manifest import DEFAULT_MANIFEST, ManifestError, load_manifest
+from service_metrics import MetricsReporter, ProcessSampler, ResourceLimits
+from service_pool import WorkerPool, check_health, wait_for_port
+
+PID_FILE = Path(__file__).parent / ".service_manager.pid"
+
+# Control commands are delivered to the running supervisor as signals
+CONTROL_SIGNALS = {
+    "stop": "SIGTERM",
+    "reload": "SIGHUP",
+    "roll": "SIGUSR1",
+}
+
 class ServiceManager:
     """Manages multiple services"""
     
-    def __init__(self):
+    def __init__(self, manifest, limits=None, drain_timeout=30.0):
+        self.manifest = manifest
         self.processes = {}
+        self.pools = {}
+        self.started = []
         self.running = True
+        self.drain_timeout = drain_timeout
+        self.limits = {
+            name: ResourceLimits.from_dict(spec.limits)
+            for name, spec in manifest.services.items() if spec.limits
+        }
+        self.limits.update(limits or {})
+        self.sampler = ProcessSampler()
         
-    def start_ai_services(self):
-        """Start AI services"""
-        print("🚀 Starting AI Services on port 9000...")
+    def _preexec(self, name):
+        """Child-side hook that joins the service's cgroup and sets the rlimits it cannot take"""
+        limits = self.limits.get(name)
+        if not limits:
+            return None
+        cgroup = name if limits.prepare_cgroup(name) else None
+        if cgroup:
+            print(f"🔒 {name} runs in cgroup cival/{name}")
+        return limits.preexec_fn(cgroup=cgroup)
+    
+    def _run_setup(self, spec):
+        """One-time setup step (e.g. initdb) unless its output already exists"""
+        if not spec.setup or (spec.setup_creates and spec.setup_creates.exists()):
+            return True
+        print(f"🔧 Setting up {spec.name}...")
+        try:
+            result = subprocess.run(spec.setup, cwd=spec.cwd, env=spec.render_env(),
+                                    capture_output=True, text=True)
+        except OSError as e:
+            print(f"❌ {spec.name} setup failed: {e}")
+            return False
+        if result.returncode != 0:
+            print(f"❌ {spec.name} setup failed: {result.stderr.strip()}")
+            return False
+        return True
+    
+    def _wait_ready(self, spec, process):
+        """Block until the service's probe passes (or its start_delay elapses)"""
+        if spec.start_delay:
+            time.sleep(spec.start_delay)
+        probe = spec.probe
+        if probe is None:
+            return process.poll() is None
+        if not wait_for_port(probe.port, process, probe.timeout):
+            return False
+        if probe.type == "http":
+            deadline = time.monotonic() + probe.timeout
+            while time.monotonic() < deadline and process.poll() is None:
+                if check_health(probe.port, probe.path):
+                    return True
+                time.sleep(0.2)
+            return False
+        return True
+    
+    def start_service(self, spec):
+        """Start one service from the manifest, as a pool if it has replicas"""
+        if not self._run_setup(spec):
+            return False
+        
+        if spec.pooled:
+            return self.start_pool(spec)
         
-        # Change to python-ai-services directory
-        ai_dir = Path(__file__).parent / "python-ai-services"
+        port_note = f" on port {spec.port}" if spec.port else ""
+        print(f"🚀 Starting {spec.name}{port_note}...")
         
-        # Start the basic server
         try:
             process = subprocess.Popen(
-                [sys.executable, "basic_server.py"],
-                cwd=ai_dir,
+                spec.render_command(),
+                cwd=spec.cwd,
+                env=spec.render_env(),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 universal_newlines=True,
-                bufsize=1
+                bufsize=1,
+                preexec_fn=self._preexec(spec.name)
             )
             
-            self.processes["ai_services"] = process
+            self.processes[spec.name] = process
             
             # Monitor output
-            def monitor_ai_output():
+            def monitor_output():
                 for line in iter(process.stdout.readline, ''):
                     if line:
-                        print(f"[AI] {line.strip()}")
+                        print(f"[{spec.label}] {line.strip()}")
                 
-            threading.Thread(target=monitor_ai_output, daemon=True).start()
-            return True
+            threading.Thread(target=monitor_output, daemon=True).start()
             
         except Exception as e:
-            print(f"❌ Failed to start AI services: {e}")
+            print(f"❌ Failed to start {spec.name}: {e}")
             return False
+        
+        if not self._wait_ready(spec, process):
+            print(f"❌ {spec.name} did not become ready")
+            return False
+        return True
     
-    def start_dashboard(self):
-        """Start Next.js dashboard"""
-        print("🌐 Starting Next.js Dashboard on port 3000...")
+    def start_pool(self, spec):
+        """Start N replicas (N may be 1) behind the round-robin proxy on the service port"""
+        probe = spec.probe
+        pool = WorkerPool(
+            spec.cwd,
+            command=spec.render_command(port="{port}"),
+            label=spec.label,
+            env=spec.render_env(),
+            workers=spec.replicas,
+            port=spec.port,
+            base_port=spec.worker_base_port,
+            startup_timeout=probe.timeout if probe else 30.0,
+            health_path=probe.path if probe and probe.type == "http" else None,
+            preexec_fn=self._preexec(spec.name)
+        )
+        self.pools[spec.name] = pool
+        print(f"🚀 Starting {pool.size} {spec.name} workers behind port {spec.port}...")
         
         try:
-            process = subprocess.Popen(
-                ["npm", "run", "dev"],
-                cwd=Path(__file__).parent,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
-            )
-            
-            self.processes["dashboard"] = process
-            
-            # Monitor output
-            def monitor_dashboard_output():
-                for line in iter(process.stdout.readline, ''):
-                    if line:
-                        print(f"[DASH] {line.strip()}")
-                
-            threading.Thread(target=monitor_dashboard_output, daemon=True).start()
-            return True
-            
+            return pool.start()
         except Exception as e:
-            print(f"❌ Failed to start dashboard: {e}")
+            print(f"❌ Failed to start {spec.name} worker pool: {e}")
             return False
     
+    def start_all(self):
+        """Start enabled services in dependency order"""
+        for spec in self.manifest.start_order():
+            if not self.start_service(spec):
+                print(f"❌ Failed to start {spec.name}")
+                return False
+            self.started.append(spec.name)
+        return True
+    
+    def roll_workers(self):
+        """Restart every pool's workers one at a time"""
+        for name, pool in self.pools.items():
+            pool.roll(self.manifest.services[name].drain_timeout)
+    
+    def reload_services(self):
+        """Bring up a new generation of each reloadable service, then retire the old one"""
+        for name in self.started:
+            spec = self.manifest.services[name]
+            if not spec.reloadable:
+                continue
+            # Reloadable services always run as a pool, one replica or more
+            self.pools[name].reload(spec.drain_timeout)
+    
     def check_services(self):
         """Check if services are running"""
         status = {}
@@ -88,64 +184,199 @@ class ServiceManager:
                 status[name] = "running"
             else:
                 status[name] = "stopped"
+        for name, pool in self.pools.items():
+            for worker_id, stats in pool.stats().items():
+                status[f"{name}_{worker_id}"] = stats["state"]
         return status
     
+    def resource_stats(self):
+        """Per-service state and /proc resource usage, plus restart counts of pool workers
+
+        Plain services are not respawned, so they have no restart count.
+        """
+        status = self.check_services()
+        pids = {name: process.pid for name, process in self.processes.items()
+                if process and process.poll() is None}
+        restarts = {}
+        for name, pool in self.pools.items():
+            for worker_id, stats in pool.stats().items():
+                if stats["state"] == "running":
+                    pids[f"{name}_{worker_id}"] = stats["pid"]
+                restarts[f"{name}_{worker_id}"] = stats["restarts"]
+        
+        samples = self.sampler.sample(pids)
+        return {
+            name: {
+                "state": state,
+                **({"restarts": restarts[name]} if name in restarts else {}),
+                **samples.get(name, {}),
+            }
+            for name, state in status.items()
+        }
+    
+    def _stop_process(self, name, process, timeout):
+        """SIGTERM, give in-flight work until the deadline, then SIGKILL"""
+        if process and process.poll() is None:
+            print(f"Stopping {name}...")
+            process.terminate()
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                print(f"⚠️  {name} did not finish within {timeout:.0f}s, killing")
+                process.kill()
+    
     def stop_services(self):
-        """Stop all services"""
+        """Drain and stop all services, dependents before their dependencies"""
         print("\n🛑 Stopping services...")
         self.running = False
+        deadline = time.monotonic() + self.drain_timeout
         
-        for name, process in self.processes.items():
-            if process and process.poll() is None:
-                print(f"Stopping {name}...")
-                process.terminate()
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    process.kill()
+        # Stop routing new work first, then let in-flight requests finish
+        for name, pool in self.pools.items():
+            print(f"Draining {name} worker pool...")
+            if not pool.drain(self.drain_timeout):
+                print(f"⚠️  {name} requests still in flight at drain deadline")
+        
+        for name in reversed(self.started or list(self.processes) + list(self.pools)):
+            remaining = max(deadline - time.monotonic(), 1.0)
+            if name in self.pools:
+                print(f"Stopping {name} worker pool...")
+                self.pools[name].stop(remaining)
+            else:
+                self._stop_process(name, self.processes.get(name), remaining)
         
         print("✅ All services stopped")
 
+def send_control_command(command):
+    """Signal the supervisor recorded in the pid file"""
+    try:
+        pid = int(PID_FILE.read_text())
+    except (OSError, ValueError):
+        print("❌ No running service manager found")
+        return False
+    
+    sig = getattr(signal, CONTROL_SIGNALS[command], None)
+    if sig is None:
+        print(f"❌ '{command}' is not supported on this platform")
+        return False
+    
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        print(f"❌ Service manager (pid {pid}) is not running")
+        PID_FILE.unlink(missing_ok=True)
+        return False
+    
+    print(f"📨 Sent {command} to service manager (pid {pid})")
+    return True
+
 def main():
     """Main startup function"""
+    parser = argparse.ArgumentParser(description="Start Cival Dashboard services")
+    parser.add_argument("command", nargs="?", default="start", choices=["start", *CONTROL_SIGNALS],
+                        help="start the services, or control an already running supervisor")
+    parser.add_argument("--manifest", type=Path, default=DEFAULT_MANIFEST,
+                        help="service manifest to load (default: services.toml)")
+    parser.add_argument("--profile", default=None,
+                        help="manifest profile selecting services and replica counts, e.g. perf")
+    parser.add_argument("--with", dest="extra_services", action="append", default=[], metavar="SERVICE",
+                        help="also start a service that is disabled in the manifest, e.g. redis")
+    parser.add_argument("--replicas", action="append", default=[], metavar="SERVICE=N",
+                        help="override a service's replica count for this run")
+    parser.add_argument("--ai-workers", type=int, nargs="?", const=0, default=None,
+                        help="shorthand for --replicas ai_services=N (default N: CPU count)")
+    parser.add_argument("--metrics-interval", type=float, default=0,
+                        help="print a JSON resource status line every N seconds")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve the latest resource sample on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--limit", action="append", default=[], metavar="SERVICE:KEY=VALUE",
+                        help="cap a service, e.g. dashboard:memory_mb=2048 (keys: memory_mb, cpu_percent, nofile)")
+    parser.add_argument("--drain-timeout", type=float, default=None,
+                        help="seconds to let in-flight requests finish on stop/reload")
+    args = parser.parse_args()
+    
+    if args.command != "start":
+        send_control_command(args.command)
+        return
+    
+    try:
+        manifest = load_manifest(args.manifest)
+        if args.profile:
+            manifest.apply_profile(args.profile)
+        for name in args.extra_services:
+            manifest.enable(name.split(","))
+        for override in args.replicas:
+            name, _, count = override.partition("=")
+            manifest.set_replicas(name, int(count))
+        if args.ai_workers is not None:
+            manifest.set_replicas("ai_services", args.ai_workers or os.cpu_count() or 1)
+        services = manifest.start_order()
+    except (ManifestError, ValueError) as e:
+        parser.error(str(e))
+    
     print("🚀 Starting Cival Dashboard Services")
     print("=" * 50)
     
-    manager = ServiceManager()
+    limits = {}
+    for spec in args.limit:
+        try:
+            name, setting = spec.split(":", 1)
+            key, value = setting.split("=", 1)
+            limits.setdefault(name, {})[key] = int(value)
+        except ValueError:
+            parser.error(f"invalid --limit {spec!r}, expected SERVICE:KEY=VALUE")
+    
+    manager = ServiceManager(
+        manifest,
+        limits={name: ResourceLimits.from_dict(data) for name, data in limits.items()},
+        drain_timeout=(args.drain_timeout if args.drain_timeout is not None
+                       else manifest.defaults.get("drain_timeout", 30.0))
+    )
     
-    # Handle Ctrl+C
+    # Handle Ctrl+C and `stop`; a second signal skips the drain
     def signal_handler(sig, frame):
+        if not manager.running:
+            sys.exit(1)
         manager.stop_services()
+        PID_FILE.unlink(missing_ok=True)
         sys.exit(0)
     
     signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
     
-    # Start AI services first
-    if not manager.start_ai_services():
-        print("❌ Failed to start AI services")
-        return
-    
-    # Wait a moment for AI services to start
-    time.sleep(3)
+    # `reload` swaps in a new generation, `roll` restarts workers one at a time
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda sig, frame: threading.Thread(
+            target=manager.reload_services, daemon=True).start())
+        signal.signal(signal.SIGUSR1, lambda sig, frame: threading.Thread(
+            target=manager.roll_workers, daemon=True).start())
     
-    # Start dashboard
-    if not manager.start_dashboard():
-        print("❌ Failed to start dashboard")
+    # Dependencies first; each service must pass its probe before the next starts
+    if not manager.start_all():
         manager.stop_services()
         return
     
-    # Wait for dashboard to start
-    time.sleep(5)
+    PID_FILE.write_text(str(os.getpid()))
     
     print("\n✅ Services Started Successfully!")
     print("=" * 50)
-    print("🤖 AI Services: http://localhost:9000")
-    print("🌐 Dashboard: http://localhost:3000")
-    print("📊 Health Check: http://localhost:9000/health")
-    print("🔗 Agents: http://localhost:9000/agents")
+    for spec in services:
+        for line in spec.banner or [f"▶️  {spec.name}: localhost:{spec.port}" if spec.port else f"▶️  {spec.name}"]:
+            print(line)
     print("=" * 50)
     print("Press Ctrl+C to stop all services")
     
+    if args.metrics_interval or args.metrics_port:
+        reporter = MetricsReporter(
+            manager.resource_stats,
+            interval=args.metrics_interval or 10,
+            http_port=args.metrics_port,
+            emit_lines=bool(args.metrics_interval)
+        )
+        reporter.start()
+        if args.metrics_port:
+            print(f"📈 Metrics: http://127.0.0.1:{args.metrics_port}/metrics")
+    
     # Monitor services
     while manager.running:
         time.sleep(10)
@@ -161,6 +392,14 @@ def main():
         if running_services:
             timestamp = time.strftime("%H:%M:%S")
             print(f"[{timestamp}] Services running: {', '.join(running_services)}")
+        
+        for name, pool in manager.pools.items():
+            timestamp = time.strftime("%H:%M:%S")
+            counts = ", ".join(
+                f"{worker_id}={stats['requests']}"
+                for worker_id, stats in pool.stats().items()
+            )
+            print(f"[{timestamp}] {name} worker requests: {counts}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
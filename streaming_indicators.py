@@ -0,0 +1,344 @@
+"""
+Incremental technical indicators for live trading agents
+
+Each indicator updates in O(1) per new bar (amortized O(1) for rolling
+min/max) and keeps its state in __slots__, so a per-tick update never
+rescans history. Warm-up and smoothing match indicators.py, so a stream
+fed bar by bar ends on the same values as a batch recompute.
+
+Every indicator can be dumped with to_state() into plain JSON types and
+rebuilt with from_state(), which is how an agent persists them in
+agent_state.state and resumes without replaying history.
+"""
+import math
+from collections import deque
+from typing import Dict, Optional
+
+NAN = float("nan")
+
+
+class StreamingEMA:
+    """Exponential moving average seeded with the SMA of the first `period` values"""
+
+    __slots__ = ("period", "alpha", "value", "_seed_sum", "_seed_count")
+
+    def __init__(self, period: int, alpha: Optional[float] = None):
+        self.period = period
+        self.alpha = alpha if alpha is not None else 2.0 / (period + 1)
+        self.value: Optional[float] = None
+        self._seed_sum = 0.0
+        self._seed_count = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.value is not None
+
+    def update(self, x: float) -> float:
+        if self.value is not None:
+            self.value += self.alpha * (x - self.value)
+            return self.value
+        self._seed_sum += x
+        self._seed_count += 1
+        if self._seed_count == self.period:
+            self.value = self._seed_sum / self.period
+            return self.value
+        return NAN
+
+    def to_state(self) -> Dict:
+        return {"period": self.period, "alpha": self.alpha, "value": self.value,
+                "seed_sum": self._seed_sum, "seed_count": self._seed_count}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "StreamingEMA":
+        ema = cls(state["period"], state["alpha"])
+        ema.value = state["value"]
+        ema._seed_sum = state["seed_sum"]
+        ema._seed_count = state["seed_count"]
+        return ema
+
+
+class StreamingRSI:
+    """Wilder's RSI over `period` bars"""
+
+    __slots__ = ("period", "_gain", "_loss", "_prev")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._gain = StreamingEMA(period, alpha=1.0 / period)
+        self._loss = StreamingEMA(period, alpha=1.0 / period)
+        self._prev: Optional[float] = None
+
+    @property
+    def value(self) -> float:
+        if not self._loss.ready:
+            return NAN
+        if self._loss.value == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self._gain.value / self._loss.value)
+
+    def update(self, close: float) -> float:
+        if self._prev is not None:
+            delta = close - self._prev
+            self._gain.update(max(delta, 0.0))
+            self._loss.update(max(-delta, 0.0))
+        self._prev = close
+        return self.value
+
+    def to_state(self) -> Dict:
+        return {"period": self.period, "gain": self._gain.to_state(),
+                "loss": self._loss.to_state(), "prev": self._prev}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "StreamingRSI":
+        rsi = cls(state["period"])
+        rsi._gain = StreamingEMA.from_state(state["gain"])
+        rsi._loss = StreamingEMA.from_state(state["loss"])
+        rsi._prev = state["prev"]
+        return rsi
+
+
+class StreamingMACD:
+    """MACD line, signal line and histogram"""
+
+    __slots__ = ("_fast", "_slow", "_signal", "line", "signal")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self._fast = StreamingEMA(fast)
+        self._slow = StreamingEMA(slow)
+        self._signal = StreamingEMA(signal)
+        self.line = NAN
+        self.signal = NAN
+
+    @property
+    def histogram(self) -> float:
+        return self.line - self.signal
+
+    def update(self, close: float) -> float:
+        fast = self._fast.update(close)
+        slow = self._slow.update(close)
+        if self._slow.ready:
+            self.line = fast - slow
+            self.signal = self._signal.update(self.line)
+        return self.line
+
+    def to_state(self) -> Dict:
+        return {"fast": self._fast.to_state(), "slow": self._slow.to_state(),
+                "signal": self._signal.to_state(),
+                "line": None if math.isnan(self.line) else self.line}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "StreamingMACD":
+        macd = cls()
+        macd._fast = StreamingEMA.from_state(state["fast"])
+        macd._slow = StreamingEMA.from_state(state["slow"])
+        macd._signal = StreamingEMA.from_state(state["signal"])
+        macd.line = NAN if state["line"] is None else state["line"]
+        macd.signal = macd._signal.value if macd._signal.ready else NAN
+        return macd
+
+
+class StreamingATR:
+    """Wilder's average true range, seeded from bar 1 like indicators.atr"""
+
+    __slots__ = ("period", "_tr", "_prev_close")
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._tr = StreamingEMA(period, alpha=1.0 / period)
+        self._prev_close: Optional[float] = None
+
+    @property
+    def value(self) -> float:
+        return self._tr.value if self._tr.ready else NAN
+
+    def update(self, high: float, low: float, close: float) -> float:
+        # The first bar has no previous close; its true range is not part of the seed
+        if self._prev_close is not None:
+            prev = self._prev_close
+            self._tr.update(max(high - low, abs(high - prev), abs(low - prev)))
+        self._prev_close = close
+        return self.value
+
+    def to_state(self) -> Dict:
+        return {"period": self.period, "tr": self._tr.to_state(), "prev_close": self._prev_close}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "StreamingATR":
+        atr = cls(state["period"])
+        atr._tr = StreamingEMA.from_state(state["tr"])
+        atr._prev_close = state["prev_close"]
+        return atr
+
+
+class RollingStats:
+    """Rolling mean and population variance over a fixed window (Welford add/remove)"""
+
+    __slots__ = ("window", "_values", "mean", "_m2")
+
+    def __init__(self, window: int):
+        self.window = window
+        self._values: deque = deque()
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return len(self._values) == self.window
+
+    @property
+    def variance(self) -> float:
+        return max(self._m2 / len(self._values), 0.0) if self._values else NAN
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def update(self, x: float) -> float:
+        self._values.append(x)
+        n = len(self._values)
+        delta = x - self.mean
+        self.mean += delta / n
+        self._m2 += delta * (x - self.mean)
+
+        if n > self.window:
+            old = self._values.popleft()
+            n -= 1
+            delta = old - self.mean
+            self.mean -= delta / n
+            self._m2 -= delta * (old - self.mean)
+        return self.mean if self.ready else NAN
+
+    def to_state(self) -> Dict:
+        return {"window": self.window, "values": list(self._values),
+                "mean": self.mean, "m2": self._m2}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "RollingStats":
+        stats = cls(state["window"])
+        stats._values = deque(state["values"])
+        stats.mean = state["mean"]
+        stats._m2 = state["m2"]
+        return stats
+
+
+class RollingMinMax:
+    """Rolling min and max over a fixed window using monotonic deques"""
+
+    __slots__ = ("window", "_count", "_mins", "_maxs")
+
+    def __init__(self, window: int):
+        self.window = window
+        self._count = 0
+        # (bar index, value) pairs; values increase in _mins, decrease in _maxs
+        self._mins: deque = deque()
+        self._maxs: deque = deque()
+
+    @property
+    def min(self) -> float:
+        return self._mins[0][1] if self._mins else NAN
+
+    @property
+    def max(self) -> float:
+        return self._maxs[0][1] if self._maxs else NAN
+
+    def update(self, x: float):
+        index = self._count
+        self._count += 1
+        while self._mins and self._mins[-1][1] >= x:
+            self._mins.pop()
+        self._mins.append((index, x))
+        while self._maxs and self._maxs[-1][1] <= x:
+            self._maxs.pop()
+        self._maxs.append((index, x))
+
+        expired = index - self.window
+        if self._mins[0][0] <= expired:
+            self._mins.popleft()
+        if self._maxs[0][0] <= expired:
+            self._maxs.popleft()
+        return self.min, self.max
+
+    def to_state(self) -> Dict:
+        return {"window": self.window, "count": self._count,
+                "mins": [list(item) for item in self._mins],
+                "maxs": [list(item) for item in self._maxs]}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "RollingMinMax":
+        minmax = cls(state["window"])
+        minmax._count = state["count"]
+        minmax._mins = deque(tuple(item) for item in state["mins"])
+        minmax._maxs = deque(tuple(item) for item in state["maxs"])
+        return minmax
+
+
+class StreamingIndicators:
+    """The per-symbol indicator set used by TradingAgentExample"""
+
+    __slots__ = ("bars", "ema_20", "ema_50", "rsi", "macd", "bands", "volume", "range_20")
+
+    def __init__(self):
+        self.bars = 0
+        self.ema_20 = StreamingEMA(20)
+        self.ema_50 = StreamingEMA(50)
+        self.rsi = StreamingRSI(14)
+        self.macd = StreamingMACD(12, 26, 9)
+        self.bands = RollingStats(20)
+        self.volume = RollingStats(20)
+        self.range_20 = RollingMinMax(20)
+
+    def update(self, price: float, volume: float = 0.0) -> Dict:
+        """Feed one new bar and return the current snapshot"""
+        self.bars += 1
+        self.ema_20.update(price)
+        self.ema_50.update(price)
+        self.rsi.update(price)
+        self.macd.update(price)
+        self.bands.update(price)
+        self.volume.update(volume)
+        self.range_20.update(price)
+        return self.snapshot()
+
+    def snapshot(self) -> Dict:
+        """Current values, shaped like TradingAgentExample.calculate_indicators"""
+        def value(ema):
+            return ema.value if ema.ready else NAN
+
+        middle = self.bands.mean if self.bands.ready else NAN
+        width = 2.0 * self.bands.std if self.bands.ready else NAN
+        return {
+            "rsi": self.rsi.value,
+            "macd": {"value": self.macd.line, "signal": self.macd.signal},
+            "ema_20": value(self.ema_20),
+            "ema_50": value(self.ema_50),
+            "sma_20": middle,
+            "bollinger": {"upper": middle + width, "middle": middle, "lower": middle - width},
+            "volume_avg": self.volume.mean if self.volume.ready else NAN,
+            "high_20": self.range_20.max,
+            "low_20": self.range_20.min,
+        }
+
+    def to_state(self) -> Dict:
+        return {
+            "bars": self.bars,
+            "ema_20": self.ema_20.to_state(),
+            "ema_50": self.ema_50.to_state(),
+            "rsi": self.rsi.to_state(),
+            "macd": self.macd.to_state(),
+            "bands": self.bands.to_state(),
+            "volume": self.volume.to_state(),
+            "range_20": self.range_20.to_state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict) -> "StreamingIndicators":
+        indicators = cls()
+        indicators.bars = state["bars"]
+        indicators.ema_20 = StreamingEMA.from_state(state["ema_20"])
+        indicators.ema_50 = StreamingEMA.from_state(state["ema_50"])
+        indicators.rsi = StreamingRSI.from_state(state["rsi"])
+        indicators.macd = StreamingMACD.from_state(state["macd"])
+        indicators.bands = RollingStats.from_state(state["bands"])
+        indicators.volume = RollingStats.from_state(state["volume"])
+        indicators.range_20 = RollingMinMax.from_state(state["range_20"])
+        return indicators
@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+
+from agent_runtime import AgentRuntime
+from pnl_engine import PnLEngine
+from sharded_runtime import build_agent
+
+SPEC = {"agent_id": "mover", "symbols": ["AAPL"]}
+
+
+def test_moved_agent_takes_its_book_positions_and_pnl():
+    async def scenario():
+        old = AgentRuntime(workers=1, pnl=PnLEngine(writer=lambda rows: None))
+        new = AgentRuntime(workers=1, pnl=PnLEngine(writer=lambda rows: None))
+        agent = build_agent(SPEC, old)
+        old.add_agent(agent, SPEC["symbols"])
+
+        # An entry that filled: risk book, monitored position and P&L row
+        agent.risk.record_fill("mover", "AAPL", "buy", 10)
+        agent._watch_fill(SimpleNamespace(symbol="AAPL", side="buy", filled_quantity=10, average_price=100.0))
+        old.pnl.apply_fill("mover", "AAPL", "buy", 10, 100.0)
+        # A working limit order with its reservation
+        decision = await agent.make_trading_decision(symbol="AAPL", market_data={"price": 90.0},
+                                                     indicators={"rsi": 20})
+        assert await agent.validate_risk(decision)
+        await agent.execute_trade(decision)
+        await asyncio.sleep(0.01)
+        assert agent.open_orders()
+
+        state = await old.evict_agent("mover")
+        assert not agent.open_orders()
+        assert not old.monitor.positions and not old.pnl._slots
+        assert old.risk.limits("mover") is None
+
+        new.adopt_agent(build_agent(SPEC, new), SPEC["symbols"], state)
+        # The cancelled order's reservation was given back before the export
+        assert new.risk.book("mover").positions == {"AAPL": 10}
+        assert new.risk.book("mover").trades_today == 0
+        held = new.monitor.positions[("mover", "AAPL")]
+        assert (held.quantity, held.entry_price, held.stop_loss) == (10, 100.0, 98.0)
+        assert new.pnl.agent_totals()["mover"]["market_value"] == 1000.0
+
+        # Exits for the moved position are routed to the agent on its new runtime
+        new.market.publish("AAPL", 97.0, 100)
+        await asyncio.sleep(0.01)
+        await old.stop()
+        await new.stop()
+        return new
+
+    new = asyncio.run(scenario())
+    assert ("mover", "AAPL") not in new.monitor.positions
+    assert new.risk.book("mover").positions == {"AAPL": 0}
+    assert new.pnl.agent_totals()["mover"]["realized_pnl"] == -30.0
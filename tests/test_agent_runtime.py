@@ -0,0 +1,83 @@
+import asyncio
+import time
+
+from agent_runtime import AgentRuntime, HostedAgent, MarketDataHub
+from bar_store import BarStore
+from execution_gateway import ExecutionGateway, PaperBroker
+from pnl_engine import PnLEngine
+from position_monitor import LONG, PositionMonitor
+from risk_engine import RiskEngine
+
+
+class RecordingBroker(PaperBroker):
+    def __init__(self):
+        super().__init__()
+        self.prints = []
+
+    def print_trade(self, symbol, price, quantity):
+        self.prints.append((symbol, price, quantity))
+
+
+class FakeAgent:
+    """Records its steps; each step burns `cpu_ms` of CPU time"""
+
+    def __init__(self, agent_id, log, cpu_ms=0.0):
+        self.agent_id = agent_id
+        self.log = log
+        self.cpu_ns = int(cpu_ms * 1e6)
+
+    async def analyze_and_trade(self, symbol):
+        started = time.thread_time_ns()
+        while time.thread_time_ns() - started < self.cpu_ns:
+            pass
+        self.log.append(f"{self.agent_id}:{symbol}")
+
+
+def test_publish_fans_out_to_shared_services_and_subscribers():
+    broker = RecordingBroker()
+    risk = RiskEngine()
+    pnl = PnLEngine(writer=lambda rows: None)
+    monitor = PositionMonitor()
+    hub = MarketDataHub(BarStore(tick_capacity=16), monitor, risk, ExecutionGateway(broker), pnl)
+    scheduled = []
+    hub.on_pending = scheduled.append
+
+    pnl.apply_fill("a", "AAPL", "buy", 10, 100.0)
+    monitor.add("p1", "a", "AAPL", LONG, 10, 100.0, stop_loss=98.0)
+    hosted = HostedAgent(FakeAgent("a", []), ["AAPL"])
+    hub.subscribe(hosted, hosted.symbols)
+
+    hub.publish("AAPL", 101.0, 5)
+    hub.publish("AAPL", 97.5, 7)
+    hub.publish("MSFT", 300.0, 1)
+
+    assert risk._marks == {"AAPL": 97.5, "MSFT": 300.0}
+    assert broker.prints == [("AAPL", 101.0, 5), ("AAPL", 97.5, 7), ("MSFT", 300.0, 1)]
+    assert pnl.agent_totals()["a"]["market_value"] == 975.0
+    assert hub.bars.ticks("AAPL")["price"].tolist() == [101.0, 97.5]
+    assert hub.latest("AAPL")["price"] == 97.5 and hub.ticks == 3
+    # The stop at 98 fired on the second print
+    assert "p1" not in monitor.positions
+    # Both AAPL ticks coalesce into one pending entry and one wakeup; MSFT has no subscribers
+    assert list(hosted.pending) == ["AAPL"]
+    assert scheduled == [hosted]
+
+
+def test_agent_over_its_cpu_slice_sits_out_the_overrun():
+    async def scenario():
+        runtime = AgentRuntime(workers=1, cpu_slice_ms=1.0)
+        log = []
+        hog = runtime.add_agent(FakeAgent("hog", log, cpu_ms=20.0), ["AAPL", "MSFT"])
+        light = runtime.add_agent(FakeAgent("light", log), ["AAPL", "MSFT"])
+        for symbol in ("AAPL", "MSFT"):
+            runtime.market.publish(symbol, 100.0)
+        await runtime.start()
+        await asyncio.wait_for(runtime.drain(), 5)
+        await runtime.stop()
+        return log, hog, light
+
+    log, hog, light = asyncio.run(scenario())
+    # Plain round-robin would alternate; the hog yields its turn while it is throttled
+    assert log == ["hog:AAPL", "light:AAPL", "light:MSFT", "hog:MSFT"]
+    assert hog.throttled == 2 and light.throttled == 0
+    assert hog.cpu_ns >= 40e6
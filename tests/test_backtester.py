@@ -0,0 +1,83 @@
+from agent_trading_example import TradeDecision
+from backtester import BacktestAgent, Backtester, SimulatedBroker, run_sync, synthetic_bars
+from risk_engine import AgentLimits
+
+
+def replay_agent(**kwargs):
+    broker = SimulatedBroker(100_000.0)
+    agent = BacktestAgent(broker, max_position=100, **kwargs)
+    return broker, agent, agent.bar_handler()
+
+
+def enter(agent, action="buy", quantity=10, price=100.0):
+    decision = TradeDecision(action, "SYM", quantity, price, "", 0.75, "momentum_rsi")
+    if not run_sync(agent.validate_risk(decision)):
+        return None
+    result = run_sync(agent.execute_trade(decision))
+    run_sync(agent.start_position_monitoring(result.order_id))
+    return result
+
+
+def step(broker, t):
+    broker.timestamp, broker.step = t * 60_000_000_000, t
+
+
+def test_entry_fills_from_the_next_bar_and_stop_exits():
+    broker, agent, on_bar = replay_agent()
+    step(broker, 0)
+    on_bar("SYM", 100.0, 1000)
+    assert enter(agent)
+    step(broker, 1)
+    on_bar("SYM", 99.5, 1000)
+    assert broker.position("SYM") == 10 and broker.fills[-1].price == 100.0
+    assert agent.monitor.positions[(agent.agent_id, "SYM")].stop_loss == 98.0
+    step(broker, 2)
+    on_bar("SYM", 97.0, 1000)
+    assert broker.position("SYM") == 0 and broker.fills[-1].side == "sell"
+    assert not agent.monitor.positions
+    assert agent.risk.book(agent.agent_id).positions["SYM"] == 0
+
+
+def test_unfilled_entry_expires_and_releases_its_reservation():
+    broker, agent, on_bar = replay_agent()
+    step(broker, 0)
+    on_bar("SYM", 100.0, 1000)
+    assert enter(agent)
+    for t in (1, 2):
+        step(broker, t)
+        on_bar("SYM", 101.0, 1000)
+    assert broker.position("SYM") == 0
+    book = agent.risk.book(agent.agent_id)
+    assert book.positions["SYM"] == 0 and book.trades_today == 0
+
+
+def test_risk_engine_and_account_checks_apply():
+    broker, agent, on_bar = replay_agent(limits=AgentLimits("momentum-trader-001", max_trade_size=500,
+                                                            allowed_symbols=None))
+    assert enter(agent) is None
+    assert enter(agent, quantity=4)
+    # Shorting is an account check; its rejection gives the reservation back
+    assert enter(agent, action="sell", quantity=5) is None
+    assert agent.risk.book(agent.agent_id).positions["SYM"] == 4
+
+
+def test_replay_books_match_the_account():
+    data = synthetic_bars(symbols=3, bars=3000)
+    agents = []
+
+    def factory(broker):
+        agents.append(BacktestAgent(broker))
+        return agents[-1]
+
+    result = Backtester(agent_factory=factory).run(data["symbols"], data["timestamps"], data["close"],
+                                                   data["volume"])
+    agent = agents[0]
+    assert result.fills
+    book = agent.risk.book(agent.agent_id).positions
+    open_orders = [o for o in agent.gateway.orders.values() if not o.is_final]
+    for symbol in data["symbols"]:
+        working = sum(o.remaining if o.side == "buy" else -o.remaining
+                      for o in open_orders if o.symbol == symbol)
+        assert book.get(symbol, 0.0) == agent.broker.position(symbol) + working
+        held = agent.monitor.positions.get((agent.agent_id, symbol))
+        assert (held.quantity if held else 0.0) == abs(agent.broker.position(symbol))
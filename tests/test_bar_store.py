@@ -0,0 +1,28 @@
+import numpy as np
+
+from bar_store import NS_PER_SECOND, BarStore
+
+
+def test_reads_do_not_create_symbols():
+    store = BarStore(tick_capacity=16)
+    assert store.latest("ZZZ") is None
+    assert store.window("ZZZ") is None
+    assert store.ticks("ZZZ") is None
+    assert store.symbols() == []
+    assert store.memory_bytes() == 0
+
+
+def test_default_footprint_fits_a_5k_universe():
+    store = BarStore()
+    store.append_tick("AAPL", 0, 150.0, 10)
+    assert store.memory_bytes() == 3 * 256 * 2 * 48
+    assert store.memory_bytes() * 5000 < 400 * 1024 * 1024
+
+
+def test_window_is_contiguous_after_wrap():
+    store = BarStore(timeframes=("1s",), capacity=8)
+    for i in range(20):
+        store.append_bar("AAPL", i * NS_PER_SECOND, i, i, i, float(i), 1)
+    window = store.window("AAPL", n=5)
+    np.testing.assert_array_equal(window["close"], [15, 16, 17, 18, 19])
+    assert store.latest("AAPL")["close"] == 19
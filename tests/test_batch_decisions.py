@@ -0,0 +1,31 @@
+import numpy as np
+
+from agent_trading_example import TradeDecision
+from batch_decisions import BUY, MOMENTUM, NO_SIGNAL, OVERBOUGHT, SELL, DecisionBatch, decide
+
+
+def test_round_trip_keeps_every_field():
+    decisions = [
+        TradeDecision("sell", "AAPL", 10, 150.0, "LLM says sell", 0.9, "llm"),
+        TradeDecision("buy", "MSFT", 100, 300.0, "Price above EMA20 and MACD crossover", 0.75, "momentum_rsi"),
+        TradeDecision("sell", "GOOGL", 100, None, "RSI indicates overbought conditions", 0.75, "momentum_rsi"),
+    ]
+    batch = DecisionBatch.from_decisions(decisions)
+    assert batch.to_decisions() == decisions
+    assert batch.reason.tolist() == [NO_SIGNAL, MOMENTUM, OVERBOUGHT]
+    assert batch.trend == "EMA20"
+
+
+def test_rule_batch_texts():
+    batch = decide(["A", "B"], {
+        "price": np.array([105.0, 95.0]),
+        "rsi": np.array([55.0, 75.0]),
+        "ema_20": np.array([100.0, 100.0]),
+        "macd": np.array([1.0, 0.0]),
+        "macd_signal": np.array([0.5, 0.0]),
+    })
+    assert batch.action.tolist() == [BUY, SELL]
+    first, second = batch.to_decisions()
+    assert first.reasoning == "Price above EMA20 and MACD crossover"
+    assert first.strategy == "momentum_rsi"
+    assert second.reasoning == "RSI indicates overbought conditions"
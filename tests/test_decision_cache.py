@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from decision_cache import DecisionCache, feature_key
+
+KEY = feature_key("AAPL", 100.0, 50.0, {"value": 1.0, "signal": 0.5})
+
+
+class SlowCompute:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"decision-{self.calls}"
+
+
+def test_concurrent_lookups_share_one_call():
+    cache, compute = DecisionCache(), SlowCompute()
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute(KEY, compute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["decision-1"] * 5
+    assert compute.calls == 1
+    assert cache.stats()["misses"] == 1 and cache.stats()["coalesced"] == 4
+    assert cache.get(KEY) == "decision-1"
+
+
+def test_cancelled_leader_does_not_cancel_the_waiters():
+    cache, compute = DecisionCache(), SlowCompute()
+
+    async def scenario():
+        leader = asyncio.create_task(cache.get_or_compute(KEY, compute))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(cache.get_or_compute(KEY, compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == "decision-1"
+    assert compute.calls == 1 and compute.cancelled == 0
+
+
+def test_call_is_cancelled_when_the_last_waiter_leaves():
+    cache, compute = DecisionCache(), SlowCompute()
+
+    async def scenario():
+        waiters = [asyncio.create_task(cache.get_or_compute(KEY, compute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        # Nothing left in flight: the next lookup starts a fresh call
+        return await cache.get_or_compute(KEY, compute)
+
+    assert asyncio.run(scenario()) == "decision-2"
+    assert compute.cancelled == 1
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    cache = DecisionCache()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("model down")
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute(KEY, failing) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get(KEY) is None
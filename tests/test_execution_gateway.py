@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from execution_gateway import BrokerBackend, ExecutionGateway, PaperBroker
+
+
+def test_backend_must_implement_submit_and_cancel():
+    class Incomplete(BrokerBackend):
+        async def submit(self, orders):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_restarted_router_keeps_queued_orders():
+    async def scenario():
+        gateway = ExecutionGateway(PaperBroker())
+        first = gateway.submit("agent", "AAPL", "buy", 10, "limit", 100.0)
+        # The router dies before it gets to the order
+        await gateway.close()
+        second = gateway.submit("agent", "AAPL", "buy", 5, "limit", 101.0)
+        done = await asyncio.wait_for(asyncio.gather(first.done, second.done), 1)
+        await gateway.close()
+        return done
+
+    first, second = asyncio.run(scenario())
+    assert first.status == second.status == "filled"
+    assert first.filled_quantity == 10 and second.average_price == 101.0
+
+
+def test_duplicate_client_order_id_returns_the_original():
+    async def scenario():
+        gateway = ExecutionGateway(PaperBroker())
+        order = gateway.submit("agent", "AAPL", "buy", 10, price=100.0, client_order_id="x")
+        again = gateway.submit("agent", "AAPL", "buy", 99, price=1.0, client_order_id="x")
+        await order.done
+        await gateway.close()
+        return order, again
+
+    order, again = asyncio.run(scenario())
+    assert again is order and order.quantity == 10
+
+
+def test_ack_latency_starts_at_the_decision():
+    from agent_trading_example import TradeDecision, TradingAgentExample
+
+    async def scenario():
+        gateway = ExecutionGateway(PaperBroker())
+        agent = TradingAgentExample(gateway=gateway)
+        agent.verbose = False
+        decided = time.monotonic_ns() - 2_000_000_000
+        result = await agent.execute_trade(TradeDecision("buy", "AAPL", 10, 100.0, "", 0.75, "momentum_rsi"),
+                                           decided_ns=decided)
+        order = gateway.orders[result.order_id]
+        await order.done
+        await gateway.close()
+        return order, decided, gateway
+
+    order, decided, gateway = asyncio.run(scenario())
+    assert order.decided_ns == decided
+    assert gateway.ack_latency.min >= 2_000_000_000
+
+
+def test_finished_orders_are_forgotten_past_the_cap():
+    async def scenario():
+        gateway = ExecutionGateway(PaperBroker(), keep_finished=3)
+        orders = [gateway.submit("agent", "AAPL", "buy", 1, price=100.0) for _ in range(10)]
+        await asyncio.gather(*(order.done for order in orders))
+        await gateway.close()
+        return gateway, orders
+
+    gateway, orders = asyncio.run(scenario())
+    assert list(gateway.orders) == [order.client_order_id for order in orders[-3:]]
+
+
+def test_close_sends_the_batch_the_router_had_taken():
+    class SlowBroker(PaperBroker):
+        async def submit(self, orders):
+            await asyncio.sleep(0.05)
+            await super().submit(orders)
+
+    async def scenario():
+        gateway = ExecutionGateway(SlowBroker())
+        order = gateway.submit("agent", "AAPL", "buy", 10, price=100.0)
+        await asyncio.sleep(0.01)  # The router is inside submit() now
+        await gateway.close()
+        return order
+
+    order = asyncio.run(scenario())
+    assert order.status == "filled"
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from indicators import atr, compute_indicators, ema, indicators_for, rsi
+
+# Straightforward per-series loops the vectorized versions must match
+
+def _reference_ema(series, period):
+    out = [float("nan")] * len(series)
+    if len(series) < period:
+        return out
+    value = sum(series[:period]) / period
+    out[period - 1] = value
+    alpha = 2.0 / (period + 1)
+    for t in range(period, len(series)):
+        value = alpha * series[t] + (1 - alpha) * value
+        out[t] = value
+    return out
+
+
+def _reference_rsi(series, period=14):
+    out = [float("nan")] * len(series)
+    if len(series) <= period:
+        return out
+    deltas = [series[t] - series[t - 1] for t in range(1, len(series))]
+    gain = sum(max(d, 0) for d in deltas[:period]) / period
+    loss = sum(max(-d, 0) for d in deltas[:period]) / period
+    out[period] = 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+    for t in range(period + 1, len(series)):
+        d = deltas[t - 1]
+        gain = (gain * (period - 1) + max(d, 0)) / period
+        loss = (loss * (period - 1) + max(-d, 0)) / period
+        out[t] = 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+    return out
+
+
+def _reference_atr(high, low, close, period=14):
+    tr = [high[0] - low[0]] + [
+        max(high[t] - low[t], abs(high[t] - close[t - 1]), abs(low[t] - close[t - 1]))
+        for t in range(1, len(close))
+    ]
+    out = [float("nan")] * len(close)
+    if len(close) <= period:
+        return out
+    value = sum(tr[1:period + 1]) / period
+    out[period] = value
+    for t in range(period + 1, len(close)):
+        value = (value * (period - 1) + tr[t]) / period
+        out[t] = value
+    return out
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (8, 300)), axis=-1))
+    high = close * (1 + rng.uniform(0, 0.01, close.shape))
+    low = close * (1 - rng.uniform(0, 0.01, close.shape))
+    return high, low, close
+
+
+def assert_matches(fast, reference):
+    np.testing.assert_allclose(fast, np.array(reference), atol=1e-9, equal_nan=True)
+
+
+def test_ema_matches_reference(prices):
+    _, _, close = prices
+    assert_matches(ema(close, 20), [_reference_ema(list(row), 20) for row in close])
+
+
+def test_rsi_matches_reference(prices):
+    _, _, close = prices
+    assert_matches(rsi(close), [_reference_rsi(list(row)) for row in close])
+
+
+def test_atr_matches_reference(prices):
+    high, low, close = prices
+    assert_matches(atr(high, low, close), [_reference_atr(list(h), list(l), list(c))
+                                           for h, l, c in zip(high, low, close)])
+
+
+def test_single_series_and_warm_up(prices):
+    _, _, close = prices
+    series = close[0, :10]
+    # Too short for a 20-bar EMA: all NaN, same shape
+    assert np.isnan(ema(series, 20)).all() and ema(series, 20).shape == (10,)
+    assert_matches(rsi(close[0]), _reference_rsi(list(close[0])))
+
+
+def test_indicators_for_picks_one_symbol(prices):
+    high, low, close = prices
+    batch = compute_indicators(close, high, low)
+    row = indicators_for(batch, 2)
+    assert row["rsi"] == pytest.approx(_reference_rsi(list(close[2]))[-1])
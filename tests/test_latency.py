@@ -0,0 +1,71 @@
+import threading
+
+import numpy as np
+
+from latency import BUCKETS, LatencyHistogram, StageTimer, bucket_index, bucket_value
+
+
+def test_bucket_value_is_within_three_percent():
+    values = np.unique(np.geomspace(1, 10**13, 5_000).astype(np.int64)).tolist()
+    indexes = [bucket_index(value) for value in values]
+    assert indexes == sorted(indexes) and indexes[-1] < BUCKETS
+    for value, index in zip(values, indexes):
+        assert abs(bucket_value(index) - value) <= value / 32
+    # Values below the first power-of-two break are exact
+    assert all(bucket_value(bucket_index(value)) == value for value in range(64))
+
+
+def test_record_many_matches_record():
+    values = np.random.default_rng(3).integers(0, 10**10, 2_000)
+    one_by_one, bulk = LatencyHistogram(), LatencyHistogram()
+    for value in values.tolist():
+        one_by_one.record(value)
+    bulk.record_many(values)
+    assert bulk.counts == one_by_one.counts
+    assert (bulk.count, bulk.total, bulk.min, bulk.max) == \
+        (one_by_one.count, one_by_one.total, one_by_one.min, one_by_one.max)
+
+
+def test_percentiles_are_within_bucket_precision():
+    histogram = LatencyHistogram()
+    histogram.record_many(np.arange(1, 100_001) * 1_000)
+    for p in (50, 90, 99, 99.9, 100):
+        expected = p / 100 * 100_000 * 1_000
+        assert abs(histogram.percentile(p) - expected) <= expected * 0.035
+
+
+def test_skipped_stages_pass_their_time_to_the_next_stage_that_ran():
+    timer = StageTimer(stages=("market_data", "indicators", "decision", "risk", "execution"), interval=0)
+    # indicators and risk did not run: decision is charged from market_data's end
+    timer.record("a", (100, 110, None, 130, None, 160))
+    # Rejected at risk: execution is missing, and the total ends at risk
+    timer.record("a", (200, 205, 215, 225, 228, None))
+    timer.collect()
+    market_data, indicators, decision, risk, execution, total = timer.histograms["a"]
+    assert (market_data.count, market_data.min, market_data.max) == (2, 5, 10)
+    assert (indicators.count, indicators.min) == (1, 10)
+    assert (decision.count, decision.min, decision.max) == (2, 10, 20)
+    assert (risk.count, risk.min) == (1, 3)
+    assert (execution.count, execution.min) == (1, 30)
+    assert (total.count, total.min, total.max) == (2, 28, 60)
+
+
+def test_buffers_of_exited_threads_are_dropped():
+    timer = StageTimer(stages=("work",), interval=0)
+
+    def request(n):
+        timer.record("a", (0, n))
+
+    threads = [threading.Thread(target=request, args=(n,)) for n in range(1, 9)]
+    for thread in threads:
+        thread.start()
+        thread.join()
+    assert len(timer._buffers) == 8
+    timer.collect()
+    assert timer._buffers == []
+    assert timer.histograms["a"][0].count == 8
+
+    # A live thread keeps its buffer between collections
+    timer.record("a", (0, 1))
+    timer.collect()
+    assert len(timer._buffers) == 1
@@ -0,0 +1,80 @@
+import asyncio
+
+from agent_trading_example import DEFAULT_STRATEGY, TradeDecision
+from llm_scheduler import FakeProvider, LLMScheduler, ProviderLimits, fallback_decision, is_fallback
+
+FEATURES = {"symbol": "AAPL", "price": 100.0, "rsi": 50.0, "macd": {"value": 1.0, "signal": 0.5}}
+
+
+def ask(scheduler, model, deadline):
+    async def run():
+        return (await model.run(deps=FEATURES)).output
+
+    return scheduler.call("fake", run, deadline=deadline,
+                          fallback=lambda: fallback_decision(FEATURES, TradeDecision))
+
+
+def test_answer_within_the_deadline():
+    async def scenario():
+        scheduler = LLMScheduler(default_limits=ProviderLimits(expected_latency=0.01))
+        decision = await ask(scheduler, FakeProvider(TradeDecision, latency=0.01, jitter=0), 1.0)
+        await scheduler.close()
+        return decision, scheduler.stats()["fake"]
+
+    decision, stats = asyncio.run(scenario())
+    assert not is_fallback(decision) and decision.strategy == "stub_model"
+    assert stats["completed"] == 1 and stats["fallbacks"] == {}
+
+
+def test_slow_call_times_out_to_the_fallback():
+    async def scenario():
+        scheduler = LLMScheduler(default_limits=ProviderLimits(expected_latency=0.01))
+        decision = await ask(scheduler, FakeProvider(TradeDecision, latency=1.0, jitter=0), 0.05)
+        await scheduler.close()
+        return decision, scheduler.stats()["fake"]
+
+    decision, stats = asyncio.run(scenario())
+    assert is_fallback(decision) and decision.action == "buy"
+    assert stats["fallbacks"] == {"timed_out": 1}
+
+
+def test_call_that_cannot_fit_is_not_started():
+    model = FakeProvider(TradeDecision, latency=0.01, jitter=0)
+
+    async def scenario():
+        scheduler = LLMScheduler(default_limits=ProviderLimits(expected_latency=1.0))
+        decision = await ask(scheduler, model, 0.5)
+        await scheduler.close()
+        return decision, scheduler.stats()["fake"]
+
+    decision, stats = asyncio.run(scenario())
+    assert is_fallback(decision) and model.calls == 0
+    assert stats["fallbacks"] == {"would_miss_deadline": 1}
+
+
+def test_close_cancels_calls_in_flight_and_answers_everyone():
+    model = FakeProvider(TradeDecision, latency=10.0, jitter=0)
+
+    async def scenario():
+        scheduler = LLMScheduler(default_limits=ProviderLimits(expected_latency=0.01, max_concurrency=1))
+        calls = [asyncio.create_task(ask(scheduler, model, 30.0)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        running = len(scheduler._running)
+        await scheduler.close()
+        decisions = await asyncio.wait_for(asyncio.gather(*calls), 1)
+        return running, decisions, scheduler
+
+    running, decisions, scheduler = asyncio.run(scenario())
+    assert running == 1 and not scheduler._running
+    assert all(is_fallback(decision) for decision in decisions)
+    assert model.in_flight == 0
+    assert scheduler.stats()["fake"]["fallbacks"] == {"cancelled": 1, "closed": 1}
+
+
+def test_fallback_trades_the_strategy_size():
+    oversold = {**FEATURES, "rsi": 28.0}
+    assert fallback_decision(oversold, TradeDecision).quantity == DEFAULT_STRATEGY["quantity"]
+    decision = fallback_decision(oversold, TradeDecision, {"quantity": 25, "rsi_oversold": 25})
+    # RSI 28 is no longer oversold at a threshold of 25; the MACD rule buys instead
+    assert (decision.action, decision.quantity, decision.reasoning) == ("buy", 25, "MACD above signal")
+    assert is_fallback(decision)
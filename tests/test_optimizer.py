@@ -0,0 +1,27 @@
+from backtester import Backtester, synthetic_bars
+from optimizer import Optimizer, grid, rank
+
+
+def test_rank_direction_follows_the_objective():
+    rows = [{"sharpe_ratio": 0.5, "max_drawdown": 900.0},
+            {"sharpe_ratio": 1.5, "max_drawdown": 300.0},
+            {"sharpe_ratio": None, "max_drawdown": float("nan")},
+            {"sharpe_ratio": 1.0, "max_drawdown": 100.0}]
+    assert [row["sharpe_ratio"] for row in rank(rows)] == [1.5, 1.0, 0.5, None]
+    assert [row["max_drawdown"] for row in rank(rows, "max_drawdown")][:3] == [100.0, 300.0, 900.0]
+    assert rank(rows, "max_drawdown")[-1]["sharpe_ratio"] is None
+
+
+def test_grid_through_the_shared_memory_pool_matches_a_local_run():
+    data = synthetic_bars(2, 400)
+    param_sets = grid({"rsi_overbought": [65, 75], "trend_ema": ["ema_20", None]})
+    with Optimizer(data["symbols"], data["timestamps"], data["close"], data["volume"],
+                   workers=2, objective="total_pnl") as optimizer:
+        rows = optimizer.evaluate(param_sets)
+
+    assert sorted(map(str, (row["params"] for row in rows))) == sorted(map(str, param_sets))
+    assert [row["total_pnl"] for row in rows] == sorted((row["total_pnl"] for row in rows), reverse=True)
+    best = rows[0]
+    local = Backtester(strategy=best["params"]).run(data["symbols"], data["timestamps"],
+                                                    data["close"], data["volume"])
+    assert local.metrics()["total_pnl"] == best["total_pnl"]
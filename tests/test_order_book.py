@@ -0,0 +1,73 @@
+import asyncio
+
+from execution_gateway import ExecutionGateway
+from order_book import BUY, SELL, OrderBook, OrderBookBroker
+
+
+def run_orders(broker, script):
+    """Run `script(gateway)` on a gateway over `broker`; returns its result"""
+    async def scenario():
+        gateway = ExecutionGateway(broker)
+        try:
+            return await asyncio.wait_for(script(gateway), 1)
+        finally:
+            await gateway.close()
+
+    return asyncio.run(scenario())
+
+
+def test_price_time_priority():
+    trades = []
+    book = OrderBook("AAPL", on_trade=lambda maker, taker, price, qty: trades.append((maker.order_id, price, qty)))
+    book.submit("a", SELL, 10, 101.0)
+    book.submit("b", SELL, 10, 100.0)
+    book.submit("c", SELL, 10, 100.0)
+    book.submit("buy", BUY, 25, 101.0)
+    assert trades == [("b", 100.0, 10), ("c", 100.0, 10), ("a", 101.0, 5)]
+    assert book.best_ask() == 101.0 and book.best_bid() is None
+
+
+def test_partial_market_order_reports_the_cancelled_remainder():
+    async def script(gateway):
+        maker = gateway.submit("maker", "AAPL", "sell", 30, "limit", 100.0)
+        await asyncio.sleep(0)
+        order = gateway.submit("agent", "AAPL", "buy", 100, "market")
+        await order.done
+        return maker, order
+
+    maker, order = run_orders(OrderBookBroker(market_at_last=False), script)
+    assert maker.status == "filled"
+    assert order.status == "cancelled" and order.filled_quantity == 30
+    assert order.reject_reason.startswith("partially filled 30/100")
+
+
+def test_market_remainder_fills_at_the_last_print():
+    broker = OrderBookBroker()
+
+    async def script(gateway):
+        gateway.print_trade("AAPL", 101.0, 0)
+        order = gateway.submit("agent", "AAPL", "sell", 20, "market")
+        return await order.done
+
+    order = run_orders(broker, script)
+    assert order.status == "filled" and order.average_price == 101.0
+
+
+def test_resting_limit_fills_from_the_feed_and_expires():
+    now = [0.0]
+    broker = OrderBookBroker(ttl=60, clock=lambda: now[0])
+
+    async def script(gateway):
+        filled = gateway.submit("agent", "AAPL", "buy", 10, "limit", 100.0)
+        stale = gateway.submit("agent", "MSFT", "buy", 10, "limit", 300.0)
+        await asyncio.sleep(0)
+        gateway.print_trade("AAPL", 100.5, 1000)
+        assert not filled.is_final
+        gateway.print_trade("AAPL", 100.0, 1000)
+        now[0] = 61.0
+        gateway.print_trade("MSFT", 301.0, 1000)
+        return await filled.done, await stale.done
+
+    filled, stale = run_orders(broker, script)
+    assert filled.status == "filled" and filled.average_price == 100.0
+    assert stale.status == "cancelled" and stale.reject_reason == "expired"
@@ -0,0 +1,60 @@
+import asyncio
+
+from execution_gateway import ExecutionGateway, PaperBroker
+from pnl_engine import PnLEngine
+
+
+def engine():
+    written = []
+    return PnLEngine(writer=written.extend, flush_interval=3600), written
+
+
+def test_close_writes_the_flat_row_and_keeps_realized_pnl():
+    pnl, written = engine()
+    pnl.assign_vault("agent", "vault")
+    pnl.apply_fill("agent", "AAPL", "buy", 10, 100.0)
+    pnl.flush(force=True)
+    pnl.apply_fill("agent", "AAPL", "sell", 10, 101.0)
+    pnl.close_position("agent", "AAPL")
+    assert pnl.agent_totals()["agent"]["realized_pnl"] == 10.0
+
+    # Closing rows are material: written without waiting for the interval
+    assert pnl.flush() == 1
+    assert written[-1]["quantity"] == 0.0 and written[-1]["symbol"] == "AAPL"
+    assert pnl.agent_totals()["agent"]["realized_pnl"] == 10.0
+    assert pnl.vault_totals()["vault"]["realized_pnl"] == 10.0
+    assert pnl.flush(force=True) == 0
+
+    # The freed slot is reused for the next position, which starts from zero
+    pnl.apply_fill("agent", "MSFT", "buy", 5, 300.0)
+    pnl.update_price("MSFT", 310.0)
+    totals = pnl.agent_totals()["agent"]
+    assert totals["realized_pnl"] == 10.0 and totals["unrealized_pnl"] == 50.0
+    assert pnl.size == 1
+
+
+def test_reopening_before_the_flush_keeps_both_rows():
+    pnl, written = engine()
+    pnl.apply_fill("agent", "AAPL", "buy", 10, 100.0)
+    pnl.apply_fill("agent", "AAPL", "sell", 10, 99.0)
+    pnl.close_position("agent", "AAPL")
+    pnl.apply_fill("agent", "AAPL", "buy", 3, 98.0)
+    pnl.flush(force=True)
+    assert sorted(row["quantity"] for row in written) == [0.0, 3.0]
+    assert pnl.agent_totals()["agent"]["realized_pnl"] == -10.0
+
+
+def test_gateway_fills_feed_the_engine():
+    pnl, written = engine()
+
+    async def scenario():
+        gateway = ExecutionGateway(PaperBroker())
+        gateway.fill_listeners.append(pnl.on_fill)
+        await gateway.submit("agent", "AAPL", "buy", 10, "limit", 100.0).done
+        await gateway.submit("agent", "AAPL", "sell", 10, "limit", 102.0).done
+        await gateway.close()
+
+    asyncio.run(scenario())
+    pnl.flush()
+    assert written[-1]["quantity"] == 0.0
+    assert pnl.agent_totals()["agent"]["realized_pnl"] == 20.0
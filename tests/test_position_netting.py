@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+from agent_trading_example import TradingAgentExample
+from position_monitor import LONG, SHORT, PositionMonitor
+
+
+def fill(side, quantity, price, symbol="AAPL"):
+    return SimpleNamespace(client_order_id=f"{side}-{quantity}", symbol=symbol, side=side,
+                           filled_quantity=quantity, average_price=price)
+
+
+def agent(**exits) -> TradingAgentExample:
+    example = TradingAgentExample(monitor=PositionMonitor(), exits=exits)
+    example.verbose = False
+    return example
+
+
+def position(example, symbol="AAPL"):
+    return example.monitor.positions.get((example.agent_id, symbol))
+
+
+def test_adding_averages_the_entry():
+    example = agent()
+    example._watch_fill(fill("buy", 10, 100.0))
+    example._watch_fill(fill("buy", 30, 104.0))
+    held = position(example)
+    assert len(example.monitor.positions) == 1
+    assert (held.side, held.quantity, held.entry_price) == (LONG, 40, 103.0)
+    assert held.stop_loss == 103.0 * 0.98
+
+
+def test_closing_sell_removes_the_position():
+    example = agent()
+    example._watch_fill(fill("buy", 10, 100.0))
+    example._watch_fill(fill("sell", 4, 101.0))
+    held = position(example)
+    assert (held.side, held.quantity, held.entry_price) == (LONG, 6, 100.0)
+    example._watch_fill(fill("sell", 6, 102.0))
+    assert not example.monitor.positions
+    # No exits left behind from the closed position
+    assert example.monitor.on_price("AAPL", 50.0) == []
+
+
+def test_flip_starts_a_new_position_at_the_fill():
+    example = agent()
+    example._watch_fill(fill("buy", 10, 100.0))
+    example._watch_fill(fill("sell", 25, 110.0))
+    held = position(example)
+    assert (held.side, held.quantity, held.entry_price) == (SHORT, 15, 110.0)
+
+
+def test_exit_fires_once_and_unfilled_rest_is_watched_again():
+    example = agent()
+    exits = []
+    example.monitor.on_exit = lambda pos, reason, price: exits.append(pos)
+    example._watch_fill(fill("buy", 10, 100.0))
+    example._watch_fill(fill("buy", 10, 100.0))
+    example.monitor.on_price("AAPL", 97.0)
+    assert len(exits) == 1 and exits[0].quantity == 20
+    example._exit_finished(exits[0], fill("sell", 15, 97.0))
+    held = position(example)
+    assert (held.side, held.quantity, held.entry_price) == (LONG, 5, 100.0)
+    assert example.risk.book(example.agent_id).positions["AAPL"] == -15
+
+
+def test_levels_stay_flat_over_many_fills():
+    example = agent(trail_pct=0.05)
+    sizes = []
+    for i in range(2000):
+        example._watch_fill(fill("buy" if i % 3 else "sell", 5, 100.0 + i % 7))
+        sizes.append(example.monitor.stats()["levels"])
+    # One live position with three levels, plus at most the dead ones awaiting compaction
+    assert max(sizes[100:]) <= 3 + 3 * 64
+    assert len(example.monitor.positions) == 1
+    example.monitor.on_price("AAPL", 1.0)
+    assert not example.monitor.positions
@@ -0,0 +1,53 @@
+import threading
+
+from profiler import ProfilerServer, SamplingProfiler, request_profile
+
+
+class BusyAgent:
+    """Spins inside the pipeline's indicator stage until told to stop"""
+
+    def __init__(self, agent_id, stop):
+        self.agent_id = agent_id
+        self.stop = stop
+
+    def analyze_and_trade(self):
+        while not self.stop.is_set():
+            self.calculate_indicators()
+
+    def calculate_indicators(self):
+        return sum(i * i for i in range(2_000))
+
+
+def test_profile_request_writes_tagged_collapsed_stacks(tmp_path):
+    stop = threading.Event()
+    worker = threading.Thread(target=BusyAgent("agent-7", stop).analyze_and_trade, name="agent-worker")
+    server = ProfilerServer(str(tmp_path / "p.sock"), output_dir=str(tmp_path))
+    worker.start()
+    server.start()
+    try:
+        assert request_profile(server.path, seconds=0.01).startswith("ok ")
+        output = tmp_path / "capture.collapsed"
+        reply = request_profile(server.path, seconds=0.3, interval_ms=2, output=str(output))
+    finally:
+        stop.set()
+        worker.join()
+        server.stop()
+
+    status, path, samples, stacks = reply.split()
+    assert (status, path) == ("ok", str(output))
+    lines = output.read_text().splitlines()
+    assert len(lines) == int(stacks) > 0 and int(samples) > 10
+
+    profiler = SamplingProfiler()
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        profiler.samples[stack] += int(count)
+    by_agent = profiler.by_tag("agent:")
+    by_stage = profiler.by_tag("stage:")
+    assert set(by_agent) == {"agent-7"} and set(by_stage) == {"indicators"}
+    # Every sample of the worker thread was taken inside the pipeline, nearly all in the stage
+    worker_samples = sum(count for stack, count in profiler.samples.items()
+                         if stack.startswith("thread:agent-worker;"))
+    assert by_agent["agent-7"] == worker_samples
+    assert 0 < by_stage["indicators"] <= worker_samples
+    assert not (tmp_path / "p.sock").exists()
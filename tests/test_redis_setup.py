@@ -0,0 +1,42 @@
+import asyncio
+
+from redis_setup import RespServer
+
+
+async def roundtrip(server, payload: bytes) -> bytes:
+    listener = await asyncio.start_server(server._handle, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(payload)
+        writer.write_eof()
+        reply = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return reply
+
+
+def command(*args: str) -> bytes:
+    out = b"*%d\r\n" % len(args)
+    for arg in args:
+        out += b"$%d\r\n%s\r\n" % (len(arg), arg.encode())
+    return out
+
+
+def test_malformed_header_gets_a_protocol_error():
+    reply = asyncio.run(roundtrip(RespServer(), b"*1\r\n$abc\r\nPING\r\n"))
+    assert reply.startswith(b"-ERR Protocol error")
+    reply = asyncio.run(roundtrip(RespServer(), b"*x\r\n"))
+    assert reply.startswith(b"-ERR Protocol error")
+
+
+def test_set_nx_px():
+    server = RespServer()
+    reply = asyncio.run(roundtrip(server, command("SET", "k", "1", "NX", "PX", "50") +
+                                  command("SET", "k", "2", "NX") +
+                                  command("GET", "k")))
+    assert reply == b"+OK\r\n$-1\r\n$1\r\n1\r\n"
+    assert server.store.expiry["k"] > 0
+    assert server.execute([b"SET", b"k", b"3", b"XX"]) is True
+    assert server.execute([b"SET", b"missing", b"3", b"XX"]) is None
+    assert isinstance(server.execute([b"SET", b"k", b"3", b"NX", b"XX"]), ValueError)
+    assert isinstance(server.execute([b"SET", b"k", b"3", b"BOGUS"]), ValueError)
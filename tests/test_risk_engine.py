@@ -0,0 +1,58 @@
+from agent_trading_example import DEFAULT_STRATEGY, TradeDecision
+from risk_engine import AgentLimits, RiskEngine
+
+
+def engine(clock=None, **limits) -> RiskEngine:
+    risk = RiskEngine(fetch=lambda since: [], **({"clock": clock} if clock else {}))
+    risk.set_limits(AgentLimits("agent", **limits))
+    return risk
+
+
+def decision(action="buy", quantity=10, price=100.0, strategy="momentum_rsi", symbol="AAPL"):
+    return TradeDecision(action, symbol, quantity, price, "", 0.75, strategy)
+
+
+def test_example_decision_passes_the_defaults():
+    risk = engine()
+    assert risk.check("agent", decision(quantity=DEFAULT_STRATEGY["quantity"], price=99.0))
+
+
+def test_trade_and_position_size():
+    risk = engine(max_trade_size=1000, max_position_size=1500)
+    assert "trade size" in risk.check("agent", decision(quantity=11)).reason
+    assert risk.check("agent", decision(quantity=10))
+    assert "position in AAPL" in risk.check("agent", decision(quantity=6)).reason
+    assert risk.check("agent", decision(action="sell", quantity=10))
+
+
+def test_market_order_valued_at_last_price():
+    risk = engine(max_trade_size=1000)
+    assert not risk.check("agent", decision(price=None))
+    risk.mark("AAPL", 200.0)
+    assert "trade size" in risk.check("agent", decision(price=None)).reason
+    assert risk.check("agent", decision(quantity=5, price=None))
+
+
+def test_symbol_and_strategy_allow_lists():
+    risk = engine()
+    assert "not an allowed symbol" in risk.check("agent", decision(symbol="TSLA")).reason
+    assert "not allowed" in risk.check("agent", decision(strategy="llm")).reason
+    assert AgentLimits.from_row({"agent_id": "a"}).allowed_strategies == AgentLimits("a").allowed_strategies
+
+
+def test_daily_limit_rolls_over_with_the_clock():
+    now = [0.0]
+    risk = engine(clock=lambda: now[0], max_daily_trades=1)
+    assert risk.check("agent", decision())
+    assert "daily trade limit" in risk.check("agent", decision()).reason
+    now[0] = 86400.0
+    assert risk.check("agent", decision())
+
+
+def test_release_gives_back_the_reservation():
+    risk = engine(max_daily_trades=1)
+    first = decision()
+    assert risk.check("agent", first)
+    risk.release("agent", first)
+    assert risk.book("agent").positions["AAPL"] == 0
+    assert risk.check("agent", decision())
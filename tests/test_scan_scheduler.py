@@ -0,0 +1,72 @@
+import asyncio
+
+from scan_scheduler import ScanScheduler
+
+SYMBOLS = [f"SYM{i}" for i in range(20)]
+
+
+def run(scheduler, ticks):
+    asyncio.run(scheduler.run(ticks))
+
+
+def test_semaphore_bounds_scans_in_flight():
+    in_flight, peak = 0, 0
+
+    async def scan(symbol):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.005)
+        in_flight -= 1
+
+    reports = []
+    run(ScanScheduler(scan, SYMBOLS, interval=0.01, concurrency=3, on_report=reports.append), 1)
+    assert peak == 3
+    assert reports[0].symbols == len(SYMBOLS) and not reports[0].errors
+
+
+def test_ticks_stay_on_the_fixed_rate_grid():
+    async def scan(symbol):
+        await asyncio.sleep(0.02)
+
+    reports = []
+    run(ScanScheduler(scan, SYMBOLS, interval=0.05, on_report=reports.append), 6)
+    start = reports[0].scheduled_at
+    assert [r.tick for r in reports] == list(range(6))
+    for report in reports:
+        # Scan time does not push later ticks back
+        assert abs(report.scheduled_at - (start + report.tick * 0.05)) < 1e-9
+        assert report.start_lag < 0.02 and report.overrun == 0
+    assert abs((reports[-1].started_at - reports[0].started_at) - 5 * 0.05) < 0.02
+
+
+def test_overrun_skips_missed_ticks():
+    calls = []
+
+    async def scan(symbol):
+        calls.append(symbol)
+        # Only the first tick is slow: 2.5 intervals
+        await asyncio.sleep(0.25 if len(calls) == 1 else 0.0)
+
+    reports = []
+    run(ScanScheduler(scan, ["AAPL"], interval=0.1, on_report=reports.append), 5)
+    first, second = reports[0], reports[1]
+    assert first.overrun > 0.1
+    # Ticks 1 and 2 were due while tick 0 ran: skipped, not run back to back
+    assert (second.tick, second.skipped_ticks) == (3, 2)
+    assert second.start_lag < 0.05
+    assert [r.tick for r in reports] == [0, 3, 4]
+
+
+def test_failing_symbol_does_not_stop_the_others():
+    scanned = []
+
+    async def scan(symbol):
+        if symbol == "SYM3":
+            raise RuntimeError("no data")
+        scanned.append(symbol)
+
+    reports = []
+    run(ScanScheduler(scan, SYMBOLS, interval=0.01, on_report=reports.append), 1)
+    assert reports[0].errors == {"SYM3": "RuntimeError: no data"}
+    assert len(scanned) == len(SYMBOLS) - 1
@@ -0,0 +1,49 @@
+import pytest
+
+from service_manifest import ManifestError, load_manifest
+
+BASE = """
+[services.api]
+command = ["api"]
+port = 9000
+
+[services.db]
+command = ["db"]
+port = 5432
+enabled = false
+
+[services.web]
+command = ["web"]
+port = 3000
+depends_on = ["db"]
+"""
+
+
+def write(tmp_path, text):
+    path = tmp_path / "services.toml"
+    path.write_text(text)
+    return path
+
+
+def test_unknown_probe_key_is_a_manifest_error(tmp_path):
+    path = write(tmp_path, '[services.api]\ncommand = ["api"]\nport = 1\nprobe = { type = "http", pth = "/x" }\n')
+    with pytest.raises(ManifestError, match="pth"):
+        load_manifest(path)
+
+
+def test_pooled_service_needs_a_port(tmp_path):
+    with pytest.raises(ManifestError, match="no port"):
+        load_manifest(write(tmp_path, '[services.api]\ncommand = ["api"]\nreplicas = 2\n'))
+    with pytest.raises(ManifestError, match="no port"):
+        load_manifest(write(tmp_path, '[services.api]\ncommand = ["api"]\nreloadable = true\n'))
+    manifest = load_manifest(write(tmp_path, '[services.worker]\ncommand = ["w"]\n'))
+    with pytest.raises(ManifestError, match="no port"):
+        manifest.set_replicas("worker", 3)
+
+
+def test_start_order_leaves_manifest_alone(tmp_path):
+    manifest = load_manifest(write(tmp_path, BASE))
+    order = [spec.name for spec in manifest.start_order()]
+    assert order.index("db") < order.index("web")
+    assert not manifest.services["db"].enabled
+    assert [spec.name for spec in manifest.enabled_services()] == ["api", "web"]
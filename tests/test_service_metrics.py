@@ -0,0 +1,30 @@
+import os
+
+import service_metrics
+from service_metrics import ResourceLimits
+
+
+def test_memory_cap_goes_to_cgroup_when_writable(tmp_path, monkeypatch):
+    monkeypatch.setattr(service_metrics, "CGROUP_ROOT", tmp_path)
+    limits = ResourceLimits(memory_mb=2048)
+    assert limits.prepare_cgroup("postgres")
+    assert (tmp_path / "cival" / "postgres" / "memory.max").read_text() == str(2048 * 1024 * 1024)
+    # The child joins the group itself, before exec, and gets no RLIMIT_DATA on top
+    calls = []
+    monkeypatch.setattr(service_metrics.resource, "setrlimit", lambda *args: calls.append(args))
+    limits.preexec_fn(cgroup="postgres")()
+    assert (tmp_path / "cival" / "postgres" / "cgroup.procs").read_text() == str(os.getpid())
+    assert calls == []
+
+
+def test_setrlimit_fallback_without_cgroup(tmp_path, monkeypatch):
+    blocked = tmp_path / "not-a-dir"
+    blocked.write_text("")
+    monkeypatch.setattr(service_metrics, "CGROUP_ROOT", blocked)
+    limits = ResourceLimits(memory_mb=2048)
+    assert not limits.prepare_cgroup("postgres")
+    assert limits.preexec_fn() is not None
+
+
+def test_nofile_is_always_setrlimit():
+    assert ResourceLimits(memory_mb=512, nofile=1024).preexec_fn(cgroup="postgres") is not None
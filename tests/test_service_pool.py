@@ -0,0 +1,79 @@
+import socket
+import sys
+import threading
+import urllib.request
+
+from service_manifest import ServiceSpec
+from service_pool import WorkerPool
+
+SERVER = """
+import os
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = os.environ["WORKER_ID"].encode() + b"@" + os.environ["PORT"].encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+HTTPServer(("127.0.0.1", int(os.environ["PORT"])), Handler).serve_forever()
+"""
+
+
+def free_port_block(size: int) -> int:
+    """A port with the `size` ports after it free as well"""
+    while True:
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            base = probe.getsockname()[1]
+        if base + size < 65535:
+            try:
+                sockets = [socket.socket() for _ in range(size)]
+                for offset, s in enumerate(sockets):
+                    s.bind(("127.0.0.1", base + offset))
+                return base
+            except OSError:
+                continue
+            finally:
+                for s in sockets:
+                    s.close()
+
+
+def test_single_replica_reloadable_service_is_pooled(tmp_path):
+    spec = ServiceSpec("ai_services", {"command": ["x"], "port": 9000, "reloadable": True}, tmp_path, {})
+    assert spec.replicas == 1 and spec.pooled
+
+
+def test_single_replica_reload_keeps_serving(tmp_path):
+    (tmp_path / "server.py").write_text(SERVER)
+    port = free_port_block(4)
+    pool = WorkerPool(tmp_path, command=[sys.executable, "server.py"], workers=1, port=port,
+                      startup_timeout=10, health_path="/")
+    assert pool.start()
+    failures, replies = [], []
+    stop = threading.Event()
+
+    def client():
+        while not stop.is_set():
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=5) as response:
+                    replies.append(response.read().decode())
+            except OSError as e:
+                failures.append(e)
+
+    thread = threading.Thread(target=client)
+    thread.start()
+    try:
+        assert pool.reload(drain_timeout=5)
+    finally:
+        stop.set()
+        thread.join()
+        pool.stop()
+    assert not failures
+    assert f"worker_0@{port + 1}" in replies and f"worker_0@{port + 2}" in replies
+    assert pool.generation == 1
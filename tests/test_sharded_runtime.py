@@ -0,0 +1,96 @@
+import multiprocessing as mp
+import threading
+import time
+
+import pytest
+
+from sharded_runtime import HashRing, SharedQuotes, ShardedRuntime, WorkerError, WorkerHandle
+
+KEYS = [f"agent-{i}" for i in range(2000)]
+
+
+def test_ring_moves_only_keys_the_new_worker_takes():
+    ring = HashRing()
+    for worker in ("w0", "w1", "w2", "w3"):
+        ring.add(worker)
+    before = {key: ring.owner(key) for key in KEYS}
+    assert set(before.values()) == {"w0", "w1", "w2", "w3"}
+
+    ring.add("w4")
+    moved = [key for key in KEYS if ring.owner(key) != before[key]]
+    assert all(ring.owner(key) == "w4" for key in moved)
+    assert 0.1 < len(moved) / len(KEYS) < 0.3
+
+    ring.remove("w4")
+    assert {key: ring.owner(key) for key in KEYS} == before
+
+
+def test_empty_ring_has_no_owner():
+    with pytest.raises(LookupError):
+        HashRing().owner("agent")
+
+
+def test_seqlock_read_skips_rows_mid_update():
+    quotes = SharedQuotes.create(["AAPL", "MSFT"])
+    reader = SharedQuotes.attach(quotes.spec)
+    try:
+        seen = reader.quotes["seq"].copy()
+        quotes.write("MSFT", 300.0, 5.0)
+        assert reader.changed(seen).tolist() == [1]
+        assert reader.read(1) == (2, 300.0, 5.0)
+        # A writer that has bumped seq but not finished the row
+        quotes.quotes["seq"][1] += 1
+        assert reader.read(1) is None
+        quotes.quotes["seq"][1] += 1
+        assert reader.read(1) == (4, 300.0, 5.0)
+    finally:
+        reader.close()
+        quotes.close()
+
+
+def test_late_reply_is_not_taken_for_the_next_call():
+    parent, child = mp.Pipe()
+    handle = WorkerHandle("w", None, parent)
+
+    def worker():
+        for delay in (0.2, 0.0):
+            seq, command, payload = child.recv()
+            time.sleep(delay)
+            child.send((seq, "ok", command))
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    with pytest.raises(TimeoutError):
+        handle.call("slow", timeout=0.05)
+    assert handle.call("fast", timeout=1) == "fast"
+    thread.join()
+
+
+def test_failed_command_comes_back_as_an_error_and_the_worker_lives():
+    with ShardedRuntime(["AAPL"], workers=1) as runtime:
+        runtime.add_agent("a1", ["AAPL"])
+        with pytest.raises(ValueError):
+            runtime.add_agent("a1", ["AAPL"])
+        handle = runtime.workers[runtime.owners["a1"]]
+        with pytest.raises(WorkerError, match="already hosted"):
+            handle.call("add", {"agent_id": "a1", "symbols": ["AAPL"]})
+        with pytest.raises(WorkerError, match="unknown command"):
+            handle.call("bogus")
+        assert list(handle.call("stats")["agents"]) == ["a1"]
+
+
+def test_rebalance_follows_the_ring():
+    with ShardedRuntime(["AAPL", "MSFT"], workers=1) as runtime:
+        agents = [f"agent-{i}" for i in range(8)]
+        for agent_id in agents:
+            runtime.add_agent(agent_id, ["AAPL"])
+
+        added = runtime.add_worker()
+        assert runtime.owners == {agent_id: runtime.ring.owner(agent_id) for agent_id in agents}
+        hosted = {worker: set(stats["agents"]) for worker, stats in runtime.stats().items()}
+        assert set().union(*hosted.values()) == set(agents)
+        assert hosted[added] and hosted[added] == {a for a, owner in runtime.owners.items() if owner == added}
+
+        runtime.remove_worker(added)
+        (remaining,) = runtime.workers
+        assert set(runtime.stats()[remaining]["agents"]) == set(agents)
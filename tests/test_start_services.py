@@ -0,0 +1,61 @@
+import socket
+import urllib.request
+
+import pytest
+
+from service_manifest import DEFAULT_MANIFEST, load_manifest
+from start_services import ServiceManager
+
+# Like python-ai-services/basic_server.py: its port is fixed, it does not read $PORT
+BASIC_SERVER = """
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b'{"status": "healthy"}'
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+HTTPServer(("0.0.0.0", 9000), Handler).serve_forever()
+"""
+
+
+def port_free(port: int) -> bool:
+    with socket.socket() as probe:
+        # As HTTPServer does: connections from an earlier run may still be in TIME_WAIT
+        probe.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            probe.bind(("0.0.0.0", port))
+        except OSError:
+            return False
+    return True
+
+
+def test_default_ai_services_start_answers_on_9000(tmp_path):
+    if not port_free(9000):
+        pytest.skip("port 9000 is in use")
+    (tmp_path / "basic_server.py").write_text(BASIC_SERVER)
+    manifest = load_manifest(DEFAULT_MANIFEST)
+    spec = manifest.services["ai_services"]
+    assert not spec.pooled
+    spec.cwd = tmp_path
+    manager = ServiceManager(manifest, drain_timeout=5)
+    try:
+        assert manager.start_service(spec)
+        manager.started.append(spec.name)
+        with urllib.request.urlopen("http://127.0.0.1:9000/health", timeout=5) as response:
+            assert response.status == 200
+    finally:
+        manager.stop_services()
+
+
+def test_plain_services_report_no_restart_count(tmp_path):
+    manifest = load_manifest(DEFAULT_MANIFEST)
+    manager = ServiceManager(manifest)
+    manager.processes["dashboard"] = None
+    assert "restarts" not in manager.resource_stats()["dashboard"]
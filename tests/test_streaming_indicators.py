@@ -0,0 +1,105 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from indicators import atr, bollinger, ema, macd, rsi, sma
+from streaming_indicators import (RollingMinMax, RollingStats, StreamingATR, StreamingEMA,
+                                  StreamingIndicators, StreamingMACD, StreamingRSI)
+
+
+@pytest.fixture
+def bars():
+    rng = np.random.default_rng(11)
+    close = 100 + np.cumsum(rng.normal(0, 1, 300))
+    high = close + rng.uniform(0, 1, 300)
+    low = close - rng.uniform(0, 1, 300)
+    volume = rng.uniform(1_000, 5_000, 300)
+    return close, high, low, volume
+
+
+def _stream(update, *series):
+    return np.array([update(*values) for values in zip(*series)], dtype=float)
+
+
+def test_streaming_matches_batch(bars):
+    close, high, low, _ = bars
+
+    for period in (20, 50):
+        streamed = _stream(StreamingEMA(period).update, close)
+        np.testing.assert_allclose(streamed, ema(close, period), rtol=1e-10, equal_nan=True)
+
+    np.testing.assert_allclose(_stream(StreamingRSI(14).update, close), rsi(close),
+                               rtol=1e-10, equal_nan=True)
+
+    stream_macd = StreamingMACD(12, 26, 9)
+    lines, signals = [], []
+    for price in close:
+        lines.append(stream_macd.update(price))
+        signals.append(stream_macd.signal)
+    line, signal, _ = macd(close)
+    np.testing.assert_allclose(lines, line, rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(signals, signal, rtol=1e-10, equal_nan=True)
+
+    np.testing.assert_allclose(_stream(StreamingATR(14).update, high, low, close), atr(high, low, close),
+                               rtol=1e-10, equal_nan=True)
+
+
+def test_rolling_stats_match_sma_and_bollinger(bars):
+    close = bars[0]
+    stats = RollingStats(20)
+    middles, uppers, lowers = [], [], []
+    for price in close:
+        mean = stats.update(price)
+        width = 2.0 * stats.std if stats.ready else math.nan
+        middles.append(mean)
+        uppers.append(mean + width)
+        lowers.append(mean - width)
+    middle, upper, lower = bollinger(close)
+    np.testing.assert_allclose(middles, sma(close, 20), rtol=1e-10, equal_nan=True)
+    np.testing.assert_allclose(uppers, upper, rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(lowers, lower, rtol=1e-9, equal_nan=True)
+
+
+def test_rolling_min_max(bars):
+    close = bars[0]
+    minmax = RollingMinMax(20)
+    for t, price in enumerate(close):
+        low, high = minmax.update(price)
+        window = close[max(0, t - 19):t + 1]
+        assert (low, high) == (window.min(), window.max())
+
+
+def _same(a, b):
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[key], b[key]) for key in a)
+    return (math.isnan(a) and math.isnan(b)) or a == b
+
+
+@pytest.mark.parametrize("split", [10, 40, 150])
+def test_state_round_trip_continues_the_stream(bars, split):
+    close, _, _, volume = bars
+    uninterrupted = StreamingIndicators()
+    resumed = StreamingIndicators()
+    for price, size in zip(close[:split], volume[:split]):
+        uninterrupted.update(price, size)
+        resumed.update(price, size)
+
+    resumed = StreamingIndicators.from_state(json.loads(json.dumps(resumed.to_state())))
+    assert _same(resumed.snapshot(), uninterrupted.snapshot())
+    for price, size in zip(close[split:], volume[split:]):
+        assert _same(resumed.update(price, size), uninterrupted.update(price, size))
+    assert resumed.bars == uninterrupted.bars == len(close)
+
+
+def test_atr_state_round_trip(bars):
+    close, high, low, _ = bars
+    uninterrupted = StreamingATR(14)
+    resumed = StreamingATR(14)
+    for values in zip(high[:20], low[:20], close[:20]):
+        uninterrupted.update(*values)
+        resumed.update(*values)
+    resumed = StreamingATR.from_state(json.loads(json.dumps(resumed.to_state())))
+    for values in zip(high[20:], low[20:], close[20:]):
+        assert resumed.update(*values) == uninterrupted.update(*values)
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from tick_archive import BAR_DTYPE, NS_PER_DAY, TickArchive
+
+START = int(datetime(2024, 12, 30, tzinfo=timezone.utc).timestamp()) * 1_000_000_000
+MINUTE = 60 * 1_000_000_000
+
+
+def bars(timestamps):
+    records = np.zeros(len(timestamps), dtype=BAR_DTYPE)
+    records["timestamp"] = timestamps
+    records["close"] = np.arange(len(timestamps), dtype=np.float64)
+    return records
+
+
+def test_one_file_per_symbol_year(tmp_path):
+    archive = TickArchive(tmp_path)
+    stamps = START + np.arange(4) * NS_PER_DAY  # Dec 30 .. Jan 2
+    archive.append("AAPL", bars(stamps))
+    assert archive.partitions("AAPL") == ["2024", "2025"]
+    view = archive.read_range("AAPL", START, START + 2 * NS_PER_DAY)
+    assert not view.flags.owndata  # Within one file: a view of the mapping
+    np.testing.assert_array_equal(archive.read_range("AAPL", START, START + 4 * NS_PER_DAY)["close"],
+                                  [0, 1, 2, 3])
+
+
+def test_out_of_order_records_are_rejected_within_a_chunk(tmp_path):
+    archive = TickArchive(tmp_path)
+    with pytest.raises(ValueError, match="timestamp order"):
+        archive.append("AAPL", bars(START + np.array([0, 2, 1]) * MINUTE))
+    archive.append("AAPL", bars(START + np.array([0, 1]) * MINUTE))
+    with pytest.raises(ValueError, match="back in time"):
+        archive.append("AAPL", bars(START + np.array([0, 5]) * MINUTE))
+
+
+def test_open_files_are_bounded(tmp_path):
+    archive = TickArchive(tmp_path, partition="day", max_open_files=3)
+    archive.append("AAPL", bars(START + np.arange(10) * NS_PER_DAY))
+    assert len(archive.read_range("AAPL", START, START + 10 * NS_PER_DAY)) == 10
+    assert len(archive._files) == 3
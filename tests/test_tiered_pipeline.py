@@ -0,0 +1,55 @@
+import asyncio
+
+import numpy as np
+
+from agent_trading_example import TradeDecision
+from llm_scheduler import fallback_decision
+from tiered_pipeline import AMBIGUOUS, SETTLED, TieredPipeline
+
+SYMBOLS = ["AAPL", "MSFT"]
+BATCH = {
+    # AAPL: momentum buy with RSI close to overbought; MSFT: below trend, nothing to do
+    "price": np.array([105.0, 95.0]),
+    "rsi": np.array([68.0, 50.0]),
+    "ema_20": np.array([100.0, 100.0]),
+    "macd": np.array([1.0, -1.0]),
+    "macd_signal": np.array([0.5, -0.5]),
+    "atr": np.array([10.0, 10.0]),
+}
+
+
+def run(ask):
+    return asyncio.run(TieredPipeline(ask).run(SYMBOLS, BATCH))
+
+
+def test_only_candidates_reach_the_model():
+    asked = []
+
+    async def ask(features):
+        asked.append(features["symbol"])
+        return TradeDecision("sell", features["symbol"], 10, features["price"], "model", 0.9, "llm")
+
+    result = run(ask)
+    assert result.screen.tier.tolist() == [AMBIGUOUS, SETTLED]
+    assert asked == ["AAPL"]
+    assert result.decision(0).strategy == "llm"
+    assert result.stats()["model_calls"] == 1 and result.stats()["fallbacks"] == 0
+
+
+def test_fallback_keeps_the_rule_decision():
+    async def ask(features):
+        return fallback_decision(features, TradeDecision)
+
+    result = run(ask)
+    assert result.decision(0) == result.screen.rules.decision(0)
+    assert [d.strategy for d in result.to_decisions()] == ["momentum_rsi"]
+    stats = result.stats()
+    assert stats["model_calls"] == 0 and stats["fallbacks"] == 1 and stats["failed"] == 0
+
+
+def test_failed_call_is_not_a_model_call():
+    async def ask(features):
+        raise RuntimeError("model down")
+
+    stats = run(ask).stats()
+    assert stats["model_calls"] == 0 and stats["failed"] == 1
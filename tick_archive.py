@@ -0,0 +1,287 @@
+"""
+Append-only, memory-mapped tick and bar archive
+
+Layout: <root>/<kind>/<SYMBOL>/<partition>.dat, one file per symbol per
+UTC year by default ("2024.dat"; "month" and "day" partitions are also
+available). Each file is a 64-byte header followed by fixed-width records,
+so it maps straight onto a NumPy structured array without parsing. A
+sidecar .idx file holds every INDEX_STRIDE-th timestamp; range reads
+search that small index and then a single block of the mapped file,
+touching only the pages they return.
+
+Opening and mapping a file costs far more than scanning a month of minute
+bars from it, so the partition is what bounds long reads. A year of minute
+bars for 500 symbols is 500 files by year, 6,000 by month and 126,000 by
+day; each open mapping also holds a file descriptor, so at most
+`max_open_files` are kept mapped between reads.
+
+Reads return zero-copy views into the mapping. Timestamps are int64 epoch
+nanoseconds and must be non-decreasing within a file.
+"""
+import mmap
+import os
+import struct
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+BAR_DTYPE = np.dtype([
+    ("timestamp", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+TICK_DTYPE = np.dtype([
+    ("timestamp", "<i8"),
+    ("price", "<f8"),
+    ("size", "<f8"),
+])
+DTYPES = {"bars": BAR_DTYPE, "ticks": TICK_DTYPE}
+
+MAGIC = b"CIVALTS1"
+HEADER = struct.Struct("<8sHHII")  # magic, version, kind, record size, yyyymmdd
+HEADER_SIZE = 64
+VERSION = 1
+INDEX_STRIDE = 1024
+NS_PER_DAY = 86400 * 1_000_000_000
+
+
+# strftime formats of the partition names; they sort in time order
+PARTITIONS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+
+
+def day_of(timestamp_ns: int) -> str:
+    return partition_of(timestamp_ns, "day")
+
+
+def partition_of(timestamp_ns: int, partition: str) -> str:
+    moment = datetime.fromtimestamp(timestamp_ns // 1_000_000_000, tz=timezone.utc)
+    return moment.strftime(PARTITIONS[partition])
+
+
+def day_start_ns(day: str) -> int:
+    moment = datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return int(moment.timestamp()) * 1_000_000_000
+
+
+class PartitionFile:
+    """One symbol-partition file: header, fixed-width records and a sparse index"""
+
+    def __init__(self, path: Path, kind: str):
+        self.path = path
+        self.index_path = path.with_suffix(".idx")
+        self.kind = kind
+        self.dtype = DTYPES[kind]
+        self._map: Optional[np.ndarray] = None
+        self._mapped_size = -1
+        self._index: Optional[np.ndarray] = None
+
+    def _write_header(self, first_day: str):
+        header = HEADER.pack(MAGIC, VERSION, list(DTYPES).index(self.kind),
+                             self.dtype.itemsize, int(first_day.replace("-", "")))
+        with open(self.path, "wb") as f:
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+
+    def _check_header(self, header: bytes):
+        magic, version, _kind, record_size, _day = HEADER.unpack(header[:HEADER.size])
+        if magic != MAGIC or version != VERSION or record_size != self.dtype.itemsize:
+            raise ValueError(f"{self.path} is not a {self.kind} archive file")
+
+    def count(self) -> int:
+        """Complete records on disk; a torn trailing record is ignored"""
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+        return max(size - HEADER_SIZE, 0) // self.dtype.itemsize
+
+    def records(self) -> np.ndarray:
+        """The whole file as a read-only structured array (memory-mapped)"""
+        size = os.stat(self.path).st_size
+        if self._map is None or size != self._mapped_size:
+            with open(self.path, "rb") as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._check_header(mapping)
+            count = max(size - HEADER_SIZE, 0) // self.dtype.itemsize
+            # frombuffer keeps the mapping alive for as long as any view exists
+            self._map = np.frombuffer(mapping, dtype=self.dtype, count=count, offset=HEADER_SIZE)
+            self._mapped_size = size
+            self._index = None
+        return self._map
+
+    def index(self) -> np.ndarray:
+        """Every INDEX_STRIDE-th timestamp, rebuilt if the sidecar is stale"""
+        if self._index is not None:
+            return self._index
+        records = self.records()
+        expected = -(-len(records) // INDEX_STRIDE)
+        index = None
+        if self.index_path.exists():
+            index = np.fromfile(self.index_path, dtype="<i8")
+        if index is None or len(index) != expected:
+            index = np.ascontiguousarray(records["timestamp"][::INDEX_STRIDE])
+            index.tofile(self.index_path)
+        self._index = index
+        return index
+
+    def append(self, records: np.ndarray):
+        timestamps = records["timestamp"]
+        if len(timestamps) > 1 and np.any(timestamps[1:] < timestamps[:-1]):
+            raise ValueError(f"{self.path.name}: records must be in timestamp order")
+        if not self.path.exists():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._write_header(day_of(int(timestamps[0])) if len(timestamps) else "0")
+
+        start = self.count()
+        if start and len(records):
+            last = self.records()["timestamp"][-1]
+            if timestamps[0] < last:
+                raise ValueError(f"{self.path.name}: appends must not go back in time")
+
+        with open(self.path, "r+b") as f:
+            # Drop any torn record left by a crash before appending
+            f.truncate(HEADER_SIZE + start * self.dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+
+        first_new = -(-start // INDEX_STRIDE) * INDEX_STRIDE
+        offsets = np.arange(first_new, start + len(records), INDEX_STRIDE) - start
+        if len(offsets):
+            with open(self.index_path, "ab") as f:
+                f.write(records["timestamp"][offsets].astype("<i8").tobytes())
+        self._index = None
+
+    def slice_range(self, start_ns: int, end_ns: int) -> np.ndarray:
+        """Records with start_ns <= timestamp < end_ns, as a zero-copy view"""
+        records = self.records()
+        if len(records) == 0:
+            return records
+        timestamps = records["timestamp"]
+        # Files entirely inside the range (the common case for long scans) skip the search
+        if start_ns <= timestamps[0] and timestamps[-1] < end_ns:
+            return records
+        index = self.index()
+        return records[self._locate(timestamps, index, start_ns):self._locate(timestamps, index, end_ns)]
+
+    @staticmethod
+    def _locate(timestamps: np.ndarray, index: np.ndarray, value: int) -> int:
+        """First record with timestamp >= value, searching one index block"""
+        block = int(np.searchsorted(index, value, side="left"))
+        lo = max(block - 1, 0) * INDEX_STRIDE
+        hi = min(block * INDEX_STRIDE + 1, len(timestamps))
+        return lo + int(np.searchsorted(timestamps[lo:hi], value, side="left"))
+
+
+class TickArchive:
+    """Time-partitioned, memory-mapped archive of bars and ticks per symbol"""
+
+    def __init__(self, root: Path = Path("data/archive"), partition: str = "year",
+                 max_open_files: int = 1024):
+        if partition not in PARTITIONS:
+            raise ValueError(f"unknown partition {partition!r}, expected one of {', '.join(PARTITIONS)}")
+        self.root = Path(root)
+        self.partition = partition
+        self.max_open_files = max_open_files
+        # Least recently used first; a dropped file's mapping closes once no view uses it
+        self._files: "OrderedDict[Tuple[str, str, str], PartitionFile]" = OrderedDict()
+
+    def _file(self, kind: str, symbol: str, name: str) -> PartitionFile:
+        key = (kind, symbol, name)
+        partition_file = self._files.get(key)
+        if partition_file is None:
+            partition_file = PartitionFile(self.root / kind / symbol / f"{name}.dat", kind)
+            self._files[key] = partition_file
+            while len(self._files) > self.max_open_files:
+                self._files.popitem(last=False)
+        else:
+            self._files.move_to_end(key)
+        return partition_file
+
+    def partitions(self, symbol: str, kind: str = "bars") -> List[str]:
+        """Names of the symbol's files, oldest first"""
+        try:
+            names = os.listdir(self.root / kind / symbol)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-4] for name in names if name.endswith(".dat"))
+
+    def append(self, symbol: str, records: np.ndarray, kind: str = "bars"):
+        """Append records (structured array of the kind's dtype), split by partition"""
+        records = np.asarray(records, dtype=DTYPES[kind])
+        if len(records) == 0:
+            return
+        timestamps = records["timestamp"]
+        first, last = partition_of(int(timestamps[0]), self.partition), partition_of(int(timestamps[-1]), self.partition)
+        if first == last:
+            self._file(kind, symbol, first).append(records)
+            return
+        # Spans partitions: split on the UTC day boundaries where the partition changes
+        days = timestamps // NS_PER_DAY
+        splits = np.flatnonzero(np.diff(days)) + 1
+        chunks: Dict[str, List[np.ndarray]] = {}
+        for chunk in np.split(records, splits):
+            chunks.setdefault(partition_of(int(chunk["timestamp"][0]), self.partition), []).append(chunk)
+        for name, parts in chunks.items():
+            self._file(kind, symbol, name).append(parts[0] if len(parts) == 1 else np.concatenate(parts))
+
+    def append_bars(self, symbol: str, timestamp, open_, high, low, close, volume):
+        records = np.empty(len(timestamp), dtype=BAR_DTYPE)
+        records["timestamp"] = timestamp
+        records["open"] = open_
+        records["high"] = high
+        records["low"] = low
+        records["close"] = close
+        records["volume"] = volume
+        self.append(symbol, records, "bars")
+
+    def append_ticks(self, symbol: str, timestamp, price, size):
+        records = np.empty(len(timestamp), dtype=TICK_DTYPE)
+        records["timestamp"] = timestamp
+        records["price"] = price
+        records["size"] = size
+        self.append(symbol, records, "ticks")
+
+    def iter_range(self, symbol: str, start_ns: int, end_ns: int, kind: str = "bars") -> Iterator[np.ndarray]:
+        """Zero-copy views, one per partition file overlapping [start_ns, end_ns)"""
+        first = partition_of(start_ns, self.partition)
+        last = partition_of(max(end_ns - 1, start_ns), self.partition)
+        for name in self.partitions(symbol, kind):
+            if first <= name <= last:
+                view = self._file(kind, symbol, name).slice_range(start_ns, end_ns)
+                if len(view):
+                    yield view
+
+    def read_range(self, symbol: str, start_ns: int, end_ns: int, kind: str = "bars") -> np.ndarray:
+        """Records in [start_ns, end_ns); zero-copy when the range is within one partition"""
+        views = list(self.iter_range(symbol, start_ns, end_ns, kind))
+        if not views:
+            return np.empty(0, dtype=DTYPES[kind])
+        if len(views) == 1:
+            return views[0]
+        return np.concatenate(views)
+
+    def read_matrix(self, symbols: List[str], start_ns: int, end_ns: int,
+                    field: str = "close") -> Tuple[np.ndarray, np.ndarray]:
+        """(symbols, bars) matrix of one bar field on a shared timestamp axis
+
+        Symbols missing a bar get NaN at that timestamp, so the result can go
+        straight into the indicators module or the backtester.
+        """
+        ranges = [self.read_range(symbol, start_ns, end_ns, "bars") for symbol in symbols]
+        stamps = [r["timestamp"] for r in ranges if len(r)]
+        if not stamps:
+            timestamps = np.empty(0, np.int64)
+        elif all(len(other) == len(stamps[0]) and np.array_equal(other, stamps[0]) for other in stamps[1:]):
+            timestamps = np.array(stamps[0])  # Usual case: every symbol has every bar
+        else:
+            timestamps = np.unique(np.concatenate(stamps))
+        matrix = np.full((len(symbols), len(timestamps)), np.nan)
+        for row, records in enumerate(ranges):
+            if len(records):
+                matrix[row, np.searchsorted(timestamps, records["timestamp"])] = records[field]
+        return timestamps, matrix
@@ -0,0 +1,194 @@
+"""
+Tiered decision pipeline: vectorized rule screen first, LLM only where it pays
+
+Tier 1 runs batch_decisions.decide() over the whole universe and sorts
+every symbol into one of three tiers with boolean masks:
+
+- SETTLED: the rules are clear-cut; their decision (usually hold) stands.
+- AMBIGUOUS: RSI within `rsi_margin` of a threshold, the momentum and RSI
+  rules pulling opposite ways, or a MACD crossover too small to trust.
+- OPPORTUNITY: price dislocated from its trend EMA by `opportunity_atr`
+  ATRs or more - rare, and worth a closer look.
+
+Tier 2 sends only ambiguous and opportunity symbols to the model, best
+opportunity first, at most `concurrency` at a time and only as many as the
+cycle's token budget covers; the rest keep the rule decision. So do rows
+the model could not answer: a scheduler fallback is cruder than the
+screen's own rules and is counted, not laid over them. Cost per cycle
+therefore follows the number of candidates, not the universe.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from agent_trading_example import DEFAULT_STRATEGY
+from batch_decisions import ACTIONS, MOMENTUM, OVERBOUGHT, OVERSOLD, DecisionBatch, decide
+from llm_scheduler import is_fallback
+
+SETTLED, AMBIGUOUS, OPPORTUNITY = 0, 1, 2
+TIERS = ("settled", "ambiguous", "opportunity")
+
+
+class Screen:
+    """Tier-1 output: rule decisions plus tier and priority per symbol"""
+
+    __slots__ = ("rules", "tier", "score")
+
+    def __init__(self, rules: DecisionBatch, tier: np.ndarray, score: np.ndarray):
+        self.rules = rules
+        self.tier = tier
+        self.score = score
+
+    def candidates(self) -> np.ndarray:
+        """Rows for the model, highest score first"""
+        rows = np.flatnonzero(self.tier != SETTLED)
+        return rows[np.argsort(-self.score[rows], kind="stable")]
+
+    def counts(self) -> Dict[str, int]:
+        return {name: int(n) for name, n in zip(TIERS, np.bincount(self.tier, minlength=len(TIERS)))}
+
+
+def screen(symbols: List[str], batch: Dict[str, np.ndarray], strategy: Optional[Dict] = None,
+           rsi_margin: float = 5.0, macd_margin: float = 0.0002, opportunity_atr: float = 3.0) -> Screen:
+    """Rule decisions and tiers for a whole universe (indicator arrays as from compute_indicators)"""
+    strategy = {**DEFAULT_STRATEGY, **(strategy or {})}
+    rules = decide(symbols, batch, strategy)
+    price, rsi = batch["price"], batch["rsi"]
+    trend = batch.get(strategy["trend_ema"] or "ema_20", batch["ema_20"])
+    histogram = batch["macd"] - batch["macd_signal"]
+
+    near_threshold = ((np.abs(rsi - strategy["rsi_overbought"]) < rsi_margin) |
+                      (np.abs(rsi - strategy["rsi_oversold"]) < rsi_margin))
+    # A momentum buy with RSI close to overbought, or an RSI sell into a bullish trend
+    conflicting = (((rules.reason == MOMENTUM) & (rsi > strategy["rsi_overbought"] - rsi_margin)) |
+                   ((rules.reason == OVERBOUGHT) & (price > trend) & (histogram > 0)) |
+                   ((rules.reason == OVERSOLD) & (price < trend) & (histogram < 0)))
+    weak_cross = (price > trend) & (np.abs(histogram) < macd_margin * price)
+    ambiguous = near_threshold | conflicting | weak_cross
+
+    atr = batch.get("atr")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        dislocation = np.abs(price - trend) / (atr if atr is not None else price * 0.01)
+    dislocation = np.nan_to_num(dislocation, nan=0.0, posinf=0.0)
+    opportunity = dislocation >= opportunity_atr
+
+    tier = np.select([opportunity, ambiguous], [OPPORTUNITY, AMBIGUOUS], SETTLED).astype(np.int8)
+    # Opportunities first by size of the move, then ambiguous rows nearest a threshold
+    closeness = 1.0 - np.minimum(np.abs(rsi - strategy["rsi_overbought"]),
+                                 np.abs(rsi - strategy["rsi_oversold"])) / 100.0
+    score = np.where(opportunity, 1.0 + dislocation, np.nan_to_num(closeness, nan=0.0))
+    return Screen(rules, tier, score)
+
+
+class TieredResult:
+    """Rule decisions with the model's answers laid over the rows it decided"""
+
+    def __init__(self, screen: Screen, model_decisions: Dict[int, object], skipped: int,
+                 failed: int, elapsed: float, fallbacks: int = 0):
+        self.screen = screen
+        self.model_decisions = model_decisions
+        self.skipped = skipped
+        self.failed = failed
+        self.fallbacks = fallbacks
+        self.elapsed = elapsed
+
+    def decision(self, row: int):
+        decided = self.model_decisions.get(row)
+        return decided if decided is not None else self.screen.rules.decision(row)
+
+    def to_decisions(self) -> list:
+        """Final non-hold decisions for the universe"""
+        rules = self.screen.rules
+        rows = set(rules.trade_rows().tolist()) | set(self.model_decisions)
+        decisions = [self.decision(row) for row in sorted(rows)]
+        return [d for d in decisions if d.action != "hold"]
+
+    def stats(self) -> Dict:
+        return {
+            "symbols": len(self.screen.rules),
+            "tiers": self.screen.counts(),
+            "model_calls": len(self.model_decisions),
+            "over_budget": self.skipped,
+            "fallbacks": self.fallbacks,
+            "failed": self.failed,
+            "elapsed_ms": self.elapsed * 1000,
+        }
+
+
+class TieredPipeline:
+    """Screens a universe with the rules and asks the model only about candidates
+
+    `ask(features)` gets the symbol's features (as SmartTradingAgent sends
+    them to the model) and returns a decision. Each call is charged
+    `tokens_per_call` against `token_budget` per run; candidates past the
+    budget, and answers for which `is_fallback` is true, keep the rule
+    decision.
+    """
+
+    def __init__(self, ask: Callable[[Dict], Awaitable], concurrency: int = 8,
+                 token_budget: int = 50_000, tokens_per_call: int = 800,
+                 strategy: Optional[Dict] = None,
+                 is_fallback: Callable[[object], bool] = is_fallback, **screen_options):
+        self.ask = ask
+        self.is_fallback = is_fallback
+        self.concurrency = concurrency
+        self.token_budget = token_budget
+        self.tokens_per_call = tokens_per_call
+        self.strategy = strategy
+        self.screen_options = screen_options
+
+    @staticmethod
+    def features(screened: Screen, batch: Dict[str, np.ndarray], row: int,
+                 positions: Optional[Dict[str, float]] = None) -> Dict:
+        symbol = screened.rules.symbols[row]
+
+        def pick(field):
+            value = batch.get(field)
+            return None if value is None or np.isnan(value[row]) else float(value[row])
+
+        return {
+            "symbol": symbol,
+            "price": pick("price"),
+            "rsi": pick("rsi"),
+            "macd": {"value": pick("macd"), "signal": pick("macd_signal")},
+            "ema_20": pick("ema_20"),
+            "atr": pick("atr"),
+            "position": (positions or {}).get(symbol, 0.0),
+            "tier": TIERS[screened.tier[row]],
+            "rule_action": ACTIONS[screened.rules.action[row]],
+        }
+
+    async def run(self, symbols: List[str], batch: Dict[str, np.ndarray],
+                  positions: Optional[Dict[str, float]] = None) -> TieredResult:
+        started = time.perf_counter()
+        screened = screen(symbols, batch, self.strategy, **self.screen_options)
+        candidates = screened.candidates()
+        affordable = self.token_budget // max(self.tokens_per_call, 1)
+        chosen, skipped = candidates[:affordable].tolist(), max(len(candidates) - affordable, 0)
+
+        decided: Dict[int, object] = {}
+        failed = fallbacks = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def ask_one(row: int):
+            nonlocal failed, fallbacks
+            async with semaphore:
+                try:
+                    answer = await self.ask(self.features(screened, batch, row, positions))
+                except Exception as e:
+                    # The rule decision stands for this row
+                    failed += 1
+                    if failed == 1:
+                        print(f"⚠️  Model call failed for {screened.rules.symbols[row]}: {e}")
+                    return
+                if self.is_fallback(answer):
+                    fallbacks += 1  # No model answer in time; the screen's rules know more
+                else:
+                    decided[row] = answer
+
+        async with asyncio.TaskGroup() as tg:
+            for row in chosen:
+                tg.create_task(ask_one(row))
+        return TieredResult(screened, decided, skipped, failed, time.perf_counter() - started, fallbacks)